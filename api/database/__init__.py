@@ -1,3 +1,4 @@
 from . import config
+from . import storage
 
-__all__ = ['config'] 
\ No newline at end of file
+__all__ = ['config', 'storage'] 
\ No newline at end of file
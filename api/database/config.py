@@ -1,75 +1,99 @@
-from typing import Dict
+from typing import Dict, Optional, Any, Callable
+from concurrent.futures import ThreadPoolExecutor
 import mysql.connector
 from mysql.connector import pooling
+import asyncio
+import functools
 import os
-from dotenv import load_dotenv
 import logging
+import threading
+import time
+from ..services import metrics
+from ..services import timing
+from ..services.environment import load_environment
+from .health import db_health
 
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Délai de connexion borné: une base injoignable ne doit pas bloquer les requêtes plusieurs secondes
+DEFAULT_CONNECT_TIMEOUT = 2
+# Threads dédiés aux appels MySQL bloquants (autant que de connexions du pool)
+DB_EXECUTOR_WORKERS = 5
+# Au-delà, l'appel asynchrone abandonne l'attente et répond en mode dégradé
+DEFAULT_QUERY_TIMEOUT = 5.0
 
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env')
-logger.info(f"Tentative de chargement du fichier .env depuis : {env_path}")
-load_dotenv(env_path)
 
+def get_db_config() -> Dict[str, any]:
+    """Configuration MySQL lue depuis l'environnement (.env chargé au besoin)"""
+    load_environment()
+    return {
+        'host': os.getenv('DB_HOST') or 'localhost',
+        'port': int(os.getenv('DB_PORT') or '3306'),
+        'database': os.getenv('DB_NAME') or 'sentinel',
+        'user': os.getenv('DB_USER') or 'root',
+        'password': os.getenv('DB_PASSWORD') or 'Lpmdlp123',
+        'pool_name': 'mypool',
+        'pool_size': 5,
+        'connection_timeout': int(os.getenv('DB_CONNECT_TIMEOUT') or DEFAULT_CONNECT_TIMEOUT)
+    }
 
-db_host = os.getenv('DB_HOST')
-db_port = os.getenv('DB_PORT')
-db_user = os.getenv('DB_USER')
-db_password = os.getenv('DB_PASSWORD')
-db_name = os.getenv('DB_NAME')
 
-logger.info("Variables d'environnement chargées :")
-logger.info(f"DB_HOST: {db_host}")
-logger.info(f"DB_PORT: {db_port}")
-logger.info(f"DB_USER: {db_user}")
-# Ne jamais logger le mot de passe
-logger.info(f"DB_NAME: {db_name}")
-
-
-DB_CONFIG: Dict[str, any] = {
-    'host': db_host or 'localhost',
-    'port': int(db_port or '3306'),
-    'database': db_name or 'sentinel',
-    'user': db_user or 'root',
-    'password': db_password or 'Lpmdlp123',
-    'pool_name': 'mypool',
-    'pool_size': 5
-}
+connection_pool = None
+_pool_lock = threading.Lock()
 
-logger.info(f"Configuration de la base de données : {DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}")
 
+def get_connection_pool() -> Optional[pooling.MySQLConnectionPool]:
+    """Crée le pool à la première utilisation. Les nouvelles tentatives après un échec sont rythmées par la
+    sonde de santé (health.py): les requêtes ne passent jamais par ici tant que la base est indisponible."""
+    global connection_pool
+    if connection_pool is not None:
+        return connection_pool
+    with _pool_lock:
+        if connection_pool is not None:
+            return connection_pool
+        config = get_db_config()
+        logger.info(f"Connexion à la base de données : {config['host']}:{config['port']}/{config['database']} "
+                    f"(utilisateur {config['user']}, délai {config['connection_timeout']}s)")
+        try:
+            connection_pool = mysql.connector.pooling.MySQLConnectionPool(**config)
+            logger.info("Pool de connexions créé avec succès")
+        except Exception as e:
+            # Ne pas lever l'exception pour permettre un fonctionnement dégradé sans DB
+            logger.error(f"Erreur lors de la création du pool de connexions : {str(e)}")
+        return connection_pool
 
-connection_pool = None
-try:
-    connection_pool = mysql.connector.pooling.MySQLConnectionPool(**DB_CONFIG)
-    logger.info("Pool de connexions créé avec succès")
-except Exception as e:
-    logger.error(f"Erreur lors de la création du pool de connexions : {str(e)}")
-    # Ne pas lever l'exception pour permettre un fonctionnement dégradé sans DB
-    connection_pool = None
+def _is_connection_error(error: Exception) -> bool:
+    return isinstance(error, (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError))
 
 def get_db_connection():
-    """Obtient une connexion depuis le pool. Retourne None si indisponible."""
-    if connection_pool is None:
-        logger.warning("Pool de connexions indisponible (mode dégradé)")
+    """Obtient une connexion depuis le pool. Retourne None immédiatement si la base est signalée indisponible."""
+    if not db_health.available:
+        logger.debug("Base de données indisponible (mode dégradé)")
+        return None
+    pool = get_connection_pool()
+    if pool is None:
+        db_health.mark_down("pool de connexions indisponible")
         return None
     try:
-        return connection_pool.get_connection()
+        return pool.get_connection()
     except Exception as e:
         logger.error(f"Erreur lors de l'obtention d'une connexion : {str(e)}")
+        if _is_connection_error(e):
+            db_health.mark_down(str(e))
         return None
 
 def execute_query(query: str, params: tuple = None, fetch_one: bool = False):
     """Exécute une requête SQL et retourne les résultats. Retourne des valeurs par défaut si la DB est indisponible."""
     conn = None
     cursor = None
+    start = time.perf_counter()
+    outcome = "ok"
     try:
         conn = get_db_connection()
         if conn is None:
             # Mode dégradé sans base de données
+            outcome = "unavailable"
             return {} if fetch_one else []
         cursor = conn.cursor(dictionary=True)
         logger.debug(f"Exécution de la requête : {query}")
@@ -80,7 +104,10 @@ def execute_query(query: str, params: tuple = None, fetch_one: bool = False):
             result = cursor.fetchall()
         return result
     except Exception as e:
+        outcome = "error"
         logger.error(f"Erreur lors de l'exécution de la requête : {str(e)}")
+        if _is_connection_error(e):
+            db_health.mark_down(str(e))
         # En mode dégradé, retourner des valeurs sûres
         return {} if fetch_one else []
     finally:
@@ -88,15 +115,21 @@ def execute_query(query: str, params: tuple = None, fetch_one: bool = False):
             cursor.close()
         if conn:
             conn.close()
+        duration = time.perf_counter() - start
+        metrics.DB_QUERY_DURATION.observe(duration, operation="query", outcome=outcome)
+        timing.record("db", duration)
 
 def execute_update(query: str, params: tuple = None):
     """Exécute une requête de mise à jour et retourne le nombre de lignes affectées. Retourne 0 si la DB est indisponible."""
     conn = None
     cursor = None
+    start = time.perf_counter()
+    outcome = "ok"
     try:
         conn = get_db_connection()
         if conn is None:
             # Mode dégradé sans base de données
+            outcome = "unavailable"
             return 0
         cursor = conn.cursor()
         logger.debug(f"Exécution de la requête de mise à jour : {query}")
@@ -104,10 +137,109 @@ def execute_update(query: str, params: tuple = None):
         conn.commit()
         return cursor.rowcount
     except Exception as e:
+        outcome = "error"
         logger.error(f"Erreur lors de l'exécution de la mise à jour : {str(e)}")
+        if _is_connection_error(e):
+            db_health.mark_down(str(e))
         return 0
     finally:
         if cursor:
             cursor.close()
         if conn:
-            conn.close()
\ No newline at end of file
+            conn.close()
+        duration = time.perf_counter() - start
+        metrics.DB_QUERY_DURATION.observe(duration, operation="update", outcome=outcome)
+        timing.record("db", duration)
+
+
+def execute_in_transaction(work: Callable[[Any], Any]):
+    """Exécute work(cursor) dans une transaction unique (curseur dict): commit si tout réussit, rollback sinon.
+    Retourne le résultat de work, ou None si la DB est indisponible ou en cas d'erreur."""
+    conn = None
+    cursor = None
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        conn = get_db_connection()
+        if conn is None:
+            outcome = "unavailable"
+            return None
+        conn.start_transaction()
+        cursor = conn.cursor(dictionary=True)
+        result = work(cursor)
+        conn.commit()
+        return result
+    except Exception as e:
+        outcome = "error"
+        logger.error(f"Erreur lors de la transaction, annulation : {str(e)}")
+        if _is_connection_error(e):
+            db_health.mark_down(str(e))
+        if conn:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+        duration = time.perf_counter() - start
+        metrics.DB_QUERY_DURATION.observe(duration, operation="transaction", outcome=outcome)
+        timing.record("db", duration)
+
+
+# === ACCÈS ASYNCHRONE ===
+# Les appels mysql.connector restent bloquants: ils s'exécutent dans un exécuteur borné dédié,
+# séparé du threadpool de Starlette, pour qu'une base lente ne fige ni la boucle ni les autres routes.
+
+_db_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        with _executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+    return _db_executor
+
+
+def _query_timeout() -> float:
+    return float(os.getenv('DB_QUERY_TIMEOUT') or DEFAULT_QUERY_TIMEOUT)
+
+
+async def run_db(func: Callable, *args, default: Any = None, **kwargs) -> Any:
+    """Exécute une fonction bloquante d'accès DB dans l'exécuteur dédié; `default` si le délai est dépassé"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(timing.with_request_context(func), *args, **kwargs)
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(_get_db_executor(), call), timeout=_query_timeout())
+    except asyncio.TimeoutError:
+        logger.error(f"Délai DB dépassé ({_query_timeout()}s) pour {getattr(func, '__name__', func)} - mode dégradé")
+        return default
+
+
+async def execute_query_async(query: str, params: tuple = None, fetch_one: bool = False):
+    """Version non bloquante de execute_query (mêmes lignes dict, mêmes valeurs par défaut)"""
+    return await run_db(execute_query, query, params, fetch_one, default={} if fetch_one else [])
+
+
+async def execute_update_async(query: str, params: tuple = None) -> int:
+    """Version non bloquante de execute_update"""
+    return await run_db(execute_update, query, params, default=0)
+
+
+async def execute_in_transaction_async(work: Callable[[Any], Any]):
+    """Version non bloquante de execute_in_transaction"""
+    return await run_db(execute_in_transaction, work, default=None)
+
+
+def shutdown_db_executor():
+    global _db_executor
+    with _executor_lock:
+        if _db_executor is not None:
+            _db_executor.shutdown(wait=False, cancel_futures=True)
+            _db_executor = None
@@ -0,0 +1,131 @@
+"""
+Fallback fichier des sélections (config/selected_builds.json)
+- lecture: contenu décodé gardé en mémoire, relu seulement si le fichier a changé (mtime, taille, inode)
+- écriture: fichier temporaire dans le même dossier, fsync puis os.replace (jamais de fichier tronqué)
+- écrivains sérialisés par un verrou de thread et un verrou fichier (workers uvicorn)
+"""
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from pathlib import Path
+import json
+import logging
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: verrous limités au processus courant
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FileSignature = Tuple[int, int, int]
+
+
+class SelectionFileStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._signature: Optional[FileSignature] = None
+        self._selected: List[str] = []
+
+    def _stat(self) -> Optional[FileSignature]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    @staticmethod
+    def _decode(data) -> List[str]:
+        if isinstance(data, dict) and isinstance(data.get('selectedBuilds'), list):
+            return data['selectedBuilds']
+        if isinstance(data, list):
+            return data
+        return []
+
+    def read(self) -> List[str]:
+        """Sélection du fichier; un seul stat tant que le fichier n'a pas changé"""
+        signature = self._stat()
+        if signature is None:
+            return []
+        if signature == self._signature:
+            return list(self._selected)
+        with self._lock:
+            signature = self._stat()
+            if signature is not None and signature != self._signature:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        selected = self._decode(json.load(f))
+                except Exception as e:
+                    logger.error(f"Erreur lecture fallback fichier sélection: {e}")
+                    return list(self._selected)
+                self._selected, self._signature = selected, signature
+            return list(self._selected)
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            handle = open(self.path.with_name(f"{self.path.name}.lock"), "a+")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                handle.close()
+
+    def _replace(self, selected: List[str]):
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"selectedBuilds": selected}, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._selected, self._signature = list(selected), self._stat()
+
+    def write(self, selected: List[str]) -> bool:
+        try:
+            with self._write_lock():
+                if self._signature is not None and self._stat() == self._signature and list(selected) == self._selected:
+                    # Contenu identique au fichier: pas de réécriture ni de fsync
+                    return True
+                self._replace(selected)
+            return True
+        except Exception as e:
+            logger.error(f"Erreur écriture fallback fichier sélection: {e}")
+            return False
+
+    def update(self, mutate: Callable[[List[str]], Optional[List[str]]]) -> Tuple[List[str], Optional[List[str]]]:
+        """Lecture-modification-écriture sous verrou: mutate(sélection courante) renvoie la nouvelle sélection,
+        ou None pour ne rien écrire. Retourne (avant, après); lève OSError si l'écriture échoue."""
+        with self._write_lock():
+            current = self.read()
+            updated = mutate(list(current))
+            if updated is not None:
+                self._replace(updated)
+            return current, updated
+
+
+_stores: Dict[Path, SelectionFileStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_file_store(path: Path) -> SelectionFileStore:
+    """Une instance (et donc un cache) par fichier"""
+    path = Path(path)
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(path, SelectionFileStore(path))
+    return store
@@ -0,0 +1,175 @@
+"""
+État de santé MySQL publié en cache
+Une sonde en tâche de fond (SELECT 1) met à jour l'état disponible/indisponible: les accès aux données le
+consultent sans attendre, et basculent sur le fallback fichier sans payer de délai de connexion.
+- DB_HEALTH_INTERVAL: secondes entre deux sondes quand la base répond (défaut 30)
+- base indisponible: nouvelle sonde après 1 s, puis délai doublé jusqu'à DB_HEALTH_BACKOFF_MAX (défaut 60)
+"""
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from ..services import metrics
+from ..services.environment import load_environment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROBE_INTERVAL = 30.0
+PROBE_BACKOFF_INITIAL = 1.0
+DEFAULT_PROBE_BACKOFF_MAX = 60.0
+
+DB_UP = metrics.registry.gauge(
+    "db_up",
+    "Dernier état connu de la base de données (1 disponible, 0 indisponible)",
+)
+
+
+def _probe_database() -> bool:
+    """Sonde synchrone: une connexion du pool et un SELECT 1 (lève une exception si la base ne répond pas)"""
+    from .config import get_connection_pool
+
+    pool = get_connection_pool()
+    if pool is None:
+        raise ConnectionError("pool de connexions indisponible")
+    conn = pool.get_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+    return True
+
+
+class DatabaseHealthMonitor:
+    """État partagé de la base: `available` est une simple lecture, la sonde tourne en arrière-plan"""
+
+    def __init__(self, probe: Callable[[], bool] = _probe_database, interval: Optional[float] = None,
+                 backoff_max: Optional[float] = None):
+        load_environment()
+        self.probe = probe
+        self.interval = interval if interval is not None else float(
+            os.getenv("DB_HEALTH_INTERVAL") or DEFAULT_PROBE_INTERVAL)
+        self.backoff_max = backoff_max if backoff_max is not None else float(
+            os.getenv("DB_HEALTH_BACKOFF_MAX") or DEFAULT_PROBE_BACKOFF_MAX)
+        # None tant qu'aucune sonde n'a abouti: traité comme indisponible
+        self._up: Optional[bool] = None
+        self._lock = threading.Lock()
+        self._backoff = PROBE_BACKOFF_INITIAL
+        self._last_checked: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._failures = 0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._probed: Optional[asyncio.Event] = None
+
+    @property
+    def available(self) -> bool:
+        return self._up is True
+
+    def _publish(self, up: bool, error: Optional[str] = None):
+        with self._lock:
+            changed = self._up is not up
+            self._up = up
+            self._last_checked = time.time()
+            self._last_error = error
+            if up:
+                self._failures = 0
+                self._backoff = PROBE_BACKOFF_INITIAL
+            else:
+                self._failures += 1
+        DB_UP.set(1 if up else 0)
+        if changed and up:
+            logger.info("Base de données disponible")
+        elif changed:
+            logger.warning(f"Base de données indisponible, bascule en mode dégradé: {error}")
+
+    def check(self) -> bool:
+        """Sonde immédiate (bloquante) et publication du résultat"""
+        try:
+            self.probe()
+            self._publish(True)
+        except Exception as e:
+            self._publish(False, str(e))
+        return self.available
+
+    def mark_down(self, error: str):
+        """Signalé par un accès aux données en échec de connexion: bascule immédiate et sonde anticipée"""
+        if self._up is False:
+            return
+        self._publish(False, error)
+        if self._loop is not None and self._wake is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:
+                pass
+
+    def _next_delay(self) -> float:
+        if self.available:
+            return self.interval
+        delay = self._backoff
+        self._backoff = min(self._backoff * 2, self.backoff_max)
+        return delay
+
+    async def _probe_async(self):
+        from .config import run_db
+
+        result = await run_db(self.check, default=None)
+        if result is None and self._up is not False:
+            # Sonde plus longue que DB_QUERY_TIMEOUT: la base est considérée indisponible
+            self._publish(False, "délai de sonde dépassé")
+
+    async def run(self):
+        while True:
+            self._wake.clear()
+            await self._probe_async()
+            self._probed.set()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._next_delay())
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Démarre la sonde périodique sur la boucle courante (lifespan)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._probed = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+
+    async def wait_first_probe(self, timeout: float) -> bool:
+        """Attend le résultat de la première sonde (préchauffage), sans dépasser timeout"""
+        if self._probed is None:
+            return self.available
+        try:
+            await asyncio.wait_for(self._probed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.available
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._loop = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "up": self._up,
+                "last_checked": self._last_checked,
+                "last_error": self._last_error,
+                "consecutive_failures": self._failures,
+            }
+
+
+# Instance partagée par tous les accès MySQL du processus
+db_health = DatabaseHealthMonitor()
@@ -0,0 +1,202 @@
+"""
+Stockage MySQL (serveur externe): requêtes via le pool de config.py, disponibilité publiée par health.py
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from functools import partial
+import logging
+
+from .config import execute_query, execute_update, execute_in_transaction
+from .health import db_health
+from .storage import (
+    StorageBackend, SelectionRow, diff_selection_rows, plan_selection_patch, selection_patch_result
+)
+
+logger = logging.getLogger(__name__)
+
+# Lignes par instruction INSERT/DELETE multi-lignes lors d'une sauvegarde en lot
+SELECTION_BATCH_SIZE = 500
+
+SELECTION_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS user_build_selections (
+    build_type_id VARCHAR(255) PRIMARY KEY,
+    project_name VARCHAR(255) NOT NULL,
+    build_name VARCHAR(500) NOT NULL,
+    is_selected BOOLEAN DEFAULT TRUE,
+    selected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    user_notes TEXT
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+PREFERENCE_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS user_preferences (
+    preference_key VARCHAR(255) PRIMARY KEY,
+    preference_value JSON NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+class MySQLStorage(StorageBackend):
+    name = "mysql"
+    blocking = True
+
+    @property
+    def available(self) -> bool:
+        """État publié par la sonde de santé: simple lecture, aucune connexion ouverte ici"""
+        return db_health.available
+
+    def start(self):
+        db_health.start()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        return await db_health.wait_first_probe(timeout)
+
+    def stop(self):
+        db_health.stop()
+
+    def health(self) -> Dict[str, Any]:
+        return db_health.snapshot()
+
+    # --- Schéma ---
+    def create_selection_table(self):
+        execute_update(SELECTION_TABLE_DDL)
+        logger.info("Table user_build_selections créée/vérifiée avec succès")
+
+    def create_preference_table(self):
+        execute_update(PREFERENCE_TABLE_DDL)
+        logger.info("Table user_preferences créée/vérifiée avec succès")
+
+    # --- Sélections ---
+    def get_selected_builds(self) -> List[str]:
+        results = execute_query("SELECT build_type_id FROM user_build_selections WHERE is_selected = TRUE")
+        return [row['build_type_id'] for row in results]
+
+    def get_build_info(self, build_type_id: str) -> Optional[Dict[str, Any]]:
+        query = """
+        SELECT build_type_id, project_name, build_name, is_selected
+        FROM user_build_selections
+        WHERE build_type_id = %s
+        """
+        result = execute_query(query, (build_type_id,), fetch_one=True)
+        return dict(result) if result else None
+
+    @staticmethod
+    def _upsert_selection(build_type_id: str, project_name: str, build_name: str, is_selected: bool, cursor) -> bool:
+        cursor.execute(
+            "INSERT INTO user_build_selections (build_type_id, project_name, build_name, is_selected) "
+            "VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE project_name = VALUES(project_name), build_name = VALUES(build_name), "
+            "is_selected = VALUES(is_selected), last_updated = NOW()",
+            (build_type_id, project_name, build_name, is_selected)
+        )
+        return True
+
+    def update_selection(self, build_type_id: str, project_name: str, build_name: str, is_selected: bool) -> bool:
+        return bool(execute_in_transaction(partial(
+            self._upsert_selection, build_type_id, project_name, build_name, is_selected
+        )))
+
+    @staticmethod
+    def _apply_selection_diff(desired: Dict[str, SelectionRow], cursor) -> Dict[str, int]:
+        """Dans la transaction: lit l'état courant (verrouillé), puis n'écrit que les lignes modifiées
+        par INSERT ... ON DUPLICATE KEY UPDATE multi-lignes, et supprime les lignes disparues"""
+        cursor.execute(
+            "SELECT build_type_id, project_name, build_name, is_selected FROM user_build_selections FOR UPDATE"
+        )
+        current = {
+            row['build_type_id']: (row['project_name'], row['build_name'], bool(row['is_selected']))
+            for row in cursor.fetchall()
+        }
+        changed, removed, stats = diff_selection_rows(current, desired)
+
+        for offset in range(0, len(changed), SELECTION_BATCH_SIZE):
+            batch = changed[offset:offset + SELECTION_BATCH_SIZE]
+            placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(batch))
+            cursor.execute(
+                "INSERT INTO user_build_selections (build_type_id, project_name, build_name, is_selected) "
+                f"VALUES {placeholders} "
+                "ON DUPLICATE KEY UPDATE project_name = VALUES(project_name), build_name = VALUES(build_name), "
+                "is_selected = VALUES(is_selected), last_updated = NOW()",
+                tuple(value for row in batch for value in row)
+            )
+        for offset in range(0, len(removed), SELECTION_BATCH_SIZE):
+            batch = removed[offset:offset + SELECTION_BATCH_SIZE]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(f"DELETE FROM user_build_selections WHERE build_type_id IN ({placeholders})", tuple(batch))
+        return stats
+
+    def replace_selections(self, desired: Dict[str, SelectionRow]) -> Optional[Dict[str, int]]:
+        return execute_in_transaction(partial(self._apply_selection_diff, desired))
+
+    @staticmethod
+    def _apply_selection_patch(add: List[str], remove: List[str], base_version: Optional[str],
+                               build_info: Dict[str, Tuple[str, str]], fallback: Callable[[], List[str]],
+                               cursor) -> Dict[str, Any]:
+        """Dans la transaction: vérifie la version de base puis n'écrit que les builds ajoutés/retirés"""
+        cursor.execute(
+            "SELECT build_type_id FROM user_build_selections WHERE is_selected = TRUE FOR UPDATE"
+        )
+        stored = [row['build_type_id'] for row in cursor.fetchall()]
+        plan = plan_selection_patch(stored, fallback, add, remove, base_version)
+        if plan["conflict"]:
+            return plan
+
+        to_select = plan["to_select"]
+        for offset in range(0, len(to_select), SELECTION_BATCH_SIZE):
+            batch = to_select[offset:offset + SELECTION_BATCH_SIZE]
+            placeholders = ", ".join(["(%s, %s, %s, TRUE)"] * len(batch))
+            params = []
+            for build_id in batch:
+                project_name, build_name = build_info.get(build_id, ("Unknown", build_id))
+                params.extend((build_id, project_name, build_name))
+            # Les noms existants sont conservés: seule une sauvegarde complète les rafraîchit
+            cursor.execute(
+                "INSERT INTO user_build_selections (build_type_id, project_name, build_name, is_selected) "
+                f"VALUES {placeholders} "
+                "ON DUPLICATE KEY UPDATE is_selected = TRUE, last_updated = NOW()",
+                tuple(params)
+            )
+        to_unselect = plan["to_unselect"]
+        for offset in range(0, len(to_unselect), SELECTION_BATCH_SIZE):
+            batch = to_unselect[offset:offset + SELECTION_BATCH_SIZE]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(
+                "UPDATE user_build_selections SET is_selected = FALSE, last_updated = NOW() "
+                f"WHERE build_type_id IN ({placeholders})",
+                tuple(batch)
+            )
+        return selection_patch_result(plan)
+
+    def patch_selections(self, add: List[str], remove: List[str], base_version: Optional[str],
+                         build_info: Dict[str, Tuple[str, str]],
+                         fallback: Callable[[], List[str]]) -> Optional[Dict[str, Any]]:
+        return execute_in_transaction(partial(
+            self._apply_selection_patch, add, remove, base_version, build_info, fallback
+        ))
+
+    def clear_selections(self) -> bool:
+        return execute_update("DELETE FROM user_build_selections") > 0
+
+    # --- Préférences ---
+    def get_preference(self, key: str) -> Optional[Any]:
+        query = "SELECT preference_value FROM user_preferences WHERE preference_key = %s"
+        result = execute_query(query, (key,), fetch_one=True)
+        return result['preference_value'] if result else None
+
+    @staticmethod
+    def _upsert_preference(key: str, json_value: str, cursor) -> bool:
+        cursor.execute(
+            "INSERT INTO user_preferences (preference_key, preference_value) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE preference_value = VALUES(preference_value), updated_at = NOW()",
+            (key, json_value)
+        )
+        return True
+
+    def set_preference(self, key: str, json_value: str) -> bool:
+        return bool(execute_in_transaction(partial(self._upsert_preference, key, json_value)))
+
+    def get_all_preferences(self) -> List[Tuple[str, Any]]:
+        results = execute_query("SELECT preference_key, preference_value FROM user_preferences")
+        return [(row['preference_key'], row['preference_value']) for row in results]
@@ -0,0 +1,247 @@
+"""
+Stockage SQLite embarqué (mode WAL): sélections et préférences lues dans le processus, sans serveur externe.
+Une connexion par thread; les écritures passent par BEGIN IMMEDIATE (un seul écrivain à la fois, y compris
+entre workers uvicorn), les lectures ne sont jamais bloquées par une écriture.
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from pathlib import Path
+import logging
+import sqlite3
+import threading
+import time
+
+from ..services import metrics
+from ..services import timing
+from .storage import (
+    StorageBackend, SelectionRow, may_block, diff_selection_rows, plan_selection_patch, selection_patch_result
+)
+
+logger = logging.getLogger(__name__)
+
+# Attente max d'un verrou d'écriture détenu par un autre worker
+BUSY_TIMEOUT = 5.0
+
+SELECTION_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS user_build_selections (
+    build_type_id TEXT PRIMARY KEY,
+    project_name TEXT NOT NULL,
+    build_name TEXT NOT NULL,
+    is_selected INTEGER NOT NULL DEFAULT 1,
+    selected_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
+    user_notes TEXT
+) WITHOUT ROWID
+"""
+SELECTION_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS idx_user_build_selections_selected ON user_build_selections (is_selected)"
+)
+
+PREFERENCE_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS user_preferences (
+    preference_key TEXT PRIMARY KEY,
+    preference_value TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID
+"""
+
+UPSERT_SELECTION = (
+    "INSERT INTO user_build_selections (build_type_id, project_name, build_name, is_selected) "
+    "VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(build_type_id) DO UPDATE SET project_name = excluded.project_name, "
+    "build_name = excluded.build_name, is_selected = excluded.is_selected, last_updated = CURRENT_TIMESTAMP"
+)
+
+
+class SQLiteStorage(StorageBackend):
+    """Lectures exécutées directement (WAL: jamais bloquées); écritures (@may_block) dans l'exécuteur DB, car
+    BEGIN IMMEDIATE peut attendre jusqu'à BUSY_TIMEOUT le verrou d'un autre worker"""
+
+    name = "sqlite"
+    blocking = False
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._error: Optional[str] = None
+        self._ready = self._open()
+
+    def _open(self) -> bool:
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._connect()
+            return True
+        except Exception as e:
+            self._error = str(e)
+            logger.error(f"Base SQLite {self.db_path} inaccessible (mode dégradé): {e}")
+            return False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT, isolation_level=None,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _timed(self, operation: str) -> Iterator[None]:
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            metrics.DB_QUERY_DURATION.observe(duration, operation=operation, outcome=outcome)
+            timing.record("db", duration)
+
+    def _query(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._timed("query"):
+            return self._connect().execute(query, params).fetchall()
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        """work(conn) dans BEGIN IMMEDIATE ... COMMIT; None (après ROLLBACK) en cas d'erreur"""
+        conn = self._connect()
+        with self._timed("transaction"):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                result = work(conn)
+                conn.execute("COMMIT")
+                return result
+            except Exception as e:
+                logger.error(f"Erreur lors de la transaction SQLite, annulation : {e}")
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                return None
+
+    @property
+    def available(self) -> bool:
+        return self._ready
+
+    def stop(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+    def health(self) -> Dict[str, Any]:
+        return {"up": self._ready, "path": str(self.db_path), "last_error": self._error}
+
+    # --- Schéma ---
+    @may_block
+    def create_selection_table(self):
+        conn = self._connect()
+        conn.execute(SELECTION_TABLE_DDL)
+        conn.execute(SELECTION_INDEX_DDL)
+        logger.info("Table SQLite user_build_selections créée/vérifiée avec succès")
+
+    @may_block
+    def create_preference_table(self):
+        self._connect().execute(PREFERENCE_TABLE_DDL)
+        logger.info("Table SQLite user_preferences créée/vérifiée avec succès")
+
+    # --- Sélections ---
+    def get_selected_builds(self) -> List[str]:
+        rows = self._query("SELECT build_type_id FROM user_build_selections WHERE is_selected = 1")
+        return [row['build_type_id'] for row in rows]
+
+    def get_build_info(self, build_type_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT build_type_id, project_name, build_name, is_selected "
+            "FROM user_build_selections WHERE build_type_id = ?",
+            (build_type_id,)
+        )
+        if not rows:
+            return None
+        info = dict(rows[0])
+        info['is_selected'] = bool(info['is_selected'])
+        return info
+
+    @may_block
+    def update_selection(self, build_type_id: str, project_name: str, build_name: str, is_selected: bool) -> bool:
+        def work(conn):
+            conn.execute(UPSERT_SELECTION, (build_type_id, project_name, build_name, int(is_selected)))
+            return True
+        return bool(self._transaction(work))
+
+    @may_block
+    def replace_selections(self, desired: Dict[str, SelectionRow]) -> Optional[Dict[str, int]]:
+        def work(conn):
+            rows = conn.execute(
+                "SELECT build_type_id, project_name, build_name, is_selected FROM user_build_selections"
+            ).fetchall()
+            current = {
+                row['build_type_id']: (row['project_name'], row['build_name'], bool(row['is_selected']))
+                for row in rows
+            }
+            changed, removed, stats = diff_selection_rows(current, desired)
+            conn.executemany(UPSERT_SELECTION, [(b, p, n, int(s)) for b, p, n, s in changed])
+            conn.executemany("DELETE FROM user_build_selections WHERE build_type_id = ?", [(b,) for b in removed])
+            return stats
+        return self._transaction(work)
+
+    @may_block
+    def patch_selections(self, add: List[str], remove: List[str], base_version: Optional[str],
+                         build_info: Dict[str, Tuple[str, str]],
+                         fallback: Callable[[], List[str]]) -> Optional[Dict[str, Any]]:
+        def work(conn):
+            rows = conn.execute("SELECT build_type_id FROM user_build_selections WHERE is_selected = 1").fetchall()
+            plan = plan_selection_patch([row['build_type_id'] for row in rows], fallback, add, remove, base_version)
+            if plan["conflict"]:
+                return plan
+            # Les noms existants sont conservés: seule une sauvegarde complète les rafraîchit
+            conn.executemany(
+                "INSERT INTO user_build_selections (build_type_id, project_name, build_name, is_selected) "
+                "VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(build_type_id) DO UPDATE SET is_selected = 1, last_updated = CURRENT_TIMESTAMP",
+                [(build_id, *build_info.get(build_id, ("Unknown", build_id))) for build_id in plan["to_select"]]
+            )
+            conn.executemany(
+                "UPDATE user_build_selections SET is_selected = 0, last_updated = CURRENT_TIMESTAMP "
+                "WHERE build_type_id = ?",
+                [(build_id,) for build_id in plan["to_unselect"]]
+            )
+            return selection_patch_result(plan)
+        return self._transaction(work)
+
+    @may_block
+    def clear_selections(self) -> bool:
+        def work(conn):
+            return conn.execute("DELETE FROM user_build_selections").rowcount > 0
+        return bool(self._transaction(work))
+
+    # --- Préférences ---
+    def get_preference(self, key: str) -> Optional[Any]:
+        rows = self._query("SELECT preference_value FROM user_preferences WHERE preference_key = ?", (key,))
+        return rows[0]['preference_value'] if rows else None
+
+    @may_block
+    def set_preference(self, key: str, json_value: str) -> bool:
+        def work(conn):
+            conn.execute(
+                "INSERT INTO user_preferences (preference_key, preference_value) VALUES (?, ?) "
+                "ON CONFLICT(preference_key) DO UPDATE SET preference_value = excluded.preference_value, "
+                "updated_at = CURRENT_TIMESTAMP",
+                (key, json_value)
+            )
+            return True
+        return bool(self._transaction(work))
+
+    def get_all_preferences(self) -> List[Tuple[str, Any]]:
+        rows = self._query("SELECT preference_key, preference_value FROM user_preferences")
+        return [(row['preference_key'], row['preference_value']) for row in rows]
@@ -0,0 +1,196 @@
+"""
+Stockage des sélections de builds et des préférences utilisateur
+- STORAGE_BACKEND=mysql (défaut): serveur MySQL (pool mysql.connector + sonde de santé)
+- STORAGE_BACKEND=sqlite: base SQLite embarquée en mode WAL (STORAGE_SQLITE_PATH), sans serveur externe
+Les modèles (api/models/user_selection.py) ne passent que par cette interface.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import threading
+
+from ..services.environment import load_environment
+
+logger = logging.getLogger(__name__)
+
+# (project_name, build_name, is_selected) par buildTypeId
+SelectionRow = Tuple[str, str, bool]
+
+DEFAULT_SQLITE_PATH = "data/teamcity_monitor.sqlite3"
+
+
+def may_block(func: Callable) -> Callable:
+    """Méthode d'un backend non bloquant qui peut attendre (verrou d'écriture): exécutée dans l'exécuteur DB"""
+    func.blocking = True
+    return func
+
+
+def selection_version(build_ids) -> str:
+    """Version d'une sélection: empreinte du contenu trié (indépendante de l'ordre et du stockage)"""
+    digest = hashlib.sha256("\n".join(sorted(set(build_ids))).encode("utf-8")).hexdigest()
+    return digest[:16]
+
+
+def patched_selection(current: List[str], add: List[str], remove: List[str]) -> List[str]:
+    removed = set(remove)
+    result = [build_id for build_id in current if build_id not in removed]
+    present = set(result)
+    result.extend(build_id for build_id in dict.fromkeys(add) if build_id not in present)
+    return result
+
+
+def diff_selection_rows(current: Dict[str, SelectionRow], desired: Dict[str, SelectionRow]):
+    """Lignes à écrire (nouvelles ou modifiées), lignes à supprimer et statistiques du diff"""
+    changed = [
+        (build_id, *values) for build_id, values in desired.items()
+        if current.get(build_id) != values
+    ]
+    removed = [build_id for build_id in current if build_id not in desired]
+    inserted = sum(1 for row in changed if row[0] not in current)
+    stats = {
+        "inserted": inserted,
+        "updated": len(changed) - inserted,
+        "deleted": len(removed),
+        "unchanged": len(desired) - len(changed)
+    }
+    return changed, removed, stats
+
+
+def plan_selection_patch(stored: List[str], fallback: Callable[[], List[str]], add: List[str],
+                         remove: List[str], base_version: Optional[str]) -> Dict[str, Any]:
+    """Vérifie base_version et calcule les seules lignes à (dé)sélectionner"""
+    # Même règle que get_selected_builds: un stockage vide est complété par le fallback fichier
+    current = stored or fallback()
+    version = selection_version(current)
+    if base_version and base_version != version:
+        return {"conflict": True, "selected": current, "version": version}
+
+    selected = patched_selection(current, add, remove)
+    stored_set, target = set(stored), set(selected)
+    return {
+        "conflict": False,
+        "selected": selected,
+        "version": selection_version(selected),
+        "added": len(target - set(current)),
+        "removed": len(set(current) - target),
+        "to_select": [build_id for build_id in selected if build_id not in stored_set],
+        "to_unselect": [build_id for build_id in stored if build_id not in target]
+    }
+
+
+def selection_patch_result(plan: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in plan.items() if key not in ("to_select", "to_unselect")}
+
+
+class StorageBackend(ABC):
+    """Interface commune; les méthodes sont synchrones, `call` les exécute selon le coût du backend"""
+
+    name = "base"
+    # True: appels réseau bloquants, exécutés dans l'exécuteur DB borné; False: appels locaux en microsecondes,
+    # sauf les méthodes marquées @may_block
+    blocking = True
+
+    @property
+    @abstractmethod
+    def available(self) -> bool:
+        """Stockage utilisable (sonde de santé, base ouverte)"""
+
+    def start(self):
+        """Démarrage (lifespan): connexions, sondes"""
+
+    async def wait_ready(self, timeout: float) -> bool:
+        return self.available
+
+    def stop(self):
+        """Arrêt (lifespan)"""
+
+    def health(self) -> Dict[str, Any]:
+        return {"up": self.available}
+
+    async def call(self, func: Callable, *args, default: Any = None) -> Any:
+        try:
+            if self.blocking or getattr(func, "blocking", False):
+                from .config import run_db
+                return await run_db(func, *args, default=default)
+            return func(*args)
+        except Exception as e:
+            logger.error(f"Erreur du stockage {self.name}: {e}")
+            return default
+
+    # --- Schéma ---
+    @abstractmethod
+    def create_selection_table(self):
+        """Crée la table des sélections si elle n'existe pas"""
+
+    @abstractmethod
+    def create_preference_table(self):
+        """Crée la table des préférences si elle n'existe pas"""
+
+    # --- Sélections ---
+    @abstractmethod
+    def get_selected_builds(self) -> List[str]:
+        """IDs des buildTypes sélectionnés"""
+
+    @abstractmethod
+    def get_build_info(self, build_type_id: str) -> Optional[Dict[str, Any]]:
+        """Ligne de sélection d'un buildType; None si absente"""
+
+    @abstractmethod
+    def update_selection(self, build_type_id: str, project_name: str, build_name: str, is_selected: bool) -> bool:
+        """(Dé)sélectionne un buildType; False en cas d'échec"""
+
+    @abstractmethod
+    def replace_selections(self, desired: Dict[str, SelectionRow]) -> Optional[Dict[str, int]]:
+        """Amène la table à l'état `desired` en une transaction; statistiques du diff, None en cas d'échec"""
+
+    @abstractmethod
+    def patch_selections(self, add: List[str], remove: List[str], base_version: Optional[str],
+                         build_info: Dict[str, Tuple[str, str]],
+                         fallback: Callable[[], List[str]]) -> Optional[Dict[str, Any]]:
+        """Ajouts/retraits transactionnels avec contrôle de version; None en cas d'échec"""
+
+    @abstractmethod
+    def clear_selections(self) -> bool:
+        """Vide la sélection; True si des lignes ont été supprimées (False: déjà vide ou échec)"""
+
+    # --- Préférences (valeurs JSON encodées) ---
+    @abstractmethod
+    def get_preference(self, key: str) -> Optional[Any]:
+        """Valeur JSON encodée d'une préférence; None si absente"""
+
+    @abstractmethod
+    def set_preference(self, key: str, json_value: str) -> bool:
+        """Enregistre une préférence (valeur JSON encodée); False en cas d'échec"""
+
+    @abstractmethod
+    def get_all_preferences(self) -> List[Tuple[str, Any]]:
+        """(clé, valeur JSON encodée) de toutes les préférences"""
+
+
+def create_storage() -> StorageBackend:
+    load_environment()
+    backend = (os.getenv("STORAGE_BACKEND") or "mysql").strip().lower()
+    if backend == "sqlite":
+        from .sqlite_storage import SQLiteStorage
+        return SQLiteStorage(os.getenv("STORAGE_SQLITE_PATH") or DEFAULT_SQLITE_PATH)
+    if backend != "mysql":
+        logger.warning(f"STORAGE_BACKEND inconnu '{backend}', utilisation de MySQL")
+    from .mysql_storage import MySQLStorage
+    return MySQLStorage()
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """Backend du processus, créé à la première utilisation"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+                logger.info(f"Stockage des sélections et préférences: {_storage.name}")
+    return _storage
@@ -1,22 +1,71 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, JSONResponse
 from fastapi.staticfiles import StaticFiles
-from .routes import builds, agents
+from contextlib import asynccontextmanager
+from .routes import builds, agents, debug
+from .services import metrics
+from .services import timing
+from .services.environment import load_environment, configure_logging
+from .services.modern_user_service import user_service
+from .services.background_refresh import background_refresher
+from .services.queue_monitor import build_queue_monitor
+from .services.status_scheduler import status_scheduler, SCHEDULER_TICK
+from .services.subscriptions import subscriptions
+from .services.cache_backend import get_cache_backend
+from .database.config import shutdown_db_executor, get_db_config
+from .database.storage import get_storage
+import asyncio
 import os
 import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up(app: FastAPI):
+    """Initialisation différée: tables utilisateur puis catalogue TeamCity, sans bloquer le démarrage"""
+    start = time.perf_counter()
+    try:
+        # Première sonde de santé (MySQL): décide si les tables peuvent être créées maintenant
+        await get_storage().wait_ready(timeout=get_db_config()["connection_timeout"] + 1)
+        await user_service.initialize_tables()
+        await builds.get_build_catalog()
+    except Exception as e:
+        logger.error(f"Erreur pendant le préchauffage (mode dégradé): {e}")
+    finally:
+        app.state.ready = True
+        logger.info(f"Préchauffage terminé en {time.perf_counter() - start:.1f}s")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_environment()
+    configure_logging()
+    app.state.ready = False
+    get_storage().start()
+    # Ouverture du cache partagé (fichier SQLite) au démarrage plutôt qu'à la première requête
+    get_cache_backend()
+    warm_up_task = asyncio.create_task(warm_up(app))
+    # Aucun dashboard ouvert: les rafraîchissements TeamCity sont en pause
+    background_refresher.register("build_queue", build_queue_monitor.poll, build_queue_monitor.interval,
+                                  active=subscriptions.has_sessions)
+    background_refresher.register("build_status", status_scheduler.poll_due, SCHEDULER_TICK,
+                                  active=subscriptions.has_sessions)
+    background_refresher.start()
+    yield
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+    background_refresher.stop()
+    get_storage().stop()
+    shutdown_db_executor()
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
 
 app = FastAPI(
     title="TeamCity Monitor API",
     description="API pour le monitoring des builds TeamCity",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
@@ -28,10 +77,64 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Mesure la durée de chaque requête par route (template, pas l'URL brute)"""
+    start = time.perf_counter()
+    status = "500"
+    metrics.HTTP_REQUESTS_IN_PROGRESS.inc()
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        metrics.HTTP_REQUESTS_IN_PROGRESS.dec()
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        metrics.HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start, method=request.method, route=route_path, status=status
+        )
+        if route_path in metrics.POLLING_ROUTES and request.client:
+            metrics.polling_clients.touch(request.client.host)
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Décomposition par phase (en-tête Server-Timing) et échantillonnage des requêtes lentes"""
+    token = timing.start_request(request.method, request.url.path)
+    request_timing = timing.current_request()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = request_timing.server_timing_header(request_timing.elapsed())
+        return response
+    finally:
+        timing.slow_requests.record(request_timing, request_timing.elapsed(), status)
+        timing.end_request(token)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Métriques au format Prometheus (par worker)"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+@app.get("/api/ready")
+async def get_readiness():
+    """Prêt une fois le préchauffage terminé (503 avant); la base peut rester indisponible (mode dégradé)"""
+    ready = getattr(app.state, "ready", False)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "database": user_service.tables_initialized,
+            "storage": get_storage().name,
+            "database_health": get_storage().health()
+        }
+    )
 
 # Routes principales pour le frontend existant
 app.include_router(builds.router, prefix="/api", tags=["builds"])
 app.include_router(agents.router, prefix="/api", tags=["agents"])
+app.include_router(debug.router, prefix="/api", tags=["debug"])
 # Plus de configurations.router - intégré dans builds.router
 
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
@@ -47,9 +150,16 @@ async def root():
         "endpoints": {
             "builds": "/api/builds",
             "agents": "/api/agents", 
+            "agents_utilization": "/api/agents/utilization",
+            "queue": "/api/queue",
+            "polling": "/api/builds/polling",
             "config": "/api/config",
             "dashboard": "/api/builds/dashboard",
             "tree": "/api/builds/tree",
-            "selection": "/api/builds/tree/selection"
+            "selection": "/api/builds/tree/selection",
+            "selection_patch": "/api/builds/selection",
+            "metrics": "/metrics",
+            "ready": "/api/ready",
+            "slow_requests": "/api/debug/slow-requests"
         }
     } 
\ No newline at end of file
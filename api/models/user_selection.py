@@ -1,94 +1,98 @@
 """
 Modèle moderne pour la sélection utilisateur
 Remplace le système médiocre de fichiers JSON hardcodés
-Compatible avec MySQL existant
+Stockage MySQL ou SQLite embarqué (voir api/database/storage.py), fallback fichier si indisponible
 """
-import mysql.connector
-from datetime import datetime
+import copy
 import json
-from typing import List, Dict, Any, Optional
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
 import logging
-from ..database.config import get_db_connection, execute_query, execute_update
+from ..database.storage import get_storage, selection_version, patched_selection, SelectionRow
+from ..database.file_store import get_file_store
+from ..services.cache_backend import VersionedCache
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Sélection et préférences servies depuis la mémoire; relues après chaque écriture (compteur de version
+# partagé) ou au plus tard après ce délai (modifications faites directement en base)
+STORAGE_CACHE_MAX_AGE = 300.0
+
 class UserBuildSelection:
+    """
+    Modèle moderne pour stocker les sélections de builds utilisateur
+    Remplace user_config.json hardcodé
+    """
     FILE_FALLBACK_PATH = Path("config/selected_builds.json")
+    _cache = VersionedCache("user_selection_version", max_age=STORAGE_CACHE_MAX_AGE)
 
     @staticmethod
-    def _is_db_available() -> bool:
-        try:
-            conn = get_db_connection()
-            if conn is None:
-                return False
-            try:
-                conn.close()
-            except Exception:
-                pass
-            return True
-        except Exception:
-            return False
+    async def _is_db_available() -> bool:
+        """État publié par le stockage (sonde de santé MySQL, base SQLite ouverte): aucune connexion ici"""
+        return get_storage().available
+
+    @staticmethod
+    def _file_store():
+        return get_file_store(UserBuildSelection.FILE_FALLBACK_PATH)
 
     @staticmethod
     def _read_file_fallback() -> List[str]:
-        try:
-            if UserBuildSelection.FILE_FALLBACK_PATH.exists():
-                with open(UserBuildSelection.FILE_FALLBACK_PATH, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, dict) and isinstance(data.get('selectedBuilds'), list):
-                        return data['selectedBuilds']
-                    if isinstance(data, list):
-                        return data
-        except Exception as e:
-            logger.error(f"Erreur lecture fallback fichier sélection: {e}")
-        return []
+        return UserBuildSelection._file_store().read()
 
     @staticmethod
     def _write_file_fallback(selected_build_ids: List[str]) -> bool:
+        return UserBuildSelection._file_store().write(selected_build_ids)
+    
+    @staticmethod
+    async def _write(func, *args, default=None):
+        """Écriture dans le stockage puis invalidation du cache (même en cas d'échec ou de délai dépassé:
+        une transaction abandonnée côté appelant peut encore aboutir)"""
         try:
-            UserBuildSelection.FILE_FALLBACK_PATH.parent.mkdir(parents=True, exist_ok=True)
-            with open(UserBuildSelection.FILE_FALLBACK_PATH, 'w', encoding='utf-8') as f:
-                json.dump({"selectedBuilds": selected_build_ids}, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            logger.error(f"Erreur écriture fallback fichier sélection: {e}")
-            return False
-    """
-    Modèle moderne pour stocker les sélections de builds utilisateur
-    Remplace user_config.json hardcodé - Compatible MySQL
-    """
+            return await get_storage().call(func, *args, default=default)
+        finally:
+            UserBuildSelection._cache.invalidate()
     
     @staticmethod
-    def create_table():
+    async def create_table():
         """Crée la table si elle n'existe pas"""
-        query = """
-        CREATE TABLE IF NOT EXISTS user_build_selections (
-            build_type_id VARCHAR(255) PRIMARY KEY,
-            project_name VARCHAR(255) NOT NULL,
-            build_name VARCHAR(500) NOT NULL,
-            is_selected BOOLEAN DEFAULT TRUE,
-            selected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            user_notes TEXT
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        """
-        try:
-            execute_update(query)
-            logger.info("Table user_build_selections créée/vérifiée avec succès")
-        except Exception as e:
-            logger.error(f"Erreur lors de la création de la table user_build_selections: {e}")
-            raise
+        storage = get_storage()
+        await storage.call(storage.create_selection_table)
+    
+    @staticmethod
+    async def import_file_fallback() -> int:
+        """Migration: reprend dans le stockage une sélection qui n'existe que dans le fallback fichier"""
+        storage = get_storage()
+        stored = await storage.call(storage.get_selected_builds, default=None)
+        if stored is None or stored:
+            return 0
+        file_selected = UserBuildSelection._read_file_fallback()
+        if not file_selected:
+            return 0
+        result = await UserBuildSelection._write(
+            storage.patch_selections, file_selected, [], None, {}, lambda: [], default=None
+        )
+        if result is None:
+            return 0
+        logger.info(f"Migration du fallback fichier vers le stockage {storage.name}: {result['added']} builds sélectionnés")
+        return result["added"]
     
     @staticmethod
-    def get_selected_builds() -> List[str]:
+    async def get_selected_builds() -> List[str]:
         """Récupère tous les builds sélectionnés"""
         try:
-            if not UserBuildSelection._is_db_available():
+            storage = get_storage()
+            if not storage.available:
                 return UserBuildSelection._read_file_fallback()
-            query = "SELECT build_type_id FROM user_build_selections WHERE is_selected = TRUE"
-            results = execute_query(query)
-            selected = [row['build_type_id'] for row in results]
+            found, selected, version = UserBuildSelection._cache.get()
+            if not found:
+                selected = await storage.call(storage.get_selected_builds, default=None)
+                if selected is None:
+                    return UserBuildSelection._read_file_fallback()
+                # Pas de mise en cache d'une lecture interrompue par une perte de connexion
+                if storage.available:
+                    UserBuildSelection._cache.store(version, selected)
+            selected = list(selected)
             # Si la base est accessible mais ne contient rien, tenter le fallback fichier
             if not selected:
                 file_selected = UserBuildSelection._read_file_fallback()
@@ -102,101 +106,91 @@ class UserBuildSelection:
             return UserBuildSelection._read_file_fallback()
     
     @staticmethod
-    def get_build_info(build_type_id: str) -> Optional[Dict[str, Any]]:
+    async def get_build_info(build_type_id: str) -> Optional[Dict[str, Any]]:
         """Récupère les informations d'un build spécifique"""
         try:
-            query = """
-            SELECT build_type_id, project_name, build_name, is_selected 
-            FROM user_build_selections 
-            WHERE build_type_id = %s
-            """
-            result = execute_query(query, (build_type_id,), fetch_one=True)
-            return dict(result) if result else None
+            storage = get_storage()
+            if not storage.available:
+                return None
+            return await storage.call(storage.get_build_info, build_type_id, default=None)
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des infos du build {build_type_id}: {e}")
             return None
     
     @staticmethod
-    def update_selection(build_type_id: str, project_name: str, build_name: str, is_selected: bool) -> bool:
+    def _update_file_fallback(build_type_id: str, is_selected: bool) -> bool:
+        def mutate(current: List[str]) -> List[str]:
+            selected = set(current)
+            if is_selected:
+                selected.add(build_type_id)
+            else:
+                selected.discard(build_type_id)
+            return sorted(selected)
+        try:
+            UserBuildSelection._file_store().update(mutate)
+            return True
+        except Exception as e:
+            logger.error(f"Erreur écriture fallback fichier sélection: {e}")
+            return False
+    
+    @staticmethod
+    async def update_selection(build_type_id: str, project_name: str, build_name: str, is_selected: bool) -> bool:
         """Met à jour ou insère une sélection"""
         try:
-            if not UserBuildSelection._is_db_available():
+            storage = get_storage()
+            if not storage.available:
                 # Mettre à jour via fichier fallback
-                current = set(UserBuildSelection._read_file_fallback())
-                if is_selected:
-                    current.add(build_type_id)
-                else:
-                    current.discard(build_type_id)
-                return UserBuildSelection._write_file_fallback(sorted(current))
-            # Vérifier si existe
-            check_query = "SELECT build_type_id FROM user_build_selections WHERE build_type_id = %s"
-            existing = execute_query(check_query, (build_type_id,), fetch_one=True)
-            
-            if existing:
-                # Mettre à jour
-                update_query = """
-                UPDATE user_build_selections 
-                SET project_name = %s, build_name = %s, is_selected = %s, last_updated = NOW()
-                WHERE build_type_id = %s
-                """
-                execute_update(update_query, (project_name, build_name, is_selected, build_type_id))
-            else:
-                # Insérer
-                insert_query = """
-                INSERT INTO user_build_selections (build_type_id, project_name, build_name, is_selected)
-                VALUES (%s, %s, %s, %s)
-                """
-                execute_update(insert_query, (build_type_id, project_name, build_name, is_selected))
-            
-            return True
+                return UserBuildSelection._update_file_fallback(build_type_id, is_selected)
+            if await UserBuildSelection._write(storage.update_selection, build_type_id, project_name, build_name, is_selected,
+                                  default=False):
+                return True
+            return UserBuildSelection._update_file_fallback(build_type_id, is_selected)
         except Exception as e:
             logger.error(f"Erreur lors de la mise à jour de la sélection: {e}")
             # Fallback fichier
-            try:
-                current = set(UserBuildSelection._read_file_fallback())
-                if is_selected:
-                    current.add(build_type_id)
-                else:
-                    current.discard(build_type_id)
-                return UserBuildSelection._write_file_fallback(sorted(current))
-            except Exception:
-                return False
+            return UserBuildSelection._update_file_fallback(build_type_id, is_selected)
     
     @staticmethod
-    def bulk_update_selections(selected_build_ids: List[str], all_builds: List[Dict[str, Any]]) -> bool:
-        """Met à jour toutes les sélections en une fois"""
+    def _desired_rows(selected_build_ids: List[str], all_builds: List[Dict[str, Any]]) -> Dict[str, SelectionRow]:
+        """État cible de la table: tous les builds du catalogue + les sélections absentes du catalogue
+        (TeamCity hors ligne ou build renommé) pour ne jamais perdre une sélection"""
+        selected = set(selected_build_ids)
+        desired: Dict[str, SelectionRow] = {}
+        for build in all_builds:
+            build_id = build.get("buildTypeId")
+            if build_id:
+                desired[build_id] = (
+                    build.get("projectName") or "Unknown",
+                    build.get("name") or build_id,
+                    build_id in selected
+                )
+        for build_id in selected_build_ids:
+            if build_id not in desired:
+                desired[build_id] = ("Unknown", build_id, True)
+        return desired
+
+    @staticmethod
+    async def bulk_update_selections(selected_build_ids: List[str], all_builds: List[Dict[str, Any]]) -> bool:
+        """Met à jour toutes les sélections en une fois: diff avec l'état courant, appliqué dans une seule
+        transaction (les lecteurs voient l'ancien ou le nouvel état, jamais une table à moitié vide)"""
         try:
-            if not UserBuildSelection._is_db_available():
+            storage = get_storage()
+            if not storage.available:
+                return UserBuildSelection._write_file_fallback(selected_build_ids)
+
+            desired = UserBuildSelection._desired_rows(selected_build_ids, all_builds)
+            stats = await UserBuildSelection._write(storage.replace_selections, desired, default=None)
+            if stats is None:
+                logger.error("Échec de la transaction de sélection, conservation via fallback fichier")
                 return UserBuildSelection._write_file_fallback(selected_build_ids)
-            # Fallback: si aucune liste de builds complète n'est disponible (TeamCity hors ligne),
-            # créer une liste artificielle à partir des IDs sélectionnés pour ne pas perdre la sélection.
-            if not all_builds:
-                all_builds = [
-                    {
-                        "buildTypeId": build_id,
-                        "projectName": "Unknown",
-                        "name": build_id
-                    }
-                    for build_id in selected_build_ids
-                ]
 
-            # Supprimer toutes les anciennes sélections
-            execute_update("DELETE FROM user_build_selections")
-            
-            # Insérer les nouvelles sélections
-            for build in all_builds:
-                build_id = build.get("buildTypeId")
-                if build_id:
-                    UserBuildSelection.update_selection(
-                        build_id,
-                        build.get("projectName", "Unknown"),
-                        build.get("name", build_id),
-                        build_id in selected_build_ids
-                    )
-            
             # Toujours écrire un fallback fichier pour robustesse et lecture rapide côté dashboard
             UserBuildSelection._write_file_fallback(selected_build_ids)
-            logger.info(f"Mise à jour en lot réussie: {len(selected_build_ids)} builds sélectionnés")
+            logger.info(
+                f"Mise à jour en lot réussie: {len(selected_build_ids)} builds sélectionnés "
+                f"({stats['inserted']} insérés, {stats['updated']} modifiés, {stats['deleted']} supprimés, "
+                f"{stats['unchanged']} inchangés)"
+            )
             return True
         except Exception as e:
             logger.error(f"Erreur lors de la mise à jour en lot: {e}")
@@ -204,11 +198,62 @@ class UserBuildSelection:
             return UserBuildSelection._write_file_fallback(selected_build_ids)
     
     @staticmethod
-    def clear_all_selections() -> bool:
+    def selection_version(build_ids) -> str:
+        """Version d'une sélection: empreinte du contenu trié (indépendante de l'ordre et du stockage)"""
+        return selection_version(build_ids)
+
+    @staticmethod
+    def _patch_file_fallback(add: List[str], remove: List[str], base_version: Optional[str]) -> Optional[Dict[str, Any]]:
+        def mutate(current: List[str]) -> Optional[List[str]]:
+            if base_version and base_version != selection_version(current):
+                return None
+            return patched_selection(current, add, remove)
+        try:
+            current, selected = UserBuildSelection._file_store().update(mutate)
+        except Exception as e:
+            logger.error(f"Erreur écriture fallback fichier sélection: {e}")
+            return None
+        if selected is None:
+            return {"conflict": True, "selected": current, "version": selection_version(current)}
+        return {
+            "conflict": False,
+            "selected": selected,
+            "version": selection_version(selected),
+            "added": len(set(selected) - set(current)),
+            "removed": len(set(current) - set(selected))
+        }
+
+    @staticmethod
+    async def patch_selection(add: List[str], remove: List[str], base_version: Optional[str] = None,
+                              build_info: Optional[Dict[str, Tuple[str, str]]] = None) -> Optional[Dict[str, Any]]:
+        """Applique des ajouts/retraits à la sélection (concurrence optimiste sur base_version).
+        Retourne {conflict, selected, version, ...} ou None en cas d'échec."""
+        try:
+            storage = get_storage()
+            if not storage.available:
+                return UserBuildSelection._patch_file_fallback(add, remove, base_version)
+
+            result = await UserBuildSelection._write(
+                storage.patch_selections, add, remove, base_version, build_info or {},
+                UserBuildSelection._read_file_fallback, default=None
+            )
+            if result is None:
+                logger.error("Échec de la transaction de modification de sélection")
+                return None
+            if not result["conflict"]:
+                UserBuildSelection._write_file_fallback(result["selected"])
+                logger.info(f"Sélection modifiée: +{result['added']} / -{result['removed']} builds")
+            return result
+        except Exception as e:
+            logger.error(f"Erreur lors de la modification de la sélection: {e}")
+            return None
+
+    @staticmethod
+    async def clear_all_selections() -> bool:
         """Supprime toutes les sélections"""
         try:
-            execute_update("DELETE FROM user_build_selections")
-            return True
+            storage = get_storage()
+            return bool(await UserBuildSelection._write(storage.clear_selections, default=False))
         except Exception as e:
             logger.error(f"Erreur lors de la suppression des sélections: {e}")
             return False
@@ -216,84 +261,78 @@ class UserBuildSelection:
 class UserPreferences:
     """
     Préférences générales de l'utilisateur
-    Remplace dashboard_config.json hardcodé - Compatible MySQL
+    Remplace dashboard_config.json hardcodé
     """
+    # (préférences décodées, version) chargées une fois, invalidées par set_preference
+    _cache = VersionedCache("user_preferences_version", max_age=STORAGE_CACHE_MAX_AGE)
     
     @staticmethod
-    def create_table():
+    def _decode(value: Any) -> Any:
+        return json.loads(value) if isinstance(value, str) else value
+    
+    @staticmethod
+    def preferences_version(preferences: Dict[str, Any]) -> str:
+        """Empreinte du contenu des préférences (ETag de /api/config)"""
+        encoded = json.dumps(preferences, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+    
+    @staticmethod
+    async def create_table():
         """Crée la table si elle n'existe pas"""
-        query = """
-        CREATE TABLE IF NOT EXISTS user_preferences (
-            preference_key VARCHAR(255) PRIMARY KEY,
-            preference_value JSON NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        """
-        try:
-            execute_update(query)
-            logger.info("Table user_preferences créée/vérifiée avec succès")
-        except Exception as e:
-            logger.error(f"Erreur lors de la création de la table user_preferences: {e}")
-            raise
+        storage = get_storage()
+        await storage.call(storage.create_preference_table)
+    
+    @staticmethod
+    async def get_preferences_snapshot() -> Tuple[Dict[str, Any], str]:
+        """(préférences, version) servies depuis la mémoire; le stockage n'est lu qu'après une modification"""
+        storage = get_storage()
+        found, snapshot, version = UserPreferences._cache.get()
+        if not found:
+            preferences = copy.deepcopy(DEFAULT_USER_PREFERENCES)
+            rows = await storage.call(storage.get_all_preferences, default=None) if storage.available else None
+            if rows is None:
+                return preferences, UserPreferences.preferences_version(preferences)
+            for key, value in rows:
+                preferences[key] = UserPreferences._decode(value)
+            snapshot = (preferences, UserPreferences.preferences_version(preferences))
+            if storage.available:
+                UserPreferences._cache.store(version, snapshot)
+        # Copie: l'appelant peut modifier le résultat sans altérer le cache partagé
+        preferences, preferences_version = snapshot
+        return copy.deepcopy(preferences), preferences_version
     
     @staticmethod
-    def get_preference(key: str, default_value: Any = None) -> Any:
+    async def get_preference(key: str, default_value: Any = None) -> Any:
         """Récupère une préférence"""
         try:
-            query = "SELECT preference_value FROM user_preferences WHERE preference_key = %s"
-            result = execute_query(query, (key,), fetch_one=True)
-            
-            if result:
-                return json.loads(result['preference_value']) if isinstance(result['preference_value'], str) else result['preference_value']
-            
-            # Retourner la valeur par défaut si elle existe
-            if key in DEFAULT_USER_PREFERENCES:
-                return DEFAULT_USER_PREFERENCES[key]
-            
-            return default_value
+            preferences, _ = await UserPreferences.get_preferences_snapshot()
+            return preferences.get(key, default_value)
         except Exception as e:
             logger.error(f"Erreur lors de la récupération de la préférence {key}: {e}")
             return default_value
     
     @staticmethod
-    def set_preference(key: str, value: Any) -> bool:
+    async def set_preference(key: str, value: Any) -> bool:
         """Définit une préférence"""
         try:
+            storage = get_storage()
+            if not storage.available:
+                return False
             json_value = json.dumps(value, ensure_ascii=False)
-            
-            # Vérifier si existe
-            check_query = "SELECT preference_key FROM user_preferences WHERE preference_key = %s"
-            existing = execute_query(check_query, (key,), fetch_one=True)
-            
-            if existing:
-                # Mettre à jour
-                update_query = "UPDATE user_preferences SET preference_value = %s, updated_at = NOW() WHERE preference_key = %s"
-                execute_update(update_query, (json_value, key))
-            else:
-                # Insérer
-                insert_query = "INSERT INTO user_preferences (preference_key, preference_value) VALUES (%s, %s)"
-                execute_update(insert_query, (key, json_value))
-            
-            return True
+            try:
+                return bool(await storage.call(storage.set_preference, key, json_value, default=False))
+            finally:
+                UserPreferences._cache.invalidate()
         except Exception as e:
             logger.error(f"Erreur lors de la définition de la préférence {key}: {e}")
             return False
     
     @staticmethod
-    def get_all_preferences() -> Dict[str, Any]:
+    async def get_all_preferences() -> Dict[str, Any]:
         """Récupère toutes les préférences"""
         try:
-            query = "SELECT preference_key, preference_value FROM user_preferences"
-            results = execute_query(query)
-            
-            preferences = DEFAULT_USER_PREFERENCES.copy()
-            for row in results:
-                key = row['preference_key']
-                value = json.loads(row['preference_value']) if isinstance(row['preference_value'], str) else row['preference_value']
-                preferences[key] = value
-            
-            return preferences
+            preferences, _ = await UserPreferences.get_preferences_snapshot()
+            return dict(preferences)
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des préférences: {e}")
             return DEFAULT_USER_PREFERENCES.copy()
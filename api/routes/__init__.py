@@ -1,3 +1,3 @@
-from . import builds, agents
+from . import builds, agents, debug
 
-__all__ = ['builds', 'agents'] 
\ No newline at end of file
+__all__ = ['builds', 'agents', 'debug']
\ No newline at end of file
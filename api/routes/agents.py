@@ -1,24 +1,18 @@
 from fastapi import APIRouter
 import requests
-import os
 import xml.etree.ElementTree as ET
 import logging
+from ..services.teamcity_fetcher import teamcity_url, _get_headers
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-TEAMCITY_URL = os.getenv('TEAMCITY_URL', 'http://192.168.0.48:8080')
-TEAMCITY_TOKEN = os.getenv('TEAMCITY_TOKEN', '')
-
 @router.get("/agents")
 def get_agents():
     """Endpoint principal pour récupérer les agents TeamCity avec leurs vrais statuts"""
     try:
-        url = f"{TEAMCITY_URL}/app/rest/agents?fields=agent(id,name,connected,enabled,authorized,typeId,uptodate)"
-        headers = {
-            'Authorization': f'Bearer {TEAMCITY_TOKEN}',
-            'Accept': 'application/xml'
-        }
+        url = f"{teamcity_url()}/app/rest/agents?fields=agent(id,name,connected,enabled,authorized,typeId,uptodate)"
+        headers = _get_headers()
         response = requests.get(url, headers=headers, timeout=10)
         response.raise_for_status()
         
@@ -62,11 +56,8 @@ def get_agents():
 def get_teamcity_agents():
     """Endpoint de compatibilité pour l'ancien système"""
     try:
-        url = f"{TEAMCITY_URL}/app/rest/agents"
-        headers = {
-            'Authorization': f'Bearer {TEAMCITY_TOKEN}',
-            'Accept': 'application/xml'
-        }
+        url = f"{teamcity_url()}/app/rest/agents"
+        headers = _get_headers()
         response = requests.get(url, headers=headers, timeout=10)
         response.raise_for_status()
         
@@ -1,45 +1,59 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.concurrency import run_in_threadpool
-from ..services.teamcity_fetcher import fetch_teamcity_agents, fetch_all_teamcity_builds, enrich_builds_with_status
+from ..services.teamcity_fetcher import fetch_teamcity_agents, fetch_all_teamcity_builds
 from ..services.modern_user_service import user_service
+from ..services.build_catalog import BuildCatalog
+from ..services.search_index import BuildSearchIndex
+from ..services.build_tree import BuildTreeIndex, DEFAULT_PAGE_SIZE
+from ..services.agent_utilization import GROUP_BY_VALUES, summarize_agent_utilization
+from ..services.queue_monitor import build_queue_monitor
+from ..services.failure_details import get_failure_summary, get_failure_summaries
+from ..services import build_logs
+from ..services.status_scheduler import status_scheduler
+from ..services.request_policy import status_hedger
+from ..services.subscriptions import subscriptions
+from ..services.cache_backend import get_cache_backend
+from ..services import metrics
+from ..services import timing
 import logging
 import os
 import re
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Copie locale (par worker) des données du cache partagé + structures dérivées.
+# Les "*_stamp" identifient la version partagée adoptée localement.
 cache: Dict[str, Any] = {
     "teamcity_builds": None,
+    "catalog": None,
+    "tree_index": None,
     "teamcity_agents": None,
     "builds_timestamp": None,
     "agents_timestamp": None,
+    "builds_stamp": None,
+    "agents_stamp": None,
     "ttl": timedelta(minutes=10)  # Cache plus long pour éviter les appels répétés
 }
 
+# Attente max du verrou de rafraîchissement détenu par un autre worker
+REFRESH_LOCK_TIMEOUT = 30.0
+# Rappel conseillé au frontend après une réponse partielle du dashboard (statuts en retard)
+PARTIAL_REFRESH_MS = 5000
+
 
 
 @router.get("/builds")
 async def get_builds():
     try:
-        now = datetime.now()
-        
-        if (cache["teamcity_builds"] is not None and 
-            cache["builds_timestamp"] is not None and 
-            now - cache["builds_timestamp"] < cache["ttl"]):
-            return {"builds": cache["teamcity_builds"]}
-        
         builds_data = await get_teamcity_builds_direct()
-        
-        if builds_data:
-            builds_data = builds_data
-        
-        cache["teamcity_builds"] = builds_data
-        cache["builds_timestamp"] = now
-        
         return {"builds": builds_data}
         
     except Exception as e:
@@ -68,18 +82,22 @@ async def get_builds_classified():
         }
 
 @router.get("/builds/dashboard")
-async def get_builds_dashboard(demo: bool = False):
+async def get_builds_dashboard(request: Request, demo: bool = False, session: Optional[str] = None):
     try:
-        selected_builds = user_service.get_selected_builds()
+        with timing.span("selection_db"):
+            selected_builds = await user_service.get_selected_builds()
         
         if demo:
             # Mode démo pour tester l'affichage
-            builds_data = get_demo_builds_for_testing()
+            catalog = BuildCatalog(get_demo_builds_for_testing())
             # Simuler quelques builds sélectionnés
             if not selected_builds:
                 selected_builds = ["Go2Version612_Plugins_BuildDebug", "WebServices_Portal_Deploy"]
         else:
-            builds_data = await get_teamcity_builds_direct()
+            # Battement de cœur: seuls les builds affichés par une session ouverte sont rafraîchis en fond
+            subscriptions.subscribe(_dashboard_session_id(request, session), selected_builds)
+            with timing.span("catalog"):
+                catalog = await get_build_catalog()
         
         if not selected_builds:
             return {
@@ -92,14 +110,15 @@ async def get_builds_dashboard(demo: bool = False):
                 "message": "Aucun build sélectionné - allez dans la configuration pour en choisir"
             }
         
-        # Filtrer selon la sélection utilisateur
-        filtered_builds = [
-            build for build in builds_data 
-            if build.get("buildTypeId") in selected_builds
-        ]
+        # Filtrer selon la sélection utilisateur (lookup indexé, pas de scan du catalogue)
+        filtered_builds = catalog.select(selected_builds)
 
-        # Enrichir UNIQUEMENT les builds sélectionnés avec leur statut pour performance
-        filtered_builds = await run_in_threadpool(enrich_builds_with_status, filtered_builds)
+        # Enrichir UNIQUEMENT les builds sélectionnés: statuts du cache planifié, lecture TeamCity si échus.
+        # À l'échéance (DEADLINE_MS_DASHBOARD), les lectures lentes sont servies depuis le cache et finissent en fond
+        with timing.span("status_fanout"):
+            filtered_builds = await run_in_threadpool(
+                status_scheduler.enrich, filtered_builds, timing.remaining("dashboard"))
+        late_count = len([b for b in filtered_builds if b.get("stale") or b.get("pending")])
         
         if not filtered_builds and not demo:
             return {
@@ -113,20 +132,29 @@ async def get_builds_dashboard(demo: bool = False):
             }
         
         # Utiliser la nouvelle structure hiérarchique
-        projects_organized = create_complete_tree_structure(filtered_builds)
+        with timing.span("tree"):
+            projects_organized = create_complete_tree_structure(filtered_builds)
         
         running_count = len([b for b in filtered_builds if b.get("state") == "running"])
         success_count = len([b for b in filtered_builds if b.get("status") == "SUCCESS"])
         failure_count = len([b for b in filtered_builds if b.get("status") in ["FAILURE", "FAILED"]])
+        refresh_after_ms = status_scheduler.suggested_refresh_ms(selected_builds)
+        if late_count:
+            # Réponse partielle: le frontend revient vite chercher les statuts terminés en arrière-plan
+            refresh_after_ms = min(refresh_after_ms, PARTIAL_REFRESH_MS)
         
-        return {
+        return _timed_json_response({
             "builds": filtered_builds,
             "projects": projects_organized,
             "total_builds": len(filtered_builds),
             "running_count": running_count,
             "success_count": success_count,
-            "failure_count": failure_count
-        }
+            "failure_count": failure_count,
+            "queue": build_queue_monitor.summary(selected_builds),
+            "partial": late_count > 0,
+            "stale_count": late_count,
+            "refresh_after_ms": refresh_after_ms
+        })
         
     except Exception as e:
         logger.error(f"Erreur get_builds_dashboard: {str(e)}")
@@ -140,6 +168,35 @@ async def get_builds_dashboard(demo: bool = False):
             "error": str(e)
         }
 
+def _dashboard_session_id(request: Request, session: Optional[str]) -> str:
+    """?session= (par onglet, envoyé par le frontend), sinon l'adresse du client"""
+    if session:
+        return session[:128]
+    return f"client:{request.client.host if request.client else 'inconnu'}"
+
+@router.post("/dashboard/session/close")
+async def close_dashboard_session(request: Request, session: Optional[str] = None):
+    """Onglet masqué ou fermé (sendBeacon): la session libère ses buildTypes"""
+    return {"closed": subscriptions.unsubscribe(_dashboard_session_id(request, session))}
+
+@router.get("/dashboard/sessions")
+async def get_dashboard_sessions():
+    """Sessions de dashboard ouvertes et buildTypes regardés (ceux rafraîchis en tâche de fond)"""
+    try:
+        return subscriptions.snapshot()
+    except Exception as e:
+        logger.error(f"Erreur get_dashboard_sessions: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur serveur")
+
+@router.get("/builds/polling")
+async def get_builds_polling(limit: int = 100):
+    """Planification des statuts: intervalle et échéance par buildType suivi, débit effectif vers TeamCity, doublons"""
+    try:
+        return {**status_scheduler.snapshot(limit=max(0, min(limit, 1000))), "hedging": status_hedger.snapshot()}
+    except Exception as e:
+        logger.error(f"Erreur get_builds_polling: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur serveur")
+
 def organize_builds_by_patterns(builds):
     """Organise les builds automatiquement en analysant leurs patterns"""
     
@@ -221,7 +278,7 @@ def auto_organize_projects(project_analysis):
 @router.get("/builds/dashboard/v2")
 async def get_builds_dashboard_v2():
     try:
-        selected_builds = user_service.get_selected_builds()
+        selected_builds = await user_service.get_selected_builds()
         
         if not selected_builds:
             return {
@@ -233,12 +290,8 @@ async def get_builds_dashboard_v2():
                 "failure_count": 0
             }
         
-        builds_data = await get_teamcity_builds_direct()
-        
-        filtered_builds = [
-            build for build in builds_data 
-            if build.get("buildTypeId") in selected_builds
-        ]
+        catalog = await get_build_catalog()
+        filtered_builds = catalog.select(selected_builds)
         
         running_count = len([b for b in filtered_builds if b.get("state") == "running"])
         success_count = len([b for b in filtered_builds if b.get("status") == "SUCCESS"])
@@ -272,40 +325,231 @@ async def get_parameters():
         logger.error(f"Erreur get_parameters: {str(e)}")
         return {"parameters": {}}
 
+# Index de recherche synchronisé incrémentalement avec le catalogue
+search_index = BuildSearchIndex(path_resolver=lambda build: get_tree_path_for_build(build))
+
+def _parse_ids_param(ids: Optional[str]) -> List[str]:
+    """Découpe un paramètre 'a,b,c' en liste d'IDs (sans doublons, ordre conservé)"""
+    if not ids:
+        return []
+    return list(dict.fromkeys(part.strip() for part in ids.split(",") if part.strip()))
+
+def _batch_status_response(catalog: BuildCatalog, build_type_ids: List[str]) -> Dict[str, Any]:
+    found, missing = catalog.get_many(build_type_ids)
+    return {
+        "builds": found,
+        "missing": missing,
+        "requested": len(build_type_ids),
+        "found": len(found)
+    }
+
 @router.get("/status")
-async def get_build_status(id: str):
+async def get_build_status(id: Optional[str] = None, ids: Optional[str] = None):
+    """Statut d'un buildType (?id=) ou de plusieurs en un seul appel (?ids=a,b,c)"""
     try:
-        builds_data = await get_teamcity_builds_direct()
-        build = next((b for b in builds_data if b.get("id") == id), None)
+        if not id and not ids:
+            raise HTTPException(status_code=400, detail="Paramètre id ou ids requis")
+        
+        catalog = await get_build_catalog()
+        
+        if ids:
+            return _batch_status_response(catalog, _parse_ids_param(ids))
         
+        build = catalog.get(id)
         if build:
             return build
         else:
             raise HTTPException(status_code=404, detail="Build non trouvé")
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erreur get_build_status: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur serveur")
 
-async def get_teamcity_builds_direct():
+@router.post("/status")
+async def get_builds_status_batch(request_data: dict):
+    """Version POST du statut en lot: {"ids": ["a", "b", ...]}"""
     try:
-        now = datetime.now()
+        build_type_ids = request_data.get("ids", [])
+        if not isinstance(build_type_ids, list):
+            raise HTTPException(status_code=400, detail="ids doit être une liste")
+        
+        catalog = await get_build_catalog()
+        return _batch_status_response(catalog, list(dict.fromkeys(str(i) for i in build_type_ids)))
         
-        if (cache["teamcity_builds"] is not None and 
-            cache["builds_timestamp"] is not None and 
-            now - cache["builds_timestamp"] < cache["ttl"]):
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur get_builds_status_batch: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur serveur")
+
+# Au-delà, le client découpe lui-même ses demandes de résumés d'échec
+MAX_FAILURE_IDS = 50
+
+@router.get("/builds/failures")
+async def get_builds_failures(ids: Optional[str] = None):
+    """Résumés d'échec de plusieurs buildTypes (?ids=a,b,c), récupérés par lots parallèles"""
+    try:
+        build_type_ids = _parse_ids_param(ids)
+        if not build_type_ids:
+            raise HTTPException(status_code=400, detail="Paramètre ids requis")
+        if len(build_type_ids) > MAX_FAILURE_IDS:
+            raise HTTPException(status_code=400, detail=f"{MAX_FAILURE_IDS} buildTypes au maximum par appel")
+        
+        summaries = await run_in_threadpool(
+            get_failure_summaries, build_type_ids, timing.remaining("failures"))
+        return {
+            "failures": [s for s in summaries if s["result"] == "ok"],
+            "not_found": [s["buildTypeId"] for s in summaries if s["result"] == "not_found"],
+            "unavailable": [s["buildTypeId"] for s in summaries if s["result"] == "unavailable"],
+            "pending": [s["buildTypeId"] for s in summaries if s["result"] == "pending"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur get_builds_failures: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur serveur")
+
+@router.get("/builds/{build_type_id}/failure")
+async def get_build_failure(build_type_id: str):
+    """Problèmes et tests en échec du dernier build en échec d'un buildType"""
+    try:
+        summary = await run_in_threadpool(get_failure_summary, build_type_id)
+        if summary["result"] == "not_found":
+            raise HTTPException(status_code=404, detail="Aucun build en échec pour ce buildType")
+        if summary["result"] == "unavailable":
+            raise HTTPException(status_code=503, detail="TeamCity indisponible")
+        return summary
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur get_build_failure: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur serveur")
+
+@router.get("/builds/{build_id}/log/tail")
+async def get_build_log_tail(build_id: str, kb: Optional[int] = None, follow: bool = False):
+    """Derniers `kb` Ko du log d'un build (64 par défaut), relayés en flux; ?follow=true pour suivre un build en cours"""
+    try:
+        valid, size = build_logs.tail_size(kb)
+        if not valid:
+            raise HTTPException(status_code=400, detail=f"kb doit être compris entre 1 et {build_logs.MAX_TAIL_KB}")
+        if not build_id.isdigit():
+            raise HTTPException(status_code=400, detail="buildId numérique attendu")
+        
+        state = await build_logs.fetch_build_state(build_id)
+        if state == build_logs.BUILD_NOT_FOUND:
+            raise HTTPException(status_code=404, detail="Build introuvable")
+        if state is None:
+            raise HTTPException(status_code=503, detail="TeamCity indisponible")
+        return StreamingResponse(
+            build_logs.stream_log_tail(build_id, size, state, follow=follow),
+            media_type="text/plain; charset=utf-8",
+            headers={"Cache-Control": "no-cache", "X-Build-State": state}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur get_build_log_tail: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur serveur")
+
+async def get_build_catalog() -> BuildCatalog:
+    """Retourne le catalogue indexé, reconstruit uniquement lors d'un rafraîchissement"""
+    await get_teamcity_builds_direct()
+    catalog = cache.get("catalog")
+    if catalog is None:
+        catalog = BuildCatalog(cache.get("teamcity_builds") or [])
+        cache["catalog"] = catalog
+    return catalog
+
+async def get_build_tree_index() -> BuildTreeIndex:
+    """Arborescence indexée, reconstruite paresseusement après chaque rafraîchissement du catalogue"""
+    catalog = await get_build_catalog()
+    tree_index = cache.get("tree_index")
+    if tree_index is None:
+        tree_index = BuildTreeIndex(create_complete_tree_structure(catalog.builds))
+        cache["tree_index"] = tree_index
+    return tree_index
+
+def _timed_json_response(payload: Any) -> JSONResponse:
+    """Sérialisation explicite pour isoler la phase 'serialize' dans Server-Timing"""
+    with timing.span("serialize"):
+        return JSONResponse(jsonable_encoder(payload))
+
+def _is_shared_entry_fresh(stored_at: Optional[float]) -> bool:
+    return stored_at is not None and time.time() - stored_at < cache["ttl"].total_seconds()
+
+def _load_shared_entry(key: str, fetcher: Callable[[], Any]) -> Tuple[Any, float]:
+    """Lit l'entrée du cache partagé; si absente ou expirée, un seul worker la rafraîchit
+    sous verrou inter-processus pendant que les autres attendent puis relisent"""
+    backend = get_cache_backend()
+    entry = backend.get(key)
+    if entry is not None and _is_shared_entry_fresh(entry[1]):
+        metrics.CACHE_REQUESTS.inc(cache=key, result="shared_hit")
+        return entry
+    
+    with backend.lock(key, timeout=REFRESH_LOCK_TIMEOUT) as acquired:
+        # Un autre worker a pu rafraîchir pendant l'attente du verrou
+        entry = backend.get(key)
+        if entry is not None and _is_shared_entry_fresh(entry[1]):
+            metrics.CACHE_REQUESTS.inc(cache=key, result="shared_hit")
+            return entry
+        if not acquired and entry is not None:
+            # Rafraîchissement toujours en cours ailleurs: valeur expirée plutôt qu'un appel TeamCity de plus
+            logger.warning(f"Verrou de rafraîchissement '{key}' non obtenu: entrée expirée servie")
+            metrics.CACHE_REQUESTS.inc(cache=key, result="stale")
+            return entry
+        
+        metrics.CACHE_REQUESTS.inc(cache=key, result="miss")
+        value = fetcher()
+        stored_at = backend.set(key, value)
+        return value, stored_at
+
+# Sérialise les reconstructions locales: une seule par version, jamais une version plus ancienne après une récente
+_adopt_lock = threading.Lock()
+
+def _adopt_builds(builds_data: List[Dict[str, Any]], stored_at: float):
+    """Reconstruit catalogue et index de recherche pour une nouvelle version partagée, puis la publie
+    (pool de threads: O(n) sur tous les builds)"""
+    with _adopt_lock:
+        if cache["builds_stamp"] is not None and cache["builds_stamp"] >= stored_at:
+            # Version déjà adoptée, ou plus récente publiée pendant l'attente du verrou
+            return
+        catalog = BuildCatalog(builds_data)
+        search_index.sync(builds_data)
+        cache["teamcity_builds"] = builds_data
+        cache["catalog"] = catalog
+        cache["tree_index"] = None
+        cache["builds_timestamp"] = datetime.fromtimestamp(stored_at)
+        cache["builds_stamp"] = stored_at
+
+def _reset_local_builds_cache():
+    cache["teamcity_builds"] = None
+    cache["catalog"] = None
+    cache["tree_index"] = None
+    cache["builds_timestamp"] = None
+    cache["builds_stamp"] = None
+
+async def get_teamcity_builds_direct():
+    try:
+        # Vérification bon marché: la version partagée est-elle celle déjà indexée localement ?
+        stamp = await run_in_threadpool(get_cache_backend().stamp, "teamcity_builds")
+        if (cache["teamcity_builds"] is not None and
+            stamp == cache["builds_stamp"] and
+            _is_shared_entry_fresh(stamp)):
+            metrics.CACHE_REQUESTS.inc(cache="teamcity_builds", result="local_hit")
             return cache["teamcity_builds"]
         
-        builds_data = await run_in_threadpool(fetch_all_teamcity_builds)
+        builds_data, stored_at = await run_in_threadpool(_load_shared_entry, "teamcity_builds", fetch_all_teamcity_builds)
         
-        cache["teamcity_builds"] = builds_data
-        cache["builds_timestamp"] = now
+        if stored_at != cache["builds_stamp"]:
+            await run_in_threadpool(_adopt_builds, builds_data, stored_at)
         
-        return builds_data
+        return cache["teamcity_builds"]
         
     except Exception as e:
         logger.error(f"Erreur get_teamcity_builds_direct: {str(e)}")
-        return cache.get("teamcity_builds", [])
+        return cache.get("teamcity_builds") or []
 
 @router.get("/teamcity/builds")
 async def get_teamcity_builds():
@@ -319,8 +563,8 @@ async def get_teamcity_builds():
 @router.get("/teamcity/builds/force-refresh")
 async def force_refresh_teamcity_builds():
     try:
-        cache["teamcity_builds"] = None
-        cache["builds_timestamp"] = None
+        get_cache_backend().delete("teamcity_builds")
+        _reset_local_builds_cache()
         
         builds_data = await get_teamcity_builds_direct()
         return {
@@ -358,34 +602,70 @@ async def get_teamcity_status():
             "last_update": None
         }
 
+async def get_teamcity_agents_cached():
+    stamp = await run_in_threadpool(get_cache_backend().stamp, "teamcity_agents")
+    if (cache["teamcity_agents"] is not None and
+        stamp == cache["agents_stamp"] and
+        _is_shared_entry_fresh(stamp)):
+        metrics.CACHE_REQUESTS.inc(cache="teamcity_agents", result="local_hit")
+        return cache["teamcity_agents"]
+    
+    agents_data, stored_at = await run_in_threadpool(_load_shared_entry, "teamcity_agents", fetch_teamcity_agents)
+    
+    cache["teamcity_agents"] = agents_data
+    cache["agents_timestamp"] = datetime.fromtimestamp(stored_at)
+    cache["agents_stamp"] = stored_at
+    
+    return agents_data
+
 @router.get("/agents")
 async def get_agents():
     try:
-        now = datetime.now()
-        
-        if (cache["teamcity_agents"] is not None and 
-            cache["agents_timestamp"] is not None and 
-            now - cache["agents_timestamp"] < cache["ttl"]):
-            return {"agents": cache["teamcity_agents"]}
-        
-        agents_data = await run_in_threadpool(fetch_teamcity_agents)
-        
-        cache["teamcity_agents"] = agents_data
-        cache["agents_timestamp"] = now
-        
+        agents_data = await get_teamcity_agents_cached()
         return {"agents": agents_data}
         
     except Exception as e:
         logger.error(f"Erreur get_agents: {str(e)}")
         return {"agents": []}
 
+@router.get("/agents/utilization")
+async def get_agents_utilization(group_by: str = "pool"):
+    """Agents occupés/libres par pool (?group_by=type pour grouper par type) et build courant de chaque agent"""
+    try:
+        if group_by not in GROUP_BY_VALUES:
+            raise HTTPException(status_code=400, detail=f"group_by doit valoir {' ou '.join(GROUP_BY_VALUES)}")
+        
+        agents_data = await get_teamcity_agents_cached()
+        return {
+            **summarize_agent_utilization(agents_data, group_by),
+            "last_update": cache.get("agents_timestamp")
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur get_agents_utilization: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur serveur")
+
+@router.get("/queue")
+async def get_build_queue(limit: int = 50):
+    """File d'attente TeamCity: builds en attente (plus anciens d'abord), percentiles du temps d'attente
+    par buildType et par raison. Relevé par la tâche de fond, à la demande seulement si elle n'a pas tourné."""
+    try:
+        await run_in_threadpool(build_queue_monitor.poll_if_stale)
+        return build_queue_monitor.snapshot(limit=max(0, min(limit, 500)))
+    except Exception as e:
+        logger.error(f"Erreur get_build_queue: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur serveur")
+
 @router.get("/agents/force-refresh")
 async def force_refresh_agents():
     try:
+        get_cache_backend().delete("teamcity_agents")
         cache["teamcity_agents"] = None
         cache["agents_timestamp"] = None
+        cache["agents_stamp"] = None
         
-        agents_data = await run_in_threadpool(fetch_teamcity_agents)
+        agents_data = await get_teamcity_agents_cached()
         return {
             "message": "Cache vidé et agents rechargés",
             "agents_count": len(agents_data)
@@ -395,9 +675,18 @@ async def force_refresh_agents():
         return {"message": "Erreur lors du rechargement", "agents_count": 0}
 
 @router.get("/config")
-async def get_configuration():
+async def get_configuration(request: Request):
+    """Configuration du dashboard; ETag = configVersion, 304 si le client a déjà cette version"""
     try:
-        return user_service.get_config_for_api()
+        config = await user_service.get_config_for_api()
+        version = config.get("configVersion")
+        if not version:
+            return config
+        etag = f'"{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(content=jsonable_encoder(config), headers=headers)
     except Exception as e:
         logger.error(f"Erreur get_configuration: {str(e)}")
         return {"builds": {"selectedBuilds": []}}
@@ -407,12 +696,12 @@ async def force_refresh_builds_tree():
     """Force le rechargement de l'arbre des builds en vidant le cache"""
     try:
         # Vider le cache TeamCity
-        cache["teamcity_builds"] = None
-        cache["builds_timestamp"] = None
+        get_cache_backend().delete("teamcity_builds")
+        _reset_local_builds_cache()
         
         # Recharger les données
         builds_data = await get_teamcity_builds_direct()
-        selected_builds = user_service.get_selected_builds()
+        selected_builds = await user_service.get_selected_builds()
         tree_structure = create_complete_tree_structure(builds_data)
         
         return {
@@ -434,7 +723,8 @@ async def get_builds_tree(demo: bool = False):
             # Mode démo avec données de test pour développement
             builds_data = get_demo_builds_for_testing()
         else:
-            builds_data = await get_teamcity_builds_direct()
+            with timing.span("catalog"):
+                builds_data = await get_teamcity_builds_direct()
         
         if not builds_data:
             logger.warning("Aucune donnée TeamCity disponible - utilisez ?demo=true pour tester")
@@ -445,14 +735,16 @@ async def get_builds_tree(demo: bool = False):
                 "message": "Aucune donnée - ajoutez ?demo=true pour tester"
             }
         
-        selected_builds = user_service.get_selected_builds()
-        tree_structure = create_complete_tree_structure(builds_data)
+        with timing.span("selection_db"):
+            selected_builds = await user_service.get_selected_builds()
+        with timing.span("tree"):
+            tree_structure = create_complete_tree_structure(builds_data)
         
-        return {
+        return _timed_json_response({
             "projects": tree_structure,
             "total_builds": len(builds_data),
             "selected_builds": selected_builds
-        }
+        })
         
     except Exception as e:
         logger.error(f"Erreur get_builds_tree: {str(e)}")
@@ -462,6 +754,66 @@ async def get_builds_tree(demo: bool = False):
             "selected_builds": []
         }
 
+@router.get("/builds/tree/nodes")
+async def get_builds_tree_nodes(path: str = "", cursor: Optional[str] = None,
+                                limit: int = DEFAULT_PAGE_SIZE, demo: bool = False):
+    """Enfants d'un seul nœud de l'arborescence (chargement à la demande, paginé)"""
+    try:
+        if demo:
+            tree_index = BuildTreeIndex(create_complete_tree_structure(get_demo_builds_for_testing()))
+        else:
+            with timing.span("catalog"):
+                tree_index = await get_build_tree_index()
+        
+        with timing.span("selection_db"):
+            selected_builds = set(await user_service.get_selected_builds())
+        with timing.span("tree"):
+            page = tree_index.list_children(path, selected_builds, cursor=cursor, limit=limit)
+        return _timed_json_response(page)
+        
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Nœud introuvable")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor invalide")
+    except Exception as e:
+        logger.error(f"Erreur get_builds_tree_nodes: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur serveur")
+
+@router.get("/builds/tree/build-ids")
+async def get_builds_tree_build_ids(path: str = "", demo: bool = False):
+    """Tous les buildTypeIds d'un sous-arbre (sélection d'un projet entier sans le déplier)"""
+    try:
+        if demo:
+            tree_index = BuildTreeIndex(create_complete_tree_structure(get_demo_builds_for_testing()))
+        else:
+            tree_index = await get_build_tree_index()
+        
+        builds = tree_index.list_build_ids(path)
+        return {"path": path, "builds": builds, "count": len(builds)}
+        
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Nœud introuvable")
+    except Exception as e:
+        logger.error(f"Erreur get_builds_tree_build_ids: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur serveur")
+
+@router.get("/builds/search")
+async def search_builds(q: str = "", offset: int = 0, limit: int = 50, demo: bool = False):
+    """Recherche serveur (préfixes + trigrammes) pour la page de configuration"""
+    try:
+        if demo:
+            index = BuildSearchIndex(path_resolver=get_tree_path_for_build)
+            index.sync(get_demo_builds_for_testing())
+        else:
+            await get_teamcity_builds_direct()
+            index = search_index
+        
+        return index.search(q, offset=offset, limit=limit)
+        
+    except Exception as e:
+        logger.error(f"Erreur search_builds: {str(e)}")
+        return {"query": q, "total": 0, "offset": offset, "limit": limit, "hits": []}
+
 def get_demo_builds_for_testing():
     """Données de test réalistes pour le développement - TEMPORAIRE"""
     return [
@@ -542,6 +894,15 @@ def create_complete_tree_structure(builds_data):
     
     return tree
 
+def get_tree_path_for_build(build):
+    """Chemin [projet, catégorie, sous-catégorie] du build dans l'arborescence de configuration"""
+    project_name = build.get("projectName", "")
+    build_type_id = build.get("buildTypeId", "")
+    if not project_name or not build_type_id:
+        return []
+    project_parts = [part.strip() for part in project_name.split("/")]
+    return list(analyze_project_hierarchy(project_parts, build_type_id))
+
 def analyze_project_hierarchy(project_parts, build_type_id):
     """Analyse intelligente de la hiérarchie des projets"""
     
@@ -632,14 +993,15 @@ async def save_build_selection(selection_data: dict):
         
         # Récupérer les builds TeamCity; si vide, le modèle créera un fallback pour ne pas perdre la sélection
         all_builds = await get_teamcity_builds_direct()
-        success = user_service.bulk_update_selections(selected_builds, all_builds)
+        success = await user_service.bulk_update_selections(selected_builds, all_builds)
         
         if success:
             logger.info(f"Sélection mise à jour: {len(selected_builds)} builds sélectionnés")
             return {
                 "message": "Sélection sauvegardée avec succès",
                 "selected_count": len(selected_builds),
-                "total_builds": len(all_builds)
+                "total_builds": len(all_builds),
+                "version": user_service.selection_version(selected_builds)
             }
         else:
             raise HTTPException(status_code=500, detail="Erreur lors de la sauvegarde")
@@ -650,11 +1012,64 @@ async def save_build_selection(selection_data: dict):
         logger.error(f"Erreur save_build_selection: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur interne du serveur")
 
+def _parse_id_list(selection_data: dict, key: str) -> List[str]:
+    values = selection_data.get(key) or []
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise HTTPException(status_code=400, detail=f"{key} doit être une liste d'identifiants")
+    return values
+
+@router.patch("/builds/selection")
+async def patch_build_selection(selection_data: dict):
+    """Ajoute/retire des builds de la sélection: {add, remove, base_version}.
+    409 si la sélection a changé depuis base_version (le corps contient la sélection courante)."""
+    try:
+        add = _parse_id_list(selection_data, "add")
+        remove = _parse_id_list(selection_data, "remove")
+        base_version = selection_data.get("base_version")
+        if set(add) & set(remove):
+            raise HTTPException(status_code=400, detail="Un build ne peut pas être à la fois ajouté et retiré")
+        
+        # Noms issus du catalogue déjà en mémoire uniquement: une modification ne déclenche aucun appel TeamCity
+        build_info = {}
+        catalog = cache.get("catalog")
+        if catalog is not None:
+            found, _ = catalog.get_many(add)
+            build_info = {
+                build_id: (build.get("projectName") or "Unknown", build.get("name") or build_id)
+                for build_id, build in found.items()
+            }
+        
+        with timing.span("selection_db"):
+            result = await user_service.patch_selection(add, remove, base_version, build_info)
+        if result is None:
+            raise HTTPException(status_code=500, detail="Erreur lors de la sauvegarde")
+        if result["conflict"]:
+            return JSONResponse(status_code=409, content={
+                "detail": "La sélection a été modifiée entre-temps",
+                "selectedBuilds": result["selected"],
+                "version": result["version"]
+            })
+        
+        return {
+            "message": "Sélection modifiée avec succès",
+            "selected_count": len(result["selected"]),
+            "added": result["added"],
+            "removed": result["removed"],
+            "version": result["version"]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur patch_build_selection: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur")
+
 @router.get("/teamcity/test-connection")
 async def test_teamcity_connection():
     """Teste la connexion à TeamCity et retourne des informations de diagnostic"""
-    from ..services.teamcity_fetcher import _is_teamcity_configured, _make_teamcity_request, TEAMCITY_URL, TEAMCITY_TOKEN
+    from ..services.teamcity_fetcher import _is_teamcity_configured, _make_teamcity_request, teamcity_url, teamcity_token
     
+    base_url, token = teamcity_url(), teamcity_token()
     try:
         # Vérifier la configuration
         if not _is_teamcity_configured():
@@ -662,14 +1077,14 @@ async def test_teamcity_connection():
                 "status": "error",
                 "message": "TeamCity non configuré",
                 "details": {
-                    "url": TEAMCITY_URL,
-                    "token_configured": bool(TEAMCITY_TOKEN),
-                    "token_length": len(TEAMCITY_TOKEN) if TEAMCITY_TOKEN else 0
+                    "url": base_url,
+                    "token_configured": bool(token),
+                    "token_length": len(token) if token else 0
                 }
             }
         
         # Test de connexion simple
-        test_url = f"{TEAMCITY_URL}/app/rest/buildTypes?locator=count:1"
+        test_url = f"{base_url}/app/rest/buildTypes?locator=count:1"
         root = _make_teamcity_request(test_url)
         
         if root.tag == 'root' and len(root) == 0:
@@ -677,7 +1092,7 @@ async def test_teamcity_connection():
                 "status": "error",
                 "message": "Connexion TeamCity échouée",
                 "details": {
-                    "url": TEAMCITY_URL,
+                    "url": base_url,
                     "possible_causes": [
                         "Serveur TeamCity inaccessible",
                         "Token invalide ou expiré", 
@@ -694,7 +1109,7 @@ async def test_teamcity_connection():
             "status": "success",
             "message": "Connexion TeamCity OK",
             "details": {
-                "url": TEAMCITY_URL,
+                "url": base_url,
                 "buildtypes_found": len(buildtypes),
                 "sample_buildtype": buildtypes[0].attrib.get('name', '') if buildtypes else None
             }
@@ -705,7 +1120,7 @@ async def test_teamcity_connection():
         return {
             "status": "error", 
             "message": f"Erreur lors du test: {str(e)}",
-            "details": {"url": TEAMCITY_URL}
+            "details": {"url": base_url}
         }
 
 @router.post("/migration/from-json")
@@ -713,7 +1128,7 @@ async def migrate_from_json():
     """Endpoint pour migrer depuis l'ancien système JSON"""
     try:
         config_path = "config/user_config.json"
-        success = user_service.migrate_from_json_config(config_path)
+        success = await user_service.migrate_from_json_config(config_path)
         
         if success:
             return {"message": "Migration réussie depuis JSON vers base de données"}
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from typing import Optional
+from ..services import timing
+
+router = APIRouter()
+
+@router.get("/debug/slow-requests")
+async def get_slow_requests(limit: Optional[int] = None):
+    """Requêtes les plus lentes ayant dépassé le seuil, avec leur décomposition par phase (de la plus lente à la plus rapide)"""
+    entries = timing.slow_requests.snapshot(limit)
+    return {
+        "threshold_ms": timing.slow_requests.threshold_ms,
+        "buffer_size": timing.slow_requests.size,
+        "count": len(entries),
+        "requests": entries
+    }
@@ -0,0 +1,66 @@
+"""
+Occupation des agents TeamCity par pool (ou par type d'agent)
+Calculée à partir de la liste mise en cache par fetch_teamcity_agents (agents + builds en cours, une requête)
+"""
+from typing import Any, Dict, List
+
+GROUP_BY_VALUES = ("pool", "type")
+
+UNASSIGNED_POOL = "Sans pool"
+
+
+def _group_key(agent: Dict[str, Any], group_by: str) -> Dict[str, str]:
+    if group_by == "type":
+        type_id = str(agent.get("type") or "")
+        return {"id": type_id, "name": type_id or "Type inconnu"}
+    pool = agent.get("pool") or {}
+    return {"id": str(pool.get("id") or ""), "name": pool.get("name") or UNASSIGNED_POOL}
+
+
+def _empty_counts() -> Dict[str, Any]:
+    return {"total": 0, "busy": 0, "idle": 0, "unavailable": 0}
+
+
+def _add_agent(counts: Dict[str, Any], agent: Dict[str, Any]):
+    counts["total"] += 1
+    if agent.get("busy"):
+        counts["busy"] += 1
+    elif agent.get("status") == "connected":
+        counts["idle"] += 1
+    else:
+        counts["unavailable"] += 1
+
+
+def _with_ratio(counts: Dict[str, Any]) -> Dict[str, Any]:
+    """Taux d'occupation = occupés / (occupés + libres); les agents indisponibles n'offrent pas de capacité"""
+    capacity = counts["busy"] + counts["idle"]
+    counts["utilization"] = round(counts["busy"] / capacity, 3) if capacity else None
+    return counts
+
+
+def summarize_agent_utilization(agents: List[Dict[str, Any]], group_by: str = "pool") -> Dict[str, Any]:
+    """Compteurs occupés/libres/indisponibles par groupe et build courant de chaque agent"""
+    groups: Dict[str, Dict[str, Any]] = {}
+    totals = _empty_counts()
+    occupancy = []
+
+    for agent in agents:
+        key = _group_key(agent, group_by)
+        group = groups.setdefault(f"{key['id']}/{key['name']}", {**key, **_empty_counts()})
+        _add_agent(group, agent)
+        _add_agent(totals, agent)
+        occupancy.append({
+            "id": agent.get("id", ""),
+            "name": agent.get("name", ""),
+            "group": key["name"],
+            "status": agent.get("status", "disconnected"),
+            "busy": bool(agent.get("busy")),
+            "build": agent.get("build")
+        })
+
+    return {
+        "group_by": group_by,
+        "groups": sorted((_with_ratio(g) for g in groups.values()), key=lambda g: g["name"].lower()),
+        "totals": _with_ratio(totals),
+        "agents": occupancy
+    }
@@ -0,0 +1,117 @@
+"""
+Rafraîchissement périodique en tâche de fond (démarré par le lifespan de l'application)
+Chaque tâche enregistrée a sa propre boucle asyncio; la fonction, bloquante (appels TeamCity), s'exécute
+dans le pool de threads. Une tâche en échec est journalisée puis relancée à l'intervalle suivant.
+Une tâche peut être conditionnée (`active`): tant que la condition est fausse, elle est sautée (en pause).
+"""
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import logging
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+REFRESH_JOB_DURATION = metrics.registry.histogram(
+    "background_refresh_duration_seconds",
+    "Durée des tâches de rafraîchissement en arrière-plan",
+    ("job", "outcome"),
+)
+
+
+class RefreshJob:
+    def __init__(self, name: str, func: Callable[[], Any], interval: float,
+                 active: Optional[Callable[[], bool]] = None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.active = active
+        self.runs = 0
+        self.skipped = 0
+        self.paused = False
+        self.failures = 0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    async def run_once(self):
+        if self.active is not None and not self.active():
+            if not self.paused:
+                logger.info(f"Tâche de fond {self.name} en pause")
+            self.paused = True
+            self.skipped += 1
+            return
+        if self.paused:
+            logger.info(f"Tâche de fond {self.name} reprise")
+            self.paused = False
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            await run_in_threadpool(self.func)
+            self.last_error = None
+        except Exception as e:
+            outcome = "error"
+            self.failures += 1
+            self.last_error = str(e)
+            logger.error(f"Erreur de la tâche de fond {self.name}: {e}")
+        finally:
+            self.runs += 1
+            self.last_run = time.time()
+            self.last_duration = time.perf_counter() - start
+            REFRESH_JOB_DURATION.observe(self.last_duration, job=self.name, outcome=outcome)
+
+    async def loop(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "paused": self.paused,
+            "last_run": self.last_run,
+            "last_duration_ms": round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class BackgroundRefresher:
+    def __init__(self):
+        self.jobs: Dict[str, RefreshJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def register(self, name: str, func: Callable[[], Any], interval: float,
+                 active: Optional[Callable[[], bool]] = None) -> RefreshJob:
+        """Enregistre (ou remplace) une tâche; prise en compte au prochain start()"""
+        job = RefreshJob(name, func, interval, active)
+        self.jobs[name] = job
+        return job
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks.values())
+
+    def start(self):
+        """Lance une boucle par tâche sur la boucle asyncio courante (lifespan)"""
+        for name, job in self.jobs.items():
+            task = self._tasks.get(name)
+            if task is None or task.done():
+                self._tasks[name] = asyncio.create_task(job.loop())
+
+    def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: job.snapshot() for name, job in self.jobs.items()}
+
+
+# Instance du processus: une boucle par tâche et par worker
+background_refresher = BackgroundRefresher()
@@ -0,0 +1,86 @@
+"""
+Catalogue indexé des buildTypes TeamCity
+Construit une seule fois par rafraîchissement du cache pour des recherches en O(1)
+"""
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def split_project_path(project_path: str) -> List[str]:
+    """Découpe un chemin 'A / B / C' en segments nettoyés"""
+    if not project_path:
+        return []
+    return [part.strip() for part in project_path.split("/") if part.strip()]
+
+
+class BuildCatalog:
+    """
+    Index en mémoire des builds récupérés depuis TeamCity
+    - par buildTypeId
+    - par chemin de projet complet
+    - par projet principal (premier segment du chemin)
+    """
+
+    def __init__(self, builds: Optional[List[Dict[str, Any]]] = None):
+        self.builds: List[Dict[str, Any]] = list(builds or [])
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_project_path: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_top_project: Dict[str, List[Dict[str, Any]]] = {}
+        # Position d'origine pour restituer l'ordre TeamCity après une sélection
+        self._position: Dict[str, int] = {}
+
+        for position, build in enumerate(self.builds):
+            build_type_id = build.get("buildTypeId") or build.get("id")
+            if not build_type_id:
+                continue
+            if build_type_id in self.by_id:
+                continue
+            self.by_id[build_type_id] = build
+            self._position[build_type_id] = position
+
+            project_path = build.get("projectName", "") or ""
+            self.by_project_path.setdefault(project_path, []).append(build)
+
+            parts = split_project_path(project_path)
+            top_project = parts[0] if parts else "Autres"
+            self.by_top_project.setdefault(top_project, []).append(build)
+
+        logger.debug(f"Catalogue indexé: {len(self.by_id)} builds, {len(self.by_top_project)} projets principaux")
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def __contains__(self, build_type_id: str) -> bool:
+        return build_type_id in self.by_id
+
+    def get(self, build_type_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne un build par son buildTypeId"""
+        return self.by_id.get(build_type_id)
+
+    def get_many(self, build_type_ids: Iterable[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Résout plusieurs buildTypeIds en un seul passage: (trouvés, manquants)"""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for build_type_id in build_type_ids:
+            build = self.by_id.get(build_type_id)
+            if build is not None:
+                found[build_type_id] = build
+            elif build_type_id not in missing:
+                missing.append(build_type_id)
+        return found, missing
+
+    def select(self, build_type_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """Retourne les builds sélectionnés, dans l'ordre du catalogue TeamCity"""
+        wanted = {i for i in build_type_ids if i in self.by_id}
+        ordered_ids = sorted(wanted, key=self._position.__getitem__)
+        return [self.by_id[i] for i in ordered_ids]
+
+    def builds_in_project(self, project_path: str) -> List[Dict[str, Any]]:
+        """Builds rattachés exactement à ce chemin de projet"""
+        return self.by_project_path.get(project_path, [])
+
+    def builds_in_top_project(self, top_project: str) -> List[Dict[str, Any]]:
+        """Builds rattachés à un projet principal (tous sous-projets confondus)"""
+        return self.by_top_project.get(top_project, [])
@@ -0,0 +1,281 @@
+"""
+Fin de log d'un build TeamCity, diffusée sans télécharger le log complet côté navigateur
+- lecture par plage HTTP (Range: bytes=-N) sur /downloadBuildLog.html, relayée morceau par morceau;
+  si le serveur ignore la plage, le log est lu en flux et seuls les N derniers octets sont gardés en mémoire
+- builds terminés: le segment lu est mis en cache sur disque (LOG_CACHE_DIR, LOG_CACHE_MAX_MB au total),
+  lectures et écritures du cache dans le pool de threads
+- mode suivi (builds en cours): relecture à partir du dernier octet envoyé toutes les LOG_FOLLOW_INTERVAL s,
+  jusqu'à la fin du build ou LOG_FOLLOW_MAX_SECONDS
+"""
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from . import metrics
+from .environment import load_environment
+from .teamcity_fetcher import teamcity_url, _get_headers, _is_teamcity_configured
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAIL_KB = 64
+MAX_TAIL_KB = 1024
+CHUNK_SIZE = 16 * 1024
+REQUEST_TIMEOUT = 10.0
+DEFAULT_LOG_CACHE_DIR = "cache/logs"
+DEFAULT_LOG_CACHE_MAX_MB = 200
+DEFAULT_FOLLOW_INTERVAL = 2.0
+DEFAULT_FOLLOW_MAX_SECONDS = 600.0
+BUILD_NOT_FOUND = "not_found"
+
+LOG_BYTES = metrics.registry.counter(
+    "build_log_bytes_total",
+    "Octets de logs de build lus depuis TeamCity ou le cache disque",
+    ("source",),
+)
+
+# Transport httpx des appels TeamCity (remplaçable dans les tests)
+_transport: Optional[httpx.AsyncBaseTransport] = None
+
+
+def _env_float(name: str, default: float) -> float:
+    load_environment()
+    return float(os.getenv(name) or default)
+
+
+def _log_url(build_id: str) -> str:
+    return f"{teamcity_url()}/downloadBuildLog.html?buildId={build_id}&plain=true"
+
+
+def _client() -> httpx.AsyncClient:
+    headers = {**_get_headers(), "Accept": "text/plain"}
+    return httpx.AsyncClient(headers=headers, timeout=REQUEST_TIMEOUT, transport=_transport)
+
+
+class LogTailCache:
+    """Segments de fin de log des builds terminés: <buildId>.tail (N derniers octets) ou <buildId>.full (log entier)"""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def read(self, build_id: str, size: int) -> Optional[bytes]:
+        """Les `size` derniers octets si le segment en cache les couvre, à partir d'un début de ligne
+        (même réponse que la lecture réseau: les segments sont stockés bruts, ligne tronquée comprise)"""
+        full_path = self.directory / f"{build_id}.full"
+        tail_path = self.directory / f"{build_id}.tail"
+        for path, complete in ((full_path, True), (tail_path, False)):
+            try:
+                data = path.read_bytes()
+            except OSError:
+                continue
+            if complete or len(data) >= size:
+                os.utime(path)  # dernière utilisation, pour l'éviction
+                if complete and len(data) <= size:
+                    return data
+                return _skip_partial_line(data[-size:])
+        return None
+
+    def write(self, build_id: str, data: bytes, complete: bool):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{build_id}.{'full' if complete else 'tail'}"
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{build_id}.", suffix=".tmp", dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self._prune()
+        except Exception as e:
+            logger.warning(f"Cache disque du log {build_id} non écrit: {e}")
+
+    def _prune(self):
+        """Supprime les segments les moins récemment utilisés au-delà de max_bytes"""
+        with self._lock:
+            entries = []
+            for path in self.directory.glob("*.*"):
+                if path.suffix not in (".tail", ".full"):
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except OSError:
+                    pass
+
+
+def create_log_cache() -> LogTailCache:
+    load_environment()
+    return LogTailCache(
+        Path(os.getenv("LOG_CACHE_DIR") or DEFAULT_LOG_CACHE_DIR),
+        int(_env_float("LOG_CACHE_MAX_MB", DEFAULT_LOG_CACHE_MAX_MB) * 1024 * 1024),
+    )
+
+
+log_cache = create_log_cache()
+
+
+async def fetch_build_state(build_id: str) -> Optional[str]:
+    """'running', 'finished', 'queued'...; BUILD_NOT_FOUND si le build n'existe pas, None si TeamCity ne répond pas"""
+    if not _is_teamcity_configured():
+        return None
+    url = f"{teamcity_url()}/app/rest/builds/id:{build_id}?fields=id,state"
+    try:
+        async with httpx.AsyncClient(headers=_get_headers(), timeout=REQUEST_TIMEOUT, transport=_transport) as client:
+            response = await client.get(url)
+        if response.status_code == 404:
+            return BUILD_NOT_FOUND
+        if response.status_code != 200:
+            logger.error(f"État du build {build_id} non lu: HTTP {response.status_code}")
+            return None
+        return ET.fromstring(response.text).attrib.get("state") or None
+    except Exception as e:
+        logger.error(f"Erreur lecture de l'état du build {build_id}: {e}")
+        return None
+
+
+def _content_range_total(header: str) -> Optional[int]:
+    """'bytes 100-199/5000' -> 5000"""
+    total = header.rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def _skip_partial_line(chunk: bytes) -> bytes:
+    """Une fin de log commence rarement au début d'une ligne: on l'écarte (et un caractère UTF-8 coupé avec)"""
+    newline = chunk.find(b"\n")
+    return chunk[newline + 1:] if newline >= 0 else b""
+
+
+class _TailReader:
+    """Lit la fin du log puis, en suivi, les octets ajoutés; `offset` = octets du log déjà couverts (None: inconnu)"""
+
+    def __init__(self, client: httpx.AsyncClient, build_id: str, size: int):
+        self.client = client
+        self.build_id = build_id
+        self.size = size
+        self.offset: Optional[int] = 0
+        # Fenêtre brute des size derniers octets (ligne tronquée comprise), pour le cache disque des builds terminés
+        self.segment = bytearray()
+        self.complete = False
+
+    def _keep(self, chunk: bytes):
+        self.segment += chunk
+        if len(self.segment) > self.size:
+            del self.segment[:len(self.segment) - self.size]
+
+    async def tail(self) -> AsyncIterator[bytes]:
+        headers = {"Range": f"bytes=-{self.size}"}
+        async with self.client.stream("GET", _log_url(self.build_id), headers=headers) as response:
+            if response.status_code == 416:
+                return
+            response.raise_for_status()
+            if response.status_code == 206:
+                total = _content_range_total(response.headers.get("content-range", ""))
+                # Taille totale inconnue ('bytes 0-99/*'): ni log complet, ni position de reprise pour le suivi
+                self.offset = total
+                self.complete = total is not None and total <= self.size
+                first = not self.complete
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    LOG_BYTES.inc(len(chunk), source="teamcity")
+                    self._keep(chunk)
+                    if first:
+                        # Jusqu'au premier saut de ligne: ligne tronquée par la plage
+                        newline = chunk.find(b"\n")
+                        if newline < 0:
+                            continue
+                        chunk, first = chunk[newline + 1:], False
+                    if chunk:
+                        yield chunk
+                return
+            # Plage ignorée: lecture en flux, seuls les size derniers octets restent en mémoire
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                self.offset += len(chunk)
+                LOG_BYTES.inc(len(chunk), source="teamcity")
+                self._keep(chunk)
+        self.complete = self.offset <= self.size
+        data = bytes(self.segment) if self.complete else _skip_partial_line(bytes(self.segment))
+        if data:
+            yield data
+
+    async def new_bytes(self) -> AsyncIterator[bytes]:
+        """Octets écrits depuis `offset` (suivi d'un build en cours)"""
+        headers = {"Range": f"bytes={self.offset}-"}
+        async with self.client.stream("GET", _log_url(self.build_id), headers=headers) as response:
+            if response.status_code == 416:
+                return
+            response.raise_for_status()
+            skip = self.offset if response.status_code == 200 else 0
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                if skip:
+                    dropped = min(skip, len(chunk))
+                    chunk, skip = chunk[dropped:], skip - dropped
+                if not chunk:
+                    continue
+                self.offset += len(chunk)
+                LOG_BYTES.inc(len(chunk), source="teamcity")
+                yield chunk
+
+
+async def stream_log_tail(build_id: str, size: int, state: str, follow: bool = False) -> AsyncIterator[bytes]:
+    """Corps de la réponse: fin du log (cache disque si le build est terminé), puis suivi éventuel"""
+    finished = state == "finished"
+    if finished:
+        cached = await run_in_threadpool(log_cache.read, build_id, size)
+        if cached is not None:
+            LOG_BYTES.inc(len(cached), source="disk_cache")
+            yield cached
+            return
+
+    try:
+        async with _client() as client:
+            reader = _TailReader(client, build_id, size)
+            async for chunk in reader.tail():
+                yield chunk
+            if finished:
+                await run_in_threadpool(log_cache.write, build_id, bytes(reader.segment), reader.complete)
+                return
+            if not follow or reader.offset is None:
+                return
+
+            interval = _env_float("LOG_FOLLOW_INTERVAL", DEFAULT_FOLLOW_INTERVAL)
+            deadline = time.monotonic() + _env_float("LOG_FOLLOW_MAX_SECONDS", DEFAULT_FOLLOW_MAX_SECONDS)
+            while time.monotonic() < deadline:
+                await asyncio.sleep(interval)
+                running = await fetch_build_state(build_id) not in ("finished", None)
+                # Dernière lecture après la fin du build: les dernières lignes écrites sont envoyées
+                async for chunk in reader.new_bytes():
+                    yield chunk
+                if not running:
+                    return
+    except httpx.HTTPError as e:
+        logger.error(f"Erreur lecture du log du build {build_id}: {e}")
+        yield f"\n[teamcity-monitor] lecture du log interrompue: {e}\n".encode("utf-8")
+
+
+def tail_size(kb: Optional[int]) -> Tuple[bool, int]:
+    """(valide, taille en octets) pour ?kb=; défaut DEFAULT_TAIL_KB, maximum MAX_TAIL_KB"""
+    kb = DEFAULT_TAIL_KB if kb is None else kb
+    return 0 < kb <= MAX_TAIL_KB, kb * 1024
@@ -0,0 +1,135 @@
+"""
+Index de l'arborescence des builds pour une expansion à la demande
+Chaque nœud est adressé par son chemin 'Projet/Catégorie/Sous-catégorie'
+"""
+from typing import List, Dict, Any, Optional, Set, FrozenSet, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+PATH_SEPARATOR = "/"
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+
+class _TreeNode:
+    __slots__ = ("name", "path", "children", "builds", "build_ids", "entries")
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.children: Dict[str, "_TreeNode"] = {}
+        self.builds: List[Dict[str, Any]] = []
+        self.build_ids: FrozenSet[str] = frozenset()
+        # Sous-nœuds puis builds, précalculés pour paginer par simple découpage
+        self.entries: List[Tuple[str, Any]] = []
+
+
+def join_path(segments: List[str]) -> str:
+    return PATH_SEPARATOR.join(segments)
+
+
+def split_path(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    return [segment for segment in path.split(PATH_SEPARATOR) if segment]
+
+
+def _selection_state(selected_count: int, build_count: int) -> str:
+    """Même convention que les classes CSS des cases à cocher"""
+    if selected_count == 0:
+        return ""
+    if selected_count == build_count:
+        return "checked"
+    return "indeterminate"
+
+
+class BuildTreeIndex:
+    """Arborescence indexée par chemin, construite une fois par rafraîchissement du catalogue"""
+
+    def __init__(self, tree: Dict[str, Any]):
+        self._nodes: Dict[str, _TreeNode] = {}
+        self.root = self._build_node("", [], {"subprojects": tree or {}})
+        logger.debug(f"Arborescence indexée: {len(self._nodes)} nœuds, {len(self.root.build_ids)} builds")
+
+    def _build_node(self, name: str, segments: List[str], data: Dict[str, Any]) -> _TreeNode:
+        node = _TreeNode(name, join_path(segments))
+        self._nodes[node.path] = node
+
+        build_ids: Set[str] = set()
+        for child_key, child_data in (data.get("subprojects") or {}).items():
+            child = self._build_node(child_data.get("name", child_key), segments + [child_key], child_data)
+            node.children[child_key] = child
+            build_ids |= child.build_ids
+
+        node.builds = list(data.get("builds") or [])
+        build_ids.update(b["buildTypeId"] for b in node.builds if b.get("buildTypeId"))
+        node.build_ids = frozenset(build_ids)
+        node.entries = [("node", child) for child in node.children.values()] + [("build", b) for b in node.builds]
+        return node
+
+    def __contains__(self, path: str) -> bool:
+        return join_path(split_path(path)) in self._nodes
+
+    @property
+    def total_builds(self) -> int:
+        return len(self.root.build_ids)
+
+    def _get_node(self, path: Optional[str]) -> _TreeNode:
+        node = self._nodes.get(join_path(split_path(path)))
+        if node is None:
+            raise KeyError(path)
+        return node
+
+    def list_children(self, path: Optional[str], selected: Set[str],
+                      cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """Enfants d'un nœud (sous-projets puis builds), paginés, avec compteurs et état de sélection"""
+        node = self._get_node(path)
+        offset = int(cursor) if cursor else 0
+        if offset < 0:
+            raise ValueError("cursor invalide")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        children: List[Dict[str, Any]] = []
+        for kind, entry in node.entries[offset:offset + limit]:
+            if kind == "node":
+                selected_count = len(entry.build_ids & selected)
+                children.append({
+                    "type": "project",
+                    "name": entry.name,
+                    "path": entry.path,
+                    "build_count": len(entry.build_ids),
+                    "selected_count": selected_count,
+                    "selection": _selection_state(selected_count, len(entry.build_ids)),
+                    "child_count": len(entry.entries),
+                })
+            else:
+                children.append({
+                    "type": "build",
+                    **entry,
+                    "path": node.path,
+                    "selected": entry.get("buildTypeId") in selected,
+                })
+
+        next_offset = offset + limit
+        selected_count = len(node.build_ids & selected)
+        return {
+            "path": node.path,
+            "name": node.name,
+            "children": children,
+            "total_children": len(node.entries),
+            "next_cursor": str(next_offset) if next_offset < len(node.entries) else None,
+            "build_count": len(node.build_ids),
+            "selected_count": selected_count,
+            "selection": _selection_state(selected_count, len(node.build_ids)),
+        }
+
+    def list_build_ids(self, path: Optional[str]) -> List[Dict[str, str]]:
+        """Tous les builds du sous-arbre avec le chemin de leur nœud parent"""
+        result: List[Dict[str, str]] = []
+        stack = [self._get_node(path)]
+        while stack:
+            node = stack.pop()
+            result.extend({"buildTypeId": b["buildTypeId"], "path": node.path} for b in node.builds if b.get("buildTypeId"))
+            stack.extend(reversed(list(node.children.values())))
+        return result
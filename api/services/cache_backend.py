@@ -0,0 +1,254 @@
+"""
+Backend de cache partagé entre workers uvicorn
+- LocalCacheBackend: dictionnaire en mémoire (un seul processus)
+- SQLiteCacheBackend: fichier SQLite en mode WAL + verrous fichier inter-processus
+Sélection via CACHE_BACKEND=local|sqlite (et CACHE_DB_PATH pour le fichier)
+"""
+from typing import Any, Optional, Tuple, Dict, Iterator
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .environment import load_environment
+
+try:
+    import fcntl
+except ImportError:  # Windows: verrous limités au processus courant
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DB_PATH = "cache/teamcity_cache.sqlite3"
+
+
+class CacheBackend(ABC):
+    """Interface commune: valeurs JSON horodatées + verrous de rafraîchissement"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Retourne (valeur, horodatage epoch) ou None"""
+
+    def stamp(self, key: str) -> Optional[float]:
+        """Horodatage seul, sans désérialiser la valeur (vérification de fraîcheur bon marché)"""
+        entry = self.get(key)
+        return entry[1] if entry else None
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> float:
+        """Enregistre la valeur; retourne son horodatage"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Supprime l'entrée (sans erreur si elle est absente)"""
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """Incrémente un compteur entier (versions d'invalidation)"""
+
+    @abstractmethod
+    def lock(self, name: str, timeout: float = 30.0):
+        """Verrou exclusif (context manager); produit False si le délai est dépassé"""
+
+
+class LocalCacheBackend(CacheBackend):
+    """Cache en mémoire du processus courant"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, float]] = {}
+        self._guard = threading.Lock()
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        return self._data.get(key)
+
+    def set(self, key: str, value: Any) -> float:
+        stored_at = time.time()
+        self._data[key] = (value, stored_at)
+        return stored_at
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._guard:
+            current = self._data.get(key, (0, 0.0))[0] or 0
+            value = int(current) + 1
+            self._data[key] = (value, time.time())
+            return value
+
+    @contextmanager
+    def lock(self, name: str, timeout: float = 30.0) -> Iterator[bool]:
+        with self._guard:
+            named_lock = self._locks.setdefault(name, threading.Lock())
+        acquired = named_lock.acquire(timeout=timeout)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                named_lock.release()
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache partagé par tous les workers d'une même machine (SQLite WAL)"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "cache_key TEXT PRIMARY KEY, "
+                "cache_value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = self._connect().execute(
+            "SELECT cache_value, stored_at FROM cache_entries WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def stamp(self, key: str) -> Optional[float]:
+        row = self._connect().execute(
+            "SELECT stored_at FROM cache_entries WHERE cache_key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: Any) -> float:
+        stored_at = time.time()
+        self._connect().execute(
+            "INSERT INTO cache_entries (cache_key, cache_value, stored_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(cache_key) DO UPDATE SET cache_value = excluded.cache_value, stored_at = excluded.stored_at",
+            (key, json.dumps(value, ensure_ascii=False), stored_at)
+        )
+        return stored_at
+
+    def delete(self, key: str):
+        self._connect().execute("DELETE FROM cache_entries WHERE cache_key = ?", (key,))
+
+    def incr(self, key: str) -> int:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT cache_value FROM cache_entries WHERE cache_key = ?", (key,)).fetchone()
+            value = int(json.loads(row[0]) or 0) + 1 if row else 1
+            conn.execute(
+                "INSERT INTO cache_entries (cache_key, cache_value, stored_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(cache_key) DO UPDATE SET cache_value = excluded.cache_value, stored_at = excluded.stored_at",
+                (key, json.dumps(value), time.time())
+            )
+            conn.execute("COMMIT")
+            return value
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def lock(self, name: str, timeout: float = 30.0) -> Iterator[bool]:
+        lock_path = self.db_path.with_name(f"{self.db_path.name}.{name}.lock")
+        handle = open(lock_path, "a+")
+        acquired = False
+        try:
+            if fcntl is None:
+                acquired = True
+            else:
+                deadline = time.monotonic() + timeout
+                while True:
+                    try:
+                        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        acquired = True
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() >= deadline:
+                            logger.warning(f"Verrou cache '{name}' non obtenu après {timeout}s")
+                            break
+                        time.sleep(0.05)
+            yield acquired
+        finally:
+            if acquired and fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            handle.close()
+
+
+def create_cache_backend(kind: Optional[str] = None) -> CacheBackend:
+    """Instancie le backend configuré; repli sur le cache local en cas d'erreur"""
+    load_environment()
+    kind = (kind or os.getenv("CACHE_BACKEND", "local")).strip().lower()
+    if kind == "sqlite":
+        db_path = os.getenv("CACHE_DB_PATH", DEFAULT_CACHE_DB_PATH)
+        try:
+            backend = SQLiteCacheBackend(db_path)
+            logger.info(f"Cache partagé SQLite: {db_path}")
+            return backend
+        except Exception as e:
+            logger.error(f"Cache SQLite indisponible ({db_path}), repli sur le cache local: {e}")
+    elif kind != "local":
+        logger.warning(f"CACHE_BACKEND inconnu '{kind}', utilisation du cache local")
+    return LocalCacheBackend()
+
+
+_cache_backend: Optional[CacheBackend] = None
+_cache_backend_lock = threading.Lock()
+
+
+def get_cache_backend() -> CacheBackend:
+    """Instance partagée par les routes et services, créée à la première utilisation"""
+    global _cache_backend
+    if _cache_backend is None:
+        with _cache_backend_lock:
+            if _cache_backend is None:
+                _cache_backend = create_cache_backend()
+    return _cache_backend
+
+
+class VersionedCache:
+    """Valeur chargée une fois par processus et servie depuis la mémoire; chaque écriture incrémente un
+    compteur partagé (get_cache_backend().incr), ce qui invalide la copie de tous les workers"""
+
+    def __init__(self, version_key: str, max_age: Optional[float] = None):
+        self.version_key = version_key
+        # Relecture de sécurité (modifications faites directement en base)
+        self.max_age = max_age
+        self._version: Optional[int] = None
+        self._loaded_at = 0.0
+        self._value: Any = None
+
+    def current_version(self) -> int:
+        entry = get_cache_backend().get(self.version_key)
+        return int(entry[0] or 0) if entry else 0
+
+    def get(self) -> Tuple[bool, Any, int]:
+        """(trouvé, valeur, version courante); la version sert à stocker le résultat d'un rechargement"""
+        version = self.current_version()
+        fresh = self.max_age is None or time.monotonic() - self._loaded_at < self.max_age
+        if self._version == version and fresh:
+            return True, self._value, version
+        return False, None, version
+
+    def store(self, version: int, value: Any):
+        """Version lue AVANT le chargement: une écriture concurrente invalide ce résultat"""
+        self._value = value
+        self._loaded_at = time.monotonic()
+        self._version = version
+
+    def invalidate(self) -> int:
+        self._version = None
+        return get_cache_backend().incr(self.version_key)
@@ -0,0 +1,32 @@
+"""
+Chargement unique du fichier .env et configuration du logging
+Appelés explicitement (au démarrage ou avant la lecture d'une variable), jamais en effet de bord d'import
+"""
+from pathlib import Path
+from dotenv import load_dotenv
+import logging
+import threading
+
+ENV_PATH = Path(__file__).resolve().parent.parent.parent / ".env"
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_env_lock = threading.Lock()
+_env_loaded = False
+
+
+def load_environment() -> bool:
+    """Charge .env une seule fois par processus (idempotent); les variables déjà définies sont prioritaires"""
+    global _env_loaded
+    if _env_loaded:
+        return False
+    with _env_lock:
+        if _env_loaded:
+            return False
+        load_dotenv(ENV_PATH)
+        _env_loaded = True
+        return True
+
+
+def configure_logging(level: int = logging.INFO):
+    """Configuration du logger racine (sans effet si des handlers sont déjà installés)"""
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=[logging.StreamHandler()])
@@ -0,0 +1,135 @@
+"""
+Résumé des échecs de builds (problèmes et tests en échec), récupéré à la demande
+- dernier build en échec d'un buildType: une requête à chaque appel (il change au prochain échec)
+- problèmes et tests en échec de ce build: cache LRU borné, indexé par ID de build (un build terminé ne change plus)
+- plusieurs buildTypes: FAILURE_BATCH_SIZE requêtes parallèles au plus (exécuteur partagé par toutes les requêtes,
+  une seule lecture en cours par buildType); à l'échéance, les résumés manquants sont `pending` et leurs requêtes
+  finissent en arrière-plan (détails mis en cache pour l'appel suivant)
+- FAILURE_CACHE_SIZE: nombre de builds gardés en cache (défaut 256)
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Hashable, List, Optional
+import logging
+import os
+import threading
+
+from . import metrics
+from . import timing
+from .environment import load_environment
+from .teamcity_fetcher import fetch_latest_failed_build, fetch_build_problems, fetch_failed_tests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAILURE_CACHE_SIZE = 256
+FAILURE_BATCH_SIZE = 8
+
+
+class LRUCache:
+    """Dictionnaire borné: l'entrée la moins récemment lue ou écrite est évincée au-delà de max_size"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _cache_size() -> int:
+    load_environment()
+    return int(os.getenv("FAILURE_CACHE_SIZE") or DEFAULT_FAILURE_CACHE_SIZE)
+
+
+failure_cache = LRUCache(_cache_size())
+
+
+def get_build_failure_details(build_id: str) -> Optional[Dict[str, Any]]:
+    """Problèmes et tests en échec d'un build terminé; None (non mis en cache) si TeamCity ne répond pas"""
+    cached = failure_cache.get(build_id)
+    if cached is not None:
+        metrics.CACHE_REQUESTS.inc(cache="build_failures", result="local_hit")
+        return cached
+    metrics.CACHE_REQUESTS.inc(cache="build_failures", result="miss")
+
+    problems = fetch_build_problems(build_id)
+    tests = fetch_failed_tests(build_id)
+    if problems is None or tests is None:
+        return None
+    details = {
+        "problems": problems,
+        "failed_tests": tests["tests"],
+        "failed_tests_truncated": tests["truncated"]
+    }
+    failure_cache.put(build_id, details)
+    return details
+
+
+def get_failure_summary(build_type_id: str) -> Dict[str, Any]:
+    """Résumé du dernier échec; `result` vaut ok, not_found (aucun build en échec) ou unavailable"""
+    build = fetch_latest_failed_build(build_type_id)
+    if build is None:
+        return {"buildTypeId": build_type_id, "result": "unavailable"}
+    if not build:
+        return {"buildTypeId": build_type_id, "result": "not_found"}
+
+    details = get_build_failure_details(build["id"])
+    if details is None:
+        return {"buildTypeId": build_type_id, "result": "unavailable", "build": build}
+    return {"buildTypeId": build_type_id, "result": "ok", "build": build, **details}
+
+
+_executor = ThreadPoolExecutor(max_workers=FAILURE_BATCH_SIZE, thread_name_prefix="failures")
+# Lectures en cours par buildType: une lecture en retard est partagée par les appels suivants
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _forget(build_type_id: str, future: Future):
+    with _inflight_lock:
+        if _inflight.get(build_type_id) is future:
+            del _inflight[build_type_id]
+
+
+def _submit_summary(build_type_id: str) -> Future:
+    with _inflight_lock:
+        future = _inflight.get(build_type_id)
+        if future is not None:
+            return future
+        future = _inflight[build_type_id] = _executor.submit(
+            timing.with_request_context(get_failure_summary), build_type_id)
+    # Hors du verrou: le rappel s'exécute immédiatement si la lecture est déjà terminée
+    future.add_done_callback(lambda done: _forget(build_type_id, done))
+    return future
+
+
+def get_failure_summaries(build_type_ids: List[str], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Résumés de plusieurs buildTypes en parallèle (ordre des IDs conservé)
+    deadline: secondes d'attente au plus; au-delà, `result` vaut pending"""
+    if not build_type_ids:
+        return []
+    futures = [_submit_summary(build_type_id) for build_type_id in build_type_ids]
+    done, _ = wait(futures, timeout=deadline)
+    return [
+        future.result() if future in done else {"buildTypeId": build_type_id, "result": "pending"}
+        for build_type_id, future in zip(build_type_ids, futures)
+    ]
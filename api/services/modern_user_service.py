@@ -3,8 +3,9 @@ Service moderne pour la gestion des sélections utilisateur
 Remplace le système médiocre de fichiers JSON hardcodés
 Compatible avec MySQL existant
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from ..models.user_selection import UserBuildSelection, UserPreferences, DEFAULT_USER_PREFERENCES
+import asyncio
 import json
 import logging
 from pathlib import Path
@@ -15,60 +16,76 @@ class ModernUserService:
     """Service professionnel pour la gestion des sélections utilisateur"""
     
     def __init__(self):
-        # Initialiser les tables si nécessaire
-        self.initialize_tables()
+        # Tables créées au démarrage de l'application (lifespan), pas à l'import
+        self.tables_initialized = False
     
-    def initialize_tables(self):
-        """Initialise les tables de base de données"""
+    async def initialize_tables(self) -> bool:
+        """Initialise les tables de base de données; retourne False si la DB est indisponible"""
         try:
-            UserBuildSelection.create_table()
-            UserPreferences.create_table()
+            if not await UserBuildSelection._is_db_available():
+                logger.warning("Base de données indisponible: tables non initialisées (mode dégradé)")
+                return False
+            await UserBuildSelection.create_table()
+            await UserPreferences.create_table()
+            await UserBuildSelection.import_file_fallback()
+            self.tables_initialized = True
             logger.info("Tables utilisateur initialisées avec succès")
+            return True
         except Exception as e:
             # Ne pas interrompre l'application si la DB est indisponible
             logger.error(f"Erreur lors de l'initialisation des tables (mode dégradé): {e}")
+            return False
     
     # === GESTION DES SÉLECTIONS DE BUILDS ===
     
-    def get_selected_builds(self) -> List[str]:
+    async def get_selected_builds(self) -> List[str]:
         """Récupère les IDs des builds sélectionnés"""
-        return UserBuildSelection.get_selected_builds()
+        return await UserBuildSelection.get_selected_builds()
     
-    def get_build_info(self, build_type_id: str) -> Optional[Dict[str, Any]]:
+    async def get_build_info(self, build_type_id: str) -> Optional[Dict[str, Any]]:
         """Récupère les informations d'un build depuis la base de données"""
-        return UserBuildSelection.get_build_info(build_type_id)
+        return await UserBuildSelection.get_build_info(build_type_id)
     
-    def update_build_selection(self, build_type_id: str, project_name: str, 
+    async def update_build_selection(self, build_type_id: str, project_name: str, 
                              build_name: str, is_selected: bool) -> bool:
         """Met à jour la sélection d'un build"""
-        return UserBuildSelection.update_selection(build_type_id, project_name, build_name, is_selected)
+        return await UserBuildSelection.update_selection(build_type_id, project_name, build_name, is_selected)
     
-    def bulk_update_selections(self, selected_build_ids: List[str], 
+    async def bulk_update_selections(self, selected_build_ids: List[str], 
                              all_builds: List[Dict[str, Any]]) -> bool:
         """Met à jour toutes les sélections en une fois (plus efficace)"""
-        return UserBuildSelection.bulk_update_selections(selected_build_ids, all_builds)
+        return await UserBuildSelection.bulk_update_selections(selected_build_ids, all_builds)
+    
+    async def patch_selection(self, add: List[str], remove: List[str], base_version: Optional[str] = None,
+                              build_info: Optional[Dict[str, Tuple[str, str]]] = None) -> Optional[Dict[str, Any]]:
+        """Ajoute/retire des builds de la sélection sans la réécrire entièrement"""
+        return await UserBuildSelection.patch_selection(add, remove, base_version, build_info)
+    
+    def selection_version(self, selected_build_ids: List[str]) -> str:
+        """Version (empreinte du contenu) d'une sélection"""
+        return UserBuildSelection.selection_version(selected_build_ids)
     
-    def clear_all_selections(self) -> bool:
+    async def clear_all_selections(self) -> bool:
         """Supprime toutes les sélections"""
-        return UserBuildSelection.clear_all_selections()
+        return await UserBuildSelection.clear_all_selections()
     
     # === GESTION DES PRÉFÉRENCES ===
     
-    def get_user_preference(self, key: str, default_value: Any = None) -> Any:
+    async def get_user_preference(self, key: str, default_value: Any = None) -> Any:
         """Récupère une préférence utilisateur"""
-        return UserPreferences.get_preference(key, default_value)
+        return await UserPreferences.get_preference(key, default_value)
     
-    def set_user_preference(self, key: str, value: Any) -> bool:
+    async def set_user_preference(self, key: str, value: Any) -> bool:
         """Définit une préférence utilisateur"""
-        return UserPreferences.set_preference(key, value)
+        return await UserPreferences.set_preference(key, value)
     
-    def get_all_preferences(self) -> Dict[str, Any]:
+    async def get_all_preferences(self) -> Dict[str, Any]:
         """Récupère toutes les préférences utilisateur"""
-        return UserPreferences.get_all_preferences()
+        return await UserPreferences.get_all_preferences()
     
     # === MÉTHODES DE MIGRATION ===
     
-    def migrate_from_json_config(self, json_config_path: str) -> bool:
+    async def migrate_from_json_config(self, json_config_path: str) -> bool:
         """Migre depuis l'ancien système JSON vers la base de données"""
         try:
             config_file = Path(json_config_path)
@@ -93,7 +110,7 @@ class ModernUserService:
                         "name": build_id
                     })
                 
-                success = self.bulk_update_selections(selected_builds, fake_builds)
+                success = await self.bulk_update_selections(selected_builds, fake_builds)
                 if success:
                     logger.info("Migration réussie depuis JSON vers base de données")
                     return True
@@ -104,11 +121,13 @@ class ModernUserService:
             logger.error(f"Erreur lors de la migration: {e}")
             return False
     
-    def get_config_for_api(self) -> Dict[str, Any]:
+    async def get_config_for_api(self) -> Dict[str, Any]:
         """Retourne la configuration au format attendu par l'API"""
         try:
-            selected_builds = self.get_selected_builds()
-            preferences = self.get_all_preferences()
+            selected_builds, (preferences, preferences_version) = await asyncio.gather(
+                self.get_selected_builds(), UserPreferences.get_preferences_snapshot()
+            )
+            selection_version = self.selection_version(selected_builds)
             
             return {
                 "builds": {
@@ -120,6 +139,9 @@ class ModernUserService:
                     }
                 },
                 "selectedBuilds": selected_builds,
+                "selectionVersion": selection_version,
+                "preferencesVersion": preferences_version,
+                "configVersion": f"{selection_version}-{preferences_version}",
                 "preferences": preferences
             }
         except Exception as e:
@@ -128,6 +150,9 @@ class ModernUserService:
                 "builds": {"selectedBuilds": []},
                 "config": {"builds": {"selectedBuilds": []}},
                 "selectedBuilds": [],
+                "selectionVersion": None,
+                "preferencesVersion": None,
+                "configVersion": None,
                 "preferences": DEFAULT_USER_PREFERENCES.copy()
             }
 
@@ -0,0 +1,264 @@
+"""
+Surveillance de la file d'attente TeamCity (/app/rest/buildQueue)
+Interrogée par le rafraîchissement en tâche de fond; garde en mémoire bornée:
+- les builds actuellement en file (attente courante, raison d'attente)
+- le temps passé en file par les builds sortis, en percentiles glissants: global, par buildType et par raison
+- QUEUE_POLL_INTERVAL: secondes entre deux relevés (défaut 15)
+- QUEUE_STATS_WINDOW: fenêtre des percentiles en secondes (défaut 3600)
+Un build disparu de la file entre deux relevés a attendu jusqu'au milieu de cet intervalle. Après une pause
+des relevés (aucun dashboard ouvert, TeamCity indisponible), les builds sortis pendant la pause sont oubliés
+sans échantillon: leur heure de sortie est inconnue.
+"""
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+import logging
+import math
+import os
+import threading
+import time
+
+from . import metrics
+from .environment import load_environment
+from .teamcity_fetcher import fetch_teamcity_build_queue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_POLL_INTERVAL = 15.0
+DEFAULT_QUEUE_STATS_WINDOW = 3600.0
+# Bornes mémoire: échantillons par série, séries par buildType et par raison
+MAX_SAMPLES_PER_SERIES = 512
+MAX_TRACKED_BUILD_TYPES = 500
+MAX_TRACKED_REASONS = 50
+PERCENTILES = (50, 90, 99)
+# Écart entre deux relevés (en intervalles) au-delà duquel une sortie de file n'est plus datable
+MAX_POLL_GAP = 2.0
+
+QUEUE_SIZE = metrics.registry.gauge(
+    "teamcity_queue_size",
+    "Builds en file d'attente TeamCity au dernier relevé",
+)
+QUEUE_WAIT = metrics.registry.histogram(
+    "teamcity_queue_wait_seconds",
+    "Temps passé en file d'attente par les builds sortis de la file",
+    buckets=(5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200),
+)
+
+
+def parse_teamcity_date(value: str) -> Optional[float]:
+    """'20240315T101530+0100' -> timestamp; None si absent ou illisible"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y%m%dT%H%M%S%z").timestamp()
+    except ValueError:
+        return None
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """Méthode du rang le plus proche"""
+    index = max(0, math.ceil(percentile / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class RollingPercentiles:
+    """Derniers échantillons (au plus max_samples, au plus max_age secondes); percentiles calculés à la lecture"""
+
+    def __init__(self, max_age: float, max_samples: int = MAX_SAMPLES_PER_SERIES):
+        self.max_age = max_age
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+
+    def add(self, value: float, now: float):
+        self._samples.append((now, value))
+
+    def _prune(self, now: float):
+        cutoff = now - self.max_age
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def summary(self, now: float) -> Dict[str, Any]:
+        self._prune(now)
+        values = sorted(value for _, value in self._samples)
+        if not values:
+            return {"samples": 0}
+        result: Dict[str, Any] = {"samples": len(values)}
+        for percentile in PERCENTILES:
+            result[f"p{percentile}"] = round(_percentile(values, percentile), 1)
+        result["max"] = round(values[-1], 1)
+        return result
+
+
+class _BoundedSeries:
+    """Séries par clé, la moins récemment alimentée évincée au-delà de max_keys"""
+
+    def __init__(self, max_keys: int, max_age: float):
+        self.max_keys = max_keys
+        self.max_age = max_age
+        self._series: "OrderedDict[str, RollingPercentiles]" = OrderedDict()
+
+    def add(self, key: str, value: float, now: float):
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = RollingPercentiles(self.max_age)
+            if len(self._series) > self.max_keys:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(key)
+        series.add(value, now)
+
+    def summaries(self, now: float) -> Dict[str, Dict[str, Any]]:
+        result = {key: series.summary(now) for key, series in self._series.items()}
+        return {key: summary for key, summary in result.items() if summary["samples"]}
+
+
+class BuildQueueMonitor:
+    def __init__(self, fetch: Callable[[], Optional[List[Dict[str, Any]]]] = fetch_teamcity_build_queue,
+                 interval: Optional[float] = None, window: Optional[float] = None):
+        load_environment()
+        self.fetch = fetch
+        self.interval = interval if interval is not None else float(
+            os.getenv("QUEUE_POLL_INTERVAL") or DEFAULT_QUEUE_POLL_INTERVAL)
+        self.window = window if window is not None else float(
+            os.getenv("QUEUE_STATS_WINDOW") or DEFAULT_QUEUE_STATS_WINDOW)
+        self._lock = threading.Lock()
+        # Builds en file au dernier relevé: id -> entrée (avec queued_at et last_seen)
+        self._queued: Dict[str, Dict[str, Any]] = {}
+        self._overall = RollingPercentiles(self.window)
+        self._by_build_type = _BoundedSeries(MAX_TRACKED_BUILD_TYPES, self.window)
+        self._by_reason = _BoundedSeries(MAX_TRACKED_REASONS, self.window)
+        self._names: "OrderedDict[str, str]" = OrderedDict()
+        self._last_poll: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    def observe(self, queued: Iterable[Dict[str, Any]], now: Optional[float] = None):
+        """Intègre un relevé de la file: les builds absents du relevé sont comptés comme sortis"""
+        now = time.time() if now is None else now
+        with self._lock:
+            current: Dict[str, Dict[str, Any]] = {}
+            for build in queued:
+                build_id = str(build.get("id", ""))
+                previous = self._queued.get(build_id)
+                queued_at = parse_teamcity_date(build.get("queuedDate", ""))
+                if queued_at is None:
+                    queued_at = previous["queued_at"] if previous else now
+                current[build_id] = {**build, "queued_at": queued_at, "last_seen": now}
+                if build.get("buildTypeId"):
+                    self._names[build["buildTypeId"]] = build.get("name") or build["buildTypeId"]
+                    self._names.move_to_end(build["buildTypeId"])
+            while len(self._names) > MAX_TRACKED_BUILD_TYPES:
+                self._names.popitem(last=False)
+
+            max_gap = MAX_POLL_GAP * self.interval
+            for build_id, entry in self._queued.items():
+                if build_id in current:
+                    continue
+                if now - entry["last_seen"] > max_gap:
+                    # Relevés en pause: la sortie peut dater de plusieurs heures, pas d'attente fictive
+                    continue
+                left_at = entry["last_seen"] + (now - entry["last_seen"]) / 2
+                wait = max(0.0, left_at - entry["queued_at"])
+                self._overall.add(wait, now)
+                self._by_build_type.add(entry.get("buildTypeId") or "", wait, now)
+                self._by_reason.add(entry.get("waitReason") or "Inconnue", wait, now)
+                QUEUE_WAIT.observe(wait)
+
+            self._queued = current
+            self._last_poll = now
+            self._last_error = None
+        QUEUE_SIZE.set(len(current))
+
+    def poll(self) -> bool:
+        """Relevé bloquant (exécuté par le rafraîchissement en tâche de fond)"""
+        queued = self.fetch()
+        if queued is None:
+            # File inconnue: on garde l'état précédent plutôt que de compter de fausses sorties
+            self._last_error = "file d'attente TeamCity indisponible"
+            self._last_poll = time.time()
+            return False
+        self.observe(queued)
+        return True
+
+    def poll_if_stale(self) -> bool:
+        """Relevé à la demande si le rafraîchissement de fond n'a pas tourné récemment"""
+        if self._last_poll is not None and time.time() - self._last_poll < self.interval:
+            return False
+        return self.poll()
+
+    def _queued_entries(self, now: float) -> List[Dict[str, Any]]:
+        entries = [{
+            "id": entry.get("id", ""),
+            "buildTypeId": entry.get("buildTypeId", ""),
+            "name": entry.get("name", ""),
+            "projectName": entry.get("projectName", ""),
+            "waitReason": entry.get("waitReason", ""),
+            "wait_seconds": round(max(0.0, now - entry["queued_at"]), 1)
+        } for entry in self._queued.values()]
+        entries.sort(key=lambda entry: entry["wait_seconds"], reverse=True)
+        return entries
+
+    def snapshot(self, limit: int = 50) -> Dict[str, Any]:
+        """Vue complète pour /api/queue: file courante (plus longues attentes d'abord) et percentiles"""
+        now = time.time()
+        with self._lock:
+            queued = self._queued_entries(now)
+            by_type = self._by_build_type.summaries(now)
+            current_by_type: Dict[str, Dict[str, Any]] = {}
+            reasons_now: Dict[str, int] = {}
+            for entry in queued:
+                stats = current_by_type.setdefault(entry["buildTypeId"], {"queued": 0, "oldest_wait_seconds": 0.0})
+                stats["queued"] += 1
+                stats["oldest_wait_seconds"] = max(stats["oldest_wait_seconds"], entry["wait_seconds"])
+                reason = entry["waitReason"] or "Inconnue"
+                reasons_now[reason] = reasons_now.get(reason, 0) + 1
+            build_types = [{
+                "buildTypeId": build_type_id,
+                "name": self._names.get(build_type_id, build_type_id),
+                **current_by_type.get(build_type_id, {"queued": 0, "oldest_wait_seconds": 0.0}),
+                "wait": by_type.get(build_type_id, {"samples": 0})
+            } for build_type_id in set(by_type) | set(current_by_type)]
+            build_types.sort(key=lambda item: (item["wait"].get("p90", 0), item["queued"]), reverse=True)
+            reason_waits = self._by_reason.summaries(now)
+            reasons = [{
+                "reason": reason,
+                "queued": reasons_now.get(reason, 0),
+                "wait": reason_waits.get(reason, {"samples": 0})
+            } for reason in set(reason_waits) | set(reasons_now)]
+            reasons.sort(key=lambda item: (item["queued"], item["wait"]["samples"]), reverse=True)
+            return {
+                "queued_count": len(queued),
+                "queued": queued[:max(0, limit)],
+                "wait": self._overall.summary(now),
+                "build_types": build_types,
+                "wait_reasons": reasons,
+                "window_seconds": self.window,
+                "poll_interval": self.interval,
+                "last_poll": self._last_poll,
+                "error": self._last_error
+            }
+
+    def summary(self, build_type_ids: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Résumé compact pour le dashboard: taille de la file, percentiles globaux, builds sélectionnés en file"""
+        now = time.time()
+        wanted = set(build_type_ids) if build_type_ids is not None else None
+        with self._lock:
+            queued = self._queued_entries(now)
+            selected: Dict[str, Dict[str, Any]] = {}
+            for entry in queued:
+                if wanted is not None and entry["buildTypeId"] not in wanted:
+                    continue
+                stats = selected.setdefault(entry["buildTypeId"], {"queued": 0, "oldest_wait_seconds": 0.0})
+                stats["queued"] += 1
+                stats["oldest_wait_seconds"] = max(stats["oldest_wait_seconds"], entry["wait_seconds"])
+            return {
+                "queued_count": len(queued),
+                "wait": self._overall.summary(now),
+                "builds": selected,
+                "last_poll": self._last_poll
+            }
+
+
+# Instance partagée: alimentée par le rafraîchissement en tâche de fond, lue par /api/queue et le dashboard
+build_queue_monitor = BuildQueueMonitor()
@@ -0,0 +1,185 @@
+"""
+Relances et requêtes couvertes (hedging) des appels TeamCity, pour réduire la traîne de latence
+- relance des GET idempotents en échec transitoire (connexion, timeout, HTTP 5xx/429): au plus TEAMCITY_RETRIES
+  relances, attente exponentielle avec gigue complète (0 à min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2^n))
+- requête couverte: une tentative de lecture de statut encore sans réponse au-delà du percentile
+  TEAMCITY_HEDGE_PERCENTILE des latences récentes est doublée, la première réponse valide est retenue;
+  les relances enveloppent la tentative couverte (leurs attentes n'entrent pas dans les latences observées)
+- budgets: relances et doublons sont prélevés sur un seau alimenté par les requêtes normales
+  (TEAMCITY_RETRY_BUDGET, TEAMCITY_HEDGE_BUDGET: fraction du trafic), ils ne peuvent donc pas démultiplier la charge
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional
+import logging
+import math
+import os
+import random
+import threading
+import time
+
+from . import metrics
+from . import timing
+from .environment import load_environment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_RETRIES = 2
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+DEFAULT_RETRY_BUDGET = 0.1
+DEFAULT_HEDGE_BUDGET = 0.05
+DEFAULT_HEDGE_PERCENTILE = 95.0
+# Réserve du seau: autorise quelques relances après une période calme
+RETRY_BUDGET_RESERVE = 10.0
+HEDGE_BUDGET_RESERVE = 5.0
+LATENCY_WINDOW = 500
+MIN_HEDGE_SAMPLES = 20
+MIN_HEDGE_DELAY = 0.05
+HEDGE_WORKERS = 32
+
+RETRIES = metrics.registry.counter(
+    "teamcity_retries_total",
+    "Relances de requêtes TeamCity (sent: relancée, budget_exhausted: refusée par le budget)",
+    ("result",),
+)
+HEDGES = metrics.registry.counter(
+    "teamcity_hedged_requests_total",
+    "Requêtes de statut doublées (sent, won: le doublon a répondu le premier, budget_exhausted)",
+    ("result",),
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    load_environment()
+    return float(os.getenv(name) or default)
+
+
+class RequestBudget:
+    """Seau de jetons: chaque requête normale ajoute `ratio` jeton (jusqu'à `reserve`), une relance en consomme un"""
+
+    def __init__(self, ratio: float, reserve: float):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = reserve
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self._tokens = min(self.reserve, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return self._tokens
+
+
+class RetryPolicy:
+    def __init__(self, max_retries: Optional[int] = None, budget: Optional[RequestBudget] = None,
+                 rng: Optional[random.Random] = None):
+        self.max_retries = max_retries if max_retries is not None else int(
+            _env_float("TEAMCITY_RETRIES", DEFAULT_MAX_RETRIES))
+        self.budget = budget or RequestBudget(
+            _env_float("TEAMCITY_RETRY_BUDGET", DEFAULT_RETRY_BUDGET), RETRY_BUDGET_RESERVE)
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """Attente avant la relance n° attempt (0 pour la première), gigue complète"""
+        return self._rng.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+    def allow_retry(self, attempt: int) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if not self.budget.try_acquire():
+            RETRIES.inc(result="budget_exhausted")
+            return False
+        RETRIES.inc(result="sent")
+        return True
+
+
+class Hedger:
+    """Double un appel encore sans réponse au-delà d'un percentile des latences récentes"""
+
+    def __init__(self, percentile: Optional[float] = None, budget: Optional[RequestBudget] = None,
+                 workers: int = HEDGE_WORKERS):
+        self.percentile = percentile if percentile is not None else _env_float(
+            "TEAMCITY_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE)
+        self.budget = budget or RequestBudget(
+            _env_float("TEAMCITY_HEDGE_BUDGET", DEFAULT_HEDGE_BUDGET), HEDGE_BUDGET_RESERVE)
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+
+    def observe(self, duration: float):
+        with self._lock:
+            self._latencies.append(duration)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seuil de doublement; None tant que les échantillons sont trop peu nombreux (ou percentile >= 100)"""
+        with self._lock:
+            if len(self._latencies) < MIN_HEDGE_SAMPLES or self.percentile >= 100:
+                return None
+            values = sorted(self._latencies)
+        index = max(0, math.ceil(self.percentile / 100 * len(values)) - 1)
+        return max(MIN_HEDGE_DELAY, values[index])
+
+    def _timed(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        def run(*args):
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.observe(time.perf_counter() - start)
+        return run
+
+    def call(self, func: Callable[..., Any], *args, is_success: Callable[[Any], bool] = lambda result: True) -> Any:
+        """Résultat de func(*args), ou de son doublon s'il répond (avec succès) le premier"""
+        self.budget.record_request()
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(func)(*args)
+
+        primary = self._executor.submit(timing.with_request_context(self._timed(func)), *args)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        if not self.budget.try_acquire():
+            HEDGES.inc(result="budget_exhausted")
+            return primary.result()
+
+        HEDGES.inc(result="sent")
+        hedge = self._executor.submit(timing.with_request_context(func), *args)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            results = [(future, future.result()) for future in done]
+            for future, result in results:
+                if is_success(result):
+                    if future is hedge:
+                        HEDGES.inc(result="won")
+                    return result
+            if not pending:
+                # Les deux appels ont échoué: réponse de l'appel initial
+                return primary.result()
+
+    def snapshot(self) -> Dict[str, Any]:
+        delay = self.hedge_delay()
+        with self._lock:
+            samples = len(self._latencies)
+        return {
+            "percentile": self.percentile,
+            "samples": samples,
+            "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            "budget_tokens": round(self.budget.tokens, 2)
+        }
+
+
+retry_policy = RetryPolicy()
+status_hedger = Hedger()
@@ -0,0 +1,219 @@
+"""
+Index de recherche en mémoire pour la page de configuration
+Index de préfixes + trigrammes sur les noms, buildTypeIds et chemins de projets
+"""
+from typing import List, Dict, Any, Optional, Callable, Set, Tuple
+import logging
+import re
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Longueur max des préfixes indexés (au-delà on passe par les trigrammes)
+MAX_PREFIX_LENGTH = 24
+
+# Poids par champ pour le classement
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "buildTypeId": 2.0,
+    "path": 1.0,
+}
+
+
+def normalize_text(text: str) -> str:
+    """Minuscules sans accents pour une recherche tolérante"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Découpe en mots, y compris les identifiants CamelCase et snake_case"""
+    if not text:
+        return []
+    # Séparer CamelCase (Go2Version612_BuildDebug -> Go2 Version612 Build Debug)
+    spaced = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    return [t for t in re.split(r"[^0-9a-z]+", normalize_text(spaced)) if t]
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class BuildSearchIndex:
+    """
+    Index de recherche des builds, mis à jour incrémentalement à chaque
+    rafraîchissement du catalogue (seuls les builds ajoutés/modifiés/supprimés sont réindexés)
+    """
+
+    def __init__(self, path_resolver: Optional[Callable[[Dict[str, Any]], List[str]]] = None):
+        self._path_resolver = path_resolver or (lambda build: [])
+        self._lock = threading.Lock()
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._signatures: Dict[str, Tuple[str, str]] = {}
+        self._prefix_index: Dict[str, Set[str]] = {}
+        self._trigram_index: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def sync(self, builds: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Aligne l'index sur la liste de builds en ne traitant que les différences"""
+        incoming: Dict[str, Dict[str, Any]] = {}
+        for build in builds or []:
+            build_type_id = build.get("buildTypeId") or build.get("id")
+            if build_type_id and build_type_id not in incoming:
+                incoming[build_type_id] = build
+
+        with self._lock:
+            removed = [i for i in self._docs if i not in incoming]
+            changed = [
+                i for i, b in incoming.items()
+                if self._signatures.get(i) != (b.get("name", ""), b.get("projectName", ""))
+            ]
+            for build_type_id in removed:
+                self._remove(build_type_id)
+            for build_type_id in changed:
+                if build_type_id in self._docs:
+                    self._remove(build_type_id)
+                self._add(build_type_id, incoming[build_type_id])
+
+        stats = {"added_or_updated": len(changed), "removed": len(removed), "total": len(self._docs)}
+        if changed or removed:
+            logger.info(f"Index de recherche mis à jour: {stats}")
+        return stats
+
+    def _add(self, build_type_id: str, build: Dict[str, Any]):
+        name = build.get("name", "") or ""
+        project_name = build.get("projectName", "") or ""
+        path = self._path_resolver(build) or []
+        fields = {
+            "name": normalize_text(name),
+            "buildTypeId": normalize_text(build_type_id),
+            "path": normalize_text(" / ".join([project_name] + list(path))),
+        }
+        tokens = {
+            "name": set(tokenize(name)),
+            "buildTypeId": set(tokenize(build_type_id)),
+            "path": set(tokenize(project_name)) | {t for part in path for t in tokenize(part)},
+        }
+        keys = set()
+        for field_tokens in tokens.values():
+            for token in field_tokens:
+                for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                    keys.add(token[:length])
+        grams = set()
+        for text in fields.values():
+            grams |= trigrams(text)
+
+        for key in keys:
+            self._prefix_index.setdefault(key, set()).add(build_type_id)
+        for gram in grams:
+            self._trigram_index.setdefault(gram, set()).add(build_type_id)
+
+        self._docs[build_type_id] = {
+            "buildTypeId": build_type_id,
+            "name": name,
+            "projectName": project_name,
+            "path": list(path),
+            "_fields": fields,
+            "_tokens": tokens,
+            "_keys": keys,
+            "_grams": grams,
+        }
+        self._signatures[build_type_id] = (name, project_name)
+
+    def _remove(self, build_type_id: str):
+        doc = self._docs.pop(build_type_id, None)
+        self._signatures.pop(build_type_id, None)
+        if doc is None:
+            return
+        for index, keys in ((self._prefix_index, doc["_keys"]), (self._trigram_index, doc["_grams"])):
+            for key in keys:
+                postings = index.get(key)
+                if postings is None:
+                    continue
+                postings.discard(build_type_id)
+                if not postings:
+                    del index[key]
+
+    def _candidates_for_term(self, term: str) -> Set[str]:
+        """Builds dont un mot commence par le terme, ou qui le contiennent (trigrammes)"""
+        matches = set(self._prefix_index.get(term[:MAX_PREFIX_LENGTH], ()))
+        if len(term) >= 3:
+            gram_sets = [self._trigram_index.get(g) for g in trigrams(term)]
+            if all(gram_sets):
+                gram_sets.sort(key=len)
+                candidates = set(gram_sets[0]).intersection(*gram_sets[1:])
+                # Vérifier la sous-chaîne réelle (les trigrammes peuvent donner des faux positifs)
+                matches |= {
+                    i for i in candidates
+                    if any(term in text for text in self._docs[i]["_fields"].values())
+                }
+        elif not matches:
+            matches = {i for i, doc in self._docs.items() if any(term in text for text in doc["_fields"].values())}
+        return matches
+
+    def _score(self, doc: Dict[str, Any], terms: List[str], raw_query: str) -> float:
+        score = 0.0
+        if doc["_fields"]["buildTypeId"] == raw_query:
+            score += 100.0
+        if doc["_fields"]["name"] == raw_query:
+            score += 50.0
+        for term in terms:
+            for field, weight in FIELD_WEIGHTS.items():
+                field_tokens = doc["_tokens"][field]
+                if term in field_tokens:
+                    score += 3.0 * weight
+                elif any(token.startswith(term) for token in field_tokens):
+                    score += 2.0 * weight
+                elif term in doc["_fields"][field]:
+                    score += 1.0 * weight
+        # Favoriser légèrement les noms courts (plus spécifiques)
+        return score + 1.0 / (1 + len(doc["name"]))
+
+    def search(self, query: str, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """Recherche classée et paginée"""
+        raw_query = normalize_text(query or "").strip()
+        terms = tokenize(query or "")
+        offset = max(0, offset)
+        limit = max(1, min(limit, 500))
+
+        if not terms:
+            return {"query": query, "total": 0, "offset": offset, "limit": limit, "hits": []}
+
+        with self._lock:
+            result: Optional[Set[str]] = None
+            # Commencer par le terme le plus long (généralement le plus sélectif)
+            for term in sorted(terms, key=len, reverse=True):
+                candidates = self._candidates_for_term(term)
+                result = candidates if result is None else result & candidates
+                if not result:
+                    break
+            result = result or set()
+
+            scored = sorted(
+                ((self._score(self._docs[i], terms, raw_query), i) for i in result),
+                key=lambda item: (-item[0], self._docs[item[1]]["name"].lower(), item[1])
+            )
+            page = scored[offset:offset + limit]
+            hits = [
+                {
+                    "buildTypeId": self._docs[i]["buildTypeId"],
+                    "name": self._docs[i]["name"],
+                    "projectName": self._docs[i]["projectName"],
+                    "path": self._docs[i]["path"],
+                    "score": round(score, 3),
+                }
+                for score, i in page
+            ]
+
+        return {
+            "query": query,
+            "total": len(scored),
+            "offset": offset,
+            "limit": limit,
+            "hits": hits,
+        }
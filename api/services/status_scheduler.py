@@ -0,0 +1,300 @@
+"""
+Planification adaptative du rafraîchissement des statuts, buildType par buildType
+Chaque buildType suivi (demandé par un dashboard) a son propre intervalle selon son état et son activité:
+- build en cours ou en file d'attente: STATUS_POLL_MIN secondes (15 par défaut)
+- build inactif: une fraction de la durée d'inactivité (dernier changement, sinon date de fin du dernier build),
+  bornée entre ACTIVE_POLL_INTERVAL et STATUS_POLL_MAX (900 s par défaut)
+- gigue de ±20 % pour que les rafraîchissements ne tombent pas tous en même temps
+La tâche de fond rafraîchit les statuts arrivés à échéance, pour les seuls buildTypes affichés par une session
+de dashboard ouverte (subscriptions); le dashboard lit le cache et ne va chercher lui-même que les statuts
+absents ou échus (tâche de fond arrêtée, ou premier affichage après une période sans session).
+Lecture en échec (TeamCity indisponible): la dernière valeur connue est gardée et servie marquée `stale`,
+nouvelle tentative après FAILURE_BACKOFF secondes (doublé à chaque échec, au plus ACTIVE_POLL_INTERVAL).
+Avec une échéance, le dashboard n'attend pas les lectures lentes: il sert la dernière valeur connue marquée
+`stale` (ou `pending` si aucune), et la lecture en retard termine en arrière-plan puis met le cache à jour.
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Collection, Deque, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+import os
+import random
+import threading
+import time
+
+from . import metrics
+from . import timing
+from .environment import load_environment
+from .queue_monitor import build_queue_monitor, parse_teamcity_date
+from .subscriptions import subscriptions
+from .teamcity_fetcher import fetch_latest_build_status
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_INTERVAL = 15.0
+ACTIVE_POLL_INTERVAL = 60.0
+DEFAULT_MAX_INTERVAL = 900.0
+# Intervalle d'un build inactif = durée d'inactivité / IDLE_DIVISOR (1 h d'inactivité -> 3 min)
+IDLE_DIVISOR = 20.0
+JITTER = 0.2
+SCHEDULER_TICK = 5.0
+MAX_POLLS_PER_TICK = 50
+POLL_WORKERS = 12
+# Un buildType qu'aucun dashboard n'a demandé depuis ce délai n'est plus suivi
+TRACKING_TTL = 3600.0
+RATE_WINDOW = 300.0
+FAILURE_BACKOFF = 5.0
+
+STATUS_POLLS = metrics.registry.counter(
+    "status_polls_total",
+    "Statuts de buildTypes rafraîchis, par origine (scheduled: tâche de fond, on_demand: requête dashboard)",
+    ("origin",),
+)
+STATUS_POLL_FAILURES = metrics.registry.counter(
+    "status_poll_failures_total",
+    "Lectures de statut en échec (TeamCity indisponible), la dernière valeur connue est gardée",
+    ("origin",),
+)
+STATUS_LATE = metrics.registry.counter(
+    "status_deadline_misses_total",
+    "Statuts en retard ou en échec, servis depuis le cache (stale) ou en attente (pending)",
+    ("served",),
+)
+
+
+class _Entry:
+    __slots__ = ("status", "fetched_at", "next_due", "interval", "last_change", "requested_at", "activity",
+                 "failures")
+
+    def __init__(self, requested_at: float):
+        self.status: Optional[Dict[str, Any]] = None
+        self.fetched_at = 0.0
+        self.next_due = 0.0
+        self.interval = 0.0
+        self.last_change: Optional[float] = None
+        self.requested_at = requested_at
+        self.activity = "unknown"
+        self.failures = 0
+
+
+class AdaptiveStatusScheduler:
+    def __init__(self, fetch: Callable[[str], Dict[str, Any]] = fetch_latest_build_status,
+                 queued_build_types: Callable[[], Iterable[str]] = lambda: build_queue_monitor.summary()["builds"],
+                 min_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 rng: Optional[random.Random] = None,
+                 watched: Optional[Callable[[], Collection[str]]] = None):
+        load_environment()
+        self.fetch = fetch
+        self.queued_build_types = queued_build_types
+        # BuildTypes affichés par un client; None: tous les buildTypes suivis
+        self.watched = watched
+        self.min_interval = min_interval if min_interval is not None else float(
+            os.getenv("STATUS_POLL_MIN") or DEFAULT_MIN_INTERVAL)
+        self.max_interval = max_interval if max_interval is not None else float(
+            os.getenv("STATUS_POLL_MAX") or DEFAULT_MAX_INTERVAL)
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        # Lectures en cours par buildType: une lecture en retard est partagée, jamais relancée
+        self._inflight: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=POLL_WORKERS, thread_name_prefix="status")
+        # Horodatages des rafraîchissements récents et nombre de requêtes TeamCity de chacun
+        self._polls: Deque[Tuple[float, int]] = deque()
+
+    # --- Intervalles ---
+    def classify(self, entry: _Entry, queued: bool, now: float) -> Tuple[str, float]:
+        """(activité, intervalle de base sans gigue)"""
+        status = entry.status or {}
+        if status.get("state") == "running":
+            return "running", self.min_interval
+        if queued:
+            return "queued", self.min_interval
+        last_activity = entry.last_change or parse_teamcity_date(status.get("finishDate", ""))
+        if last_activity is None:
+            return "unknown", max(self.min_interval, ACTIVE_POLL_INTERVAL)
+        idle = max(0.0, now - last_activity)
+        interval = min(self.max_interval, max(self.min_interval, ACTIVE_POLL_INTERVAL, idle / IDLE_DIVISOR))
+        return ("active" if interval <= ACTIVE_POLL_INTERVAL else "dormant"), interval
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + self._rng.uniform(-JITTER, JITTER))
+
+    def _store(self, build_type_id: str, status: Dict[str, Any], queued: bool, now: float):
+        entry = self._entries.get(build_type_id)
+        if entry is None:
+            entry = self._entries[build_type_id] = _Entry(now)
+        previous = entry.status
+        if previous is not None and (
+            previous.get("number") != status.get("number") or previous.get("state") != status.get("state")
+        ):
+            entry.last_change = now
+        entry.status = status
+        entry.failures = 0
+        entry.fetched_at = now
+        entry.activity, entry.interval = self.classify(entry, queued, now)
+        entry.next_due = now + self._jittered(entry.interval)
+
+    def _store_failure(self, build_type_id: str, now: float):
+        """Échec de lecture: valeur précédente gardée (ni changement ni nouvel intervalle), relance rapprochée"""
+        entry = self._entries.get(build_type_id)
+        if entry is None:
+            entry = self._entries[build_type_id] = _Entry(now)
+        entry.failures += 1
+        backoff = min(max(self.min_interval, ACTIVE_POLL_INTERVAL), FAILURE_BACKOFF * 2 ** (entry.failures - 1))
+        entry.next_due = now + self._jittered(backoff)
+
+    @staticmethod
+    def _served(entry: _Entry) -> Dict[str, Any]:
+        """Statut servi sans lecture fraîche: dernière valeur connue marquée stale, sinon pending"""
+        if entry.status is not None:
+            STATUS_LATE.inc(served="stale")
+            return {**entry.status, "stale": True}
+        STATUS_LATE.inc(served="pending")
+        return {"status": "UNKNOWN", "state": "pending", "number": "", "pending": True}
+
+    # --- Rafraîchissement ---
+    def _fetch_and_store(self, build_type_id: str, origin: str, queued: Set[str]) -> Optional[Dict[str, Any]]:
+        try:
+            status = self.fetch(build_type_id)
+        except Exception as e:
+            logger.warning(f"Statut de {build_type_id} non rafraîchi: {e}")
+            status = None
+        try:
+            now = time.time()
+            if status is None:
+                with self._lock:
+                    self._store_failure(build_type_id, now)
+                STATUS_POLL_FAILURES.inc(origin=origin)
+                return None
+            with self._lock:
+                self._store(build_type_id, status, build_type_id in queued, now)
+                # Build en cours: une requête; sinon deux (en cours, puis dernier terminé)
+                self._polls.append((now, 1 if status.get("state") == "running" else 2))
+            STATUS_POLLS.inc(origin=origin)
+            return status
+        finally:
+            with self._lock:
+                self._inflight.pop(build_type_id, None)
+
+    def _fetch_many(self, build_type_ids: List[str], origin: str,
+                    deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Statuts lus avant l'échéance (deadline en secondes, None: tous); les autres finissent en arrière-plan"""
+        if not build_type_ids:
+            return {}
+        queued = set(self.queued_build_types())
+        futures: Dict[str, Future] = {}
+        with self._lock:
+            for build_type_id in build_type_ids:
+                future = self._inflight.get(build_type_id)
+                if future is None:
+                    future = self._inflight[build_type_id] = self._executor.submit(
+                        timing.with_request_context(self._fetch_and_store), build_type_id, origin, queued)
+                futures[build_type_id] = future
+        done, _ = wait(futures.values(), timeout=deadline)
+        results = {}
+        for build_type_id, future in futures.items():
+            status = future.result() if future in done else None
+            if status is not None:
+                results[build_type_id] = status
+        return results
+
+    def poll_due(self) -> int:
+        """Tâche de fond: rafraîchit les buildTypes regardés arrivés à échéance (les plus en retard d'abord)"""
+        watched = self.watched() if self.watched is not None else None
+        if watched is not None and not watched:
+            return 0
+        now = time.time()
+        with self._lock:
+            for build_type_id in [b for b, e in self._entries.items() if now - e.requested_at > TRACKING_TTL]:
+                del self._entries[build_type_id]
+            due = sorted(
+                (e.next_due, b) for b, e in self._entries.items()
+                if e.next_due <= now and (watched is None or b in watched)
+            )
+        build_type_ids = [build_type_id for _, build_type_id in due[:MAX_POLLS_PER_TICK]]
+        self._fetch_many(build_type_ids, "scheduled")
+        return len(build_type_ids)
+
+    def statuses_for(self, build_type_ids: List[str], deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Statuts pour le dashboard: cache si pas encore échu, sinon lecture immédiate (et suivi du buildType)
+        Lecture non terminée à l'échéance ou en échec: dernière valeur connue marquée stale, sinon statut pending"""
+        now = time.time()
+        missing = []
+        result: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for build_type_id in build_type_ids:
+                entry = self._entries.get(build_type_id)
+                if entry is None:
+                    entry = self._entries[build_type_id] = _Entry(now)
+                entry.requested_at = now
+                if entry.next_due > now and entry.failures:
+                    # Échec récent: pas de nouvelle lecture avant la fin du délai de relance
+                    result[build_type_id] = self._served(entry)
+                elif entry.next_due > now and entry.status is not None:
+                    result[build_type_id] = entry.status
+                else:
+                    missing.append(build_type_id)
+        result.update(self._fetch_many(missing, "on_demand", deadline))
+        late = [build_type_id for build_type_id in missing if build_type_id not in result]
+        with self._lock:
+            for build_type_id in late:
+                result[build_type_id] = self._served(self._entries.get(build_type_id) or _Entry(now))
+        return result
+
+    def enrich(self, builds: List[Dict[str, Any]], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Équivalent de enrich_builds_with_status servi par le cache planifié"""
+        statuses = self.statuses_for([b.get("buildTypeId", "") for b in builds], deadline)
+        return [{**build, **statuses.get(build.get("buildTypeId", ""), {})} for build in builds]
+
+    # --- Observabilité ---
+    def suggested_refresh_ms(self, build_type_ids: Iterable[str], default_ms: int = 120000) -> int:
+        """Délai conseillé au frontend: le plus court intervalle des buildTypes affichés, borné à default_ms"""
+        with self._lock:
+            intervals = [self._entries[b].interval for b in build_type_ids if b in self._entries]
+        intervals = [interval for interval in intervals if interval > 0]
+        if not intervals:
+            return default_ms
+        return int(min(default_ms, max(self.min_interval, min(intervals)) * 1000))
+
+    def polls_per_minute(self) -> float:
+        now = time.time()
+        with self._lock:
+            while self._polls and self._polls[0][0] < now - RATE_WINDOW:
+                self._polls.popleft()
+            return round(len(self._polls) * 60 / RATE_WINDOW, 2)
+
+    def snapshot(self, limit: int = 100) -> Dict[str, Any]:
+        now = time.time()
+        rate = self.polls_per_minute()
+        with self._lock:
+            requests = sum(count for _, count in self._polls)
+            entries = sorted(self._entries.items(), key=lambda item: item[1].next_due)
+            by_activity: Dict[str, int] = {}
+            for _, entry in entries:
+                by_activity[entry.activity] = by_activity.get(entry.activity, 0) + 1
+            return {
+                "tracked": len(entries),
+                "in_flight": len(self._inflight),
+                "by_activity": by_activity,
+                "expected_polls_per_minute": round(sum(60 / e.interval for _, e in entries if e.interval), 2),
+                "effective_polls_per_minute": rate,
+                "teamcity_requests_per_minute": round(requests * 60 / RATE_WINDOW, 2),
+                "min_interval": self.min_interval,
+                "max_interval": self.max_interval,
+                "build_types": [{
+                    "buildTypeId": build_type_id,
+                    "activity": entry.activity,
+                    "interval": round(entry.interval, 1),
+                    "next_in": round(max(0.0, entry.next_due - now), 1),
+                    "age": round(now - entry.fetched_at, 1) if entry.fetched_at else None
+                } for build_type_id, entry in entries[:max(0, limit)]]
+            }
+
+
+status_scheduler = AdaptiveStatusScheduler(watched=subscriptions.watched)
+
+STATUS_POLL_RATE = metrics.registry.gauge(
+    "status_polls_per_minute",
+    "Rafraîchissements de statuts par minute (moyenne sur 5 minutes)",
+    callback=status_scheduler.polls_per_minute,
+)
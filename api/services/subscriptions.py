@@ -0,0 +1,129 @@
+"""
+Sessions de dashboard et buildTypes qu'elles affichent (abonnements avec compteur de références)
+Chaque appel du dashboard vaut battement de cœur pour sa session (?session=, sinon l'adresse du client) et
+remplace la liste des buildTypes suivis. Une session sans battement depuis DASHBOARD_SESSION_TTL secondes
+(300 par défaut), ou fermée explicitement (onglet masqué ou fermé), libère ses buildTypes. Le rafraîchissement
+en tâche de fond ne porte que sur les buildTypes encore référencés, et s'arrête sans session ouverte.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Set
+import logging
+import os
+import threading
+import time
+
+from . import metrics
+from .environment import load_environment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_TTL = 300.0
+MAX_SESSIONS = 10000
+
+
+class _Session:
+    __slots__ = ("build_type_ids", "last_seen", "client")
+
+    def __init__(self, build_type_ids: FrozenSet[str], now: float, client: str):
+        self.build_type_ids = build_type_ids
+        self.last_seen = now
+        self.client = client
+
+
+class SubscriptionRegistry:
+    def __init__(self, session_ttl: Optional[float] = None, max_sessions: int = MAX_SESSIONS):
+        load_environment()
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl if session_ttl is not None else float(
+            os.getenv("DASHBOARD_SESSION_TTL") or DEFAULT_SESSION_TTL)
+        self._lock = threading.Lock()
+        # Ordre des derniers battements de cœur: la session la moins récente en tête
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._refcounts: Dict[str, int] = {}
+
+    def _release(self, session: _Session):
+        for build_type_id in session.build_type_ids:
+            count = self._refcounts.get(build_type_id, 0) - 1
+            if count > 0:
+                self._refcounts[build_type_id] = count
+            else:
+                self._refcounts.pop(build_type_id, None)
+
+    def _expire(self, now: float):
+        cutoff = now - self.session_ttl
+        for session_id in [s for s, session in self._sessions.items() if session.last_seen < cutoff]:
+            self._release(self._sessions.pop(session_id))
+            logger.debug(f"Session de dashboard expirée: {session_id}")
+
+    def subscribe(self, session_id: str, build_type_ids: Iterable[str], client: str = ""):
+        """Battement de cœur d'une session; sa liste de buildTypes remplace la précédente"""
+        now = time.time()
+        wanted = frozenset(build_type_ids)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                if len(self._sessions) >= self.max_sessions:
+                    self._expire(now)
+                if len(self._sessions) >= self.max_sessions:
+                    # Plafond atteint (identifiants fournis par les clients): la session la moins récente sort
+                    oldest, evicted = self._sessions.popitem(last=False)
+                    self._release(evicted)
+                    logger.warning(f"Plafond de {self.max_sessions} sessions de dashboard atteint: {oldest} évincée")
+                session = self._sessions[session_id] = _Session(frozenset(), now, client)
+            if session.build_type_ids != wanted:
+                self._release(session)
+                for build_type_id in wanted:
+                    self._refcounts[build_type_id] = self._refcounts.get(build_type_id, 0) + 1
+                session.build_type_ids = wanted
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+
+    def unsubscribe(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self._release(session)
+            return True
+
+    def watched(self) -> Set[str]:
+        """BuildTypes affichés par au moins une session vivante"""
+        with self._lock:
+            self._expire(time.time())
+            return set(self._refcounts)
+
+    def session_count(self) -> int:
+        with self._lock:
+            self._expire(time.time())
+            return len(self._sessions)
+
+    def has_sessions(self) -> bool:
+        return self.session_count() > 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            return {
+                "sessions": len(self._sessions),
+                "watched_build_types": len(self._refcounts),
+                "session_ttl": self.session_ttl,
+                "most_watched": sorted(
+                    ({"buildTypeId": b, "sessions": c} for b, c in self._refcounts.items()),
+                    key=lambda item: item["sessions"], reverse=True
+                )[:20]
+            }
+
+
+subscriptions = SubscriptionRegistry()
+
+DASHBOARD_SESSIONS = metrics.registry.gauge(
+    "dashboard_sessions",
+    "Sessions de dashboard ouvertes (battement de cœur récent)",
+    callback=subscriptions.session_count,
+)
+WATCHED_BUILD_TYPES = metrics.registry.gauge(
+    "watched_build_types",
+    "BuildTypes affichés par au moins une session de dashboard",
+    callback=lambda: len(subscriptions.watched()),
+)
@@ -1,32 +1,44 @@
 import os
 import requests
 import xml.etree.ElementTree as ET
-from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
 import re
+import time
+from urllib.parse import urlsplit
+from . import metrics
+from . import timing
+from .teamcity_recorder import recorder
+from .request_policy import retry_policy, status_hedger
+from .environment import load_environment
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env'))
+DEFAULT_TEAMCITY_URL = 'http://192.168.0.48:8080'
 
-TEAMCITY_URL = os.getenv('TEAMCITY_URL', 'http://192.168.0.48:8080')
-TEAMCITY_TOKEN = os.getenv('TEAMCITY_TOKEN', '')
+def teamcity_url() -> str:
+    """URL du serveur TeamCity, lue à l'appel (.env chargé à la demande, jamais figée à l'import)"""
+    load_environment()
+    return os.getenv('TEAMCITY_URL', DEFAULT_TEAMCITY_URL)
+
+def teamcity_token() -> str:
+    load_environment()
+    return os.getenv('TEAMCITY_TOKEN', '')
 
 def _get_headers():
     """Retourne les headers communs pour les requêtes TeamCity"""
     return {
-        'Authorization': f'Bearer {TEAMCITY_TOKEN}',
+        'Authorization': f'Bearer {teamcity_token()}',
         'Accept': 'application/xml'
     }
 
 def _is_teamcity_configured():
-    """Vérifie si TeamCity est configuré"""
-    configured = bool(TEAMCITY_TOKEN and TEAMCITY_URL)
+    """Vérifie si TeamCity est configuré (toujours vrai en rejeu d'un enregistrement)"""
+    url, token = teamcity_url(), teamcity_token()
+    configured = recorder.replaying or bool(token and url)
     if not configured:
-        logger.warning(f"TeamCity non configuré - URL: {TEAMCITY_URL}, Token: {'✓' if TEAMCITY_TOKEN else '✗'}")
+        logger.warning(f"TeamCity non configuré - URL: {url}, Token: {'✓' if token else '✗'}")
     return configured
 
 def is_project_active(project_name: str, project_archived: bool = False, parent_archived: bool = False) -> bool:
@@ -42,37 +54,88 @@ def is_project_active(project_name: str, project_archived: bool = False, parent_
     # Tous les autres projets sont considérés comme actifs
     return True
 
-def _make_teamcity_request(url: str) -> ET.Element:
-    """Effectue une requête TeamCity et retourne l'élément racine XML"""
-    if not _is_teamcity_configured():
-        return ET.Element('root')
-    
+def _endpoint_label(url: str) -> str:
+    """Chemin REST normalisé pour les métriques (/app/rest/agents/id:12 -> /app/rest/agents/{id})"""
+    path = urlsplit(url).path
+    segments = ["{id}" if (":" in segment or segment.isdigit()) else segment for segment in path.split("/")]
+    return "/".join(segments) or "/"
+
+def _teamcity_attempt(url: str) -> Tuple[Optional[ET.Element], bool]:
+    """Une tentative de requête TeamCity: (élément racine XML ou None en échec, échec transitoire à relancer)"""
+    start = time.perf_counter()
+    outcome = "ok"
     try:
         logger.debug(f"Requête TeamCity: {url}")
-        response = requests.get(url, headers=_get_headers(), timeout=3)  # Timeout réduit à 3s pour accélérer
+        with timing.span("teamcity"):
+            response = recorder.get(url, headers=_get_headers(), timeout=3)  # Timeout réduit à 3s pour accélérer
         response.raise_for_status()
         logger.debug(f"Réponse TeamCity OK: {response.status_code}")
-        return ET.fromstring(response.text)
+        with timing.span("xml_parse"):
+            return ET.fromstring(response.text), False
     except requests.exceptions.ConnectionError as e:
-        logger.error(f"Erreur de connexion TeamCity ({TEAMCITY_URL}): {e}")
-        return ET.Element('root')
+        outcome = "connection_error"
+        logger.error(f"Erreur de connexion TeamCity ({teamcity_url()}): {e}")
+        return None, True
     except requests.exceptions.Timeout as e:
-        logger.error(f"Timeout TeamCity ({TEAMCITY_URL}): {e}")
-        return ET.Element('root')
+        outcome = "timeout"
+        logger.error(f"Timeout TeamCity ({teamcity_url()}): {e}")
+        return None, True
     except requests.exceptions.HTTPError as e:
+        outcome = "http_error"
         logger.error(f"Erreur HTTP TeamCity: {e} - Vérifiez le token")
-        return ET.Element('root')
+        status_code = e.response.status_code if e.response is not None else 0
+        return None, status_code >= 500 or status_code == 429
     except Exception as e:
+        outcome = "error"
         logger.error(f"Erreur requête TeamCity: {e}")
+        return None, False
+    finally:
+        metrics.TEAMCITY_REQUEST_DURATION.observe(
+            time.perf_counter() - start, endpoint=_endpoint_label(url), outcome=outcome
+        )
+
+def _request_with_retries(url: str, attempt: Callable[[str], Tuple[Optional[ET.Element], bool]]) -> Optional[ET.Element]:
+    """GET relancé en cas d'échec transitoire (attente exponentielle avec gigue, dans le budget); None en échec"""
+    retry_policy.budget.record_request()
+    retries = 0
+    while True:
+        root, transient = attempt(url)
+        if root is not None:
+            return root
+        if not transient or not retry_policy.allow_retry(retries):
+            return None
+        delay = retry_policy.backoff(retries)
+        retries += 1
+        logger.warning(f"Relance {retries} de la requête TeamCity dans {delay * 1000:.0f} ms: {url}")
+        time.sleep(delay)
+
+def _make_teamcity_request(url: str) -> ET.Element:
+    """Effectue une requête TeamCity (GET, relancée en cas d'échec transitoire) et retourne l'élément racine XML"""
+    if not _is_teamcity_configured():
         return ET.Element('root')
+    root = _request_with_retries(url, _teamcity_attempt)
+    return root if root is not None else ET.Element('root')
 
-def fetch_latest_build_status(build_type_id: str) -> Dict[str, str]:
-    """Récupère le statut du dernier build pour un buildType donné - PRIORITÉ aux builds en cours"""
+def _hedged_attempt(url: str) -> Tuple[Optional[ET.Element], bool]:
+    """Une tentative couverte: doublée si elle dépasse le percentile de latence des tentatives récentes"""
+    return status_hedger.call(_teamcity_attempt, url, is_success=lambda result: result[0] is not None)
+
+def _make_status_request(url: str) -> Optional[ET.Element]:
+    """Requête de statut: tentatives couvertes, relances autour; None si TeamCity n'a pas répondu"""
+    if not _is_teamcity_configured():
+        return None
+    return _request_with_retries(url, _hedged_attempt)
+
+def fetch_latest_build_status(build_type_id: str) -> Optional[Dict[str, str]]:
+    """Récupère le statut du dernier build pour un buildType donné - PRIORITÉ aux builds en cours
+    None si TeamCity n'a pas répondu (à distinguer d'un buildType sans build: statut UNKNOWN)"""
     try:
         # ÉTAPE 1: Chercher d'abord s'il y a un build en cours (running)
-        running_url = f"{TEAMCITY_URL}/app/rest/builds?locator=buildType:{build_type_id},state:running,count:1&fields=build(id,number,status,state,webUrl)"
+        running_url = f"{teamcity_url()}/app/rest/builds?locator=buildType:{build_type_id},state:running,count:1&fields=build(id,number,status,state,webUrl)"
         
-        running_root = _make_teamcity_request(running_url)
+        running_root = _make_status_request(running_url)
+        if running_root is None:
+            return None
         running_build = running_root.find('build')
         
         if running_build is not None:
@@ -82,13 +145,15 @@ def fetch_latest_build_status(build_type_id: str) -> Dict[str, str]:
                 'status': running_build.attrib.get('status', 'UNKNOWN'),
                 'state': running_build.attrib.get('state', 'running'),
                 'number': running_build.attrib.get('number', ''),
-                'webUrl': running_build.attrib.get('webUrl', f"{TEAMCITY_URL}/viewType.html?buildTypeId={build_type_id}")
+                'webUrl': running_build.attrib.get('webUrl', f"{teamcity_url()}/viewType.html?buildTypeId={build_type_id}")
             }
         
         # ÉTAPE 2: Aucun build en cours, récupérer le dernier build terminé
-        finished_url = f"{TEAMCITY_URL}/app/rest/builds?locator=buildType:{build_type_id},count:1&fields=build(id,number,status,state,webUrl)"
+        finished_url = f"{teamcity_url()}/app/rest/builds?locator=buildType:{build_type_id},count:1&fields=build(id,number,status,state,webUrl,finishDate)"
         
-        finished_root = _make_teamcity_request(finished_url)
+        finished_root = _make_status_request(finished_url)
+        if finished_root is None:
+            return None
         finished_build = finished_root.find('build')
         
         if finished_build is not None:
@@ -96,7 +161,8 @@ def fetch_latest_build_status(build_type_id: str) -> Dict[str, str]:
                 'status': finished_build.attrib.get('status', 'UNKNOWN'),
                 'state': finished_build.attrib.get('state', 'finished'),
                 'number': finished_build.attrib.get('number', ''),
-                'webUrl': finished_build.attrib.get('webUrl', f"{TEAMCITY_URL}/viewType.html?buildTypeId={build_type_id}")
+                'webUrl': finished_build.attrib.get('webUrl', f"{teamcity_url()}/viewType.html?buildTypeId={build_type_id}"),
+                'finishDate': finished_build.attrib.get('finishDate', '')
             }
         else:
             # Aucun build exécuté pour ce buildType
@@ -104,16 +170,11 @@ def fetch_latest_build_status(build_type_id: str) -> Dict[str, str]:
                 'status': 'UNKNOWN',
                 'state': 'finished',
                 'number': '',
-                'webUrl': f"{TEAMCITY_URL}/viewType.html?buildTypeId={build_type_id}"
+                'webUrl': f"{teamcity_url()}/viewType.html?buildTypeId={build_type_id}"
             }
     except Exception as e:
         logger.warning(f"Impossible de récupérer le statut pour {build_type_id}: {e}")
-        return {
-            'status': 'UNKNOWN',
-            'state': 'finished', 
-            'number': '',
-            'webUrl': f"{TEAMCITY_URL}/viewType.html?buildTypeId={build_type_id}"
-        }
+        return None
 
 def _build_projects_map() -> Dict[str, Dict[str, Any]]:
     """Construit une map id -> {name, parentProjectId} pour tous les projets"""
@@ -149,8 +210,9 @@ def fetch_all_teamcity_builds() -> List[Dict[str, Any]]:
     projects_map = _build_projects_map()
 
     # Récupérer les buildTypes avec métadonnées de projet (id + parentProjectId)
+    base_url = teamcity_url()
     url = (
-        f"{TEAMCITY_URL}/app/rest/buildTypes?"
+        f"{base_url}/app/rest/buildTypes?"
         "fields=buildType("
         "id,name,projectName,"
         "project(id,name,parentProjectId,archived,parentProject(name,archived))"
@@ -193,7 +255,7 @@ def fetch_all_teamcity_builds() -> List[Dict[str, Any]]:
             'buildTypeId': buildtype_id,
             'name': buildtype_name,
             'projectName': full_project_path,
-            'webUrl': f"{TEAMCITY_URL}/viewType.html?buildTypeId={buildtype_id}",
+            'webUrl': f"{base_url}/viewType.html?buildTypeId={buildtype_id}",
             'status': 'UNKNOWN',
             'state': 'finished',
             'number': ''
@@ -208,9 +270,13 @@ def enrich_builds_with_status(builds: List[Dict[str, Any]], max_workers: int = 1
     Ne fait des appels TeamCity que pour ces builds, pour de meilleures performances."""
     if not builds:
         return builds
+    start = time.perf_counter()
     results: List[Dict[str, Any]] = []
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_build = {executor.submit(fetch_latest_build_status, b.get('buildTypeId', '')): b for b in builds}
+        future_to_build = {
+            executor.submit(timing.with_request_context(fetch_latest_build_status), b.get('buildTypeId', '')): b
+            for b in builds
+        }
         for future in as_completed(future_to_build):
             base = future_to_build[future]
             try:
@@ -222,11 +288,13 @@ def enrich_builds_with_status(builds: List[Dict[str, Any]], max_workers: int = 1
     # Conserver l'ordre d'origine si nécessaire
     id_to_enriched = {b['buildTypeId']: b for b in results if b.get('buildTypeId')}
     ordered = [id_to_enriched.get(b.get('buildTypeId'), b) for b in builds]
+    metrics.ENRICH_DURATION.observe(time.perf_counter() - start)
+    metrics.ENRICH_BUILDS.inc(len(builds))
     return ordered
 
 def fetch_all_teamcity_projects() -> List[Dict[str, Any]]:
     """Récupère tous les projets TeamCity"""
-    url = f"{TEAMCITY_URL}/app/rest/projects?fields=project(id,name,parentProjectId)"
+    url = f"{teamcity_url()}/app/rest/projects?fields=project(id,name,parentProjectId)"
     
     root = _make_teamcity_request(url)
     projects = []
@@ -243,7 +311,8 @@ def fetch_all_teamcity_projects() -> List[Dict[str, Any]]:
 
 def fetch_all_teamcity_projects_optimized() -> Dict[str, Any]:
     """Récupère les projets et buildtypes optimisés depuis l'API buildTypes"""
-    url = f"{TEAMCITY_URL}/app/rest/buildTypes?fields=buildType(id,name,projectName,project(id,name,parentProjectId))"
+    base_url = teamcity_url()
+    url = f"{base_url}/app/rest/buildTypes?fields=buildType(id,name,projectName,project(id,name,parentProjectId))"
     
     root = _make_teamcity_request(url)
     buildtypes = []
@@ -274,7 +343,8 @@ def fetch_all_teamcity_projects_optimized() -> Dict[str, Any]:
 
 def fetch_current_versions_buildtypes() -> List[Dict[str, Any]]:
     """Récupère les buildtypes avec leurs URLs"""
-    url = f"{TEAMCITY_URL}/app/rest/buildTypes?fields=buildType(id,name,projectName,project(id,name,parentProjectId))"
+    base_url = teamcity_url()
+    url = f"{base_url}/app/rest/buildTypes?fields=buildType(id,name,projectName,project(id,name,parentProjectId))"
     
     root = _make_teamcity_request(url)
     buildtypes = []
@@ -293,72 +363,164 @@ def fetch_current_versions_buildtypes() -> List[Dict[str, Any]]:
                 'buildTypeId': buildtype_elem.attrib.get('id', ''),
                 'status': 'UNKNOWN',
                 'state': 'finished',
-                'webUrl': f"{TEAMCITY_URL}/viewType.html?buildTypeId={buildtype_elem.attrib.get('id', '')}"
+                'webUrl': f"{base_url}/viewType.html?buildTypeId={buildtype_elem.attrib.get('id', '')}"
             }
             buildtypes.append(buildtype_data)
     
     return buildtypes
 
+# Un seul appel pour tous les agents: flags, pool et build en cours imbriqués (plus d'appel par agent)
+AGENT_FIELDS = (
+    "agent(id,name,typeId,connected,enabled,authorized,uptodate,pool(id,name),"
+    "build(id,number,buildTypeId,state,status,percentageComplete,webUrl,buildType(id,name,projectName)))"
+)
+
+def _parse_agent_build(build_elem: ET.Element) -> Dict[str, Any]:
+    """Build en cours sur un agent (élément <build> imbriqué dans <agent>)"""
+    build_type_elem = build_elem.find('buildType')
+    build_type_id = build_elem.attrib.get('buildTypeId', '')
+    build_name = build_type_id
+    project_name = ''
+    if build_type_elem is not None:
+        build_type_id = build_type_id or build_type_elem.attrib.get('id', '')
+        build_name = build_type_elem.attrib.get('name', '') or build_type_id
+        project_name = build_type_elem.attrib.get('projectName', '')
+    percentage = build_elem.attrib.get('percentageComplete')
+    return {
+        'id': build_elem.attrib.get('id', ''),
+        'buildTypeId': build_type_id,
+        'name': build_name,
+        'projectName': project_name,
+        'number': build_elem.attrib.get('number', ''),
+        'state': build_elem.attrib.get('state', 'running'),
+        'status': build_elem.attrib.get('status', 'UNKNOWN'),
+        'percentageComplete': int(percentage) if percentage and percentage.isdigit() else None,
+        'webUrl': build_elem.attrib.get('webUrl', '')
+    }
+
 def fetch_teamcity_agents() -> List[Dict[str, Any]]:
-    """Récupère les agents TeamCity avec leurs détails complets"""
-    url = f"{TEAMCITY_URL}/app/rest/agents"
+    """Récupère les agents TeamCity et le build que chacun exécute, en une seule requête"""
+    url = f"{teamcity_url()}/app/rest/agents?fields={AGENT_FIELDS}"
     
     root = _make_teamcity_request(url)
     agents = []
     
     for agent_elem in root.findall('agent'):
-        # Récupérer le href pour accéder aux détails de l'agent
-        href = agent_elem.attrib.get('href', '')
-        agent_name = agent_elem.attrib.get('name', '')
-        
-        # Faire un appel séparé pour récupérer les détails de l'agent (comme dans PHP)
-        agent_details = _fetch_agent_details(href)
+        agent_details = {
+            flag: agent_elem.attrib.get(flag, 'false') == 'true'
+            for flag in ('connected', 'enabled', 'authorized', 'uptodate')
+        }
         
         # Déterminer le statut selon la logique PHP
         # connected && enabled && authorized && uptodate = vert, sinon rouge
-        is_agent_ok = (
-            agent_details.get('connected', False) and 
-            agent_details.get('enabled', False) and 
-            agent_details.get('authorized', False) and 
-            agent_details.get('uptodate', False)
-        )
+        is_agent_ok = all(agent_details.values())
+        
+        pool_elem = agent_elem.find('pool')
+        build_elem = agent_elem.find('build')
+        build = _parse_agent_build(build_elem) if build_elem is not None else None
         
-        agent_data = {
+        agents.append({
             'id': agent_elem.attrib.get('id', ''),
-            'name': agent_name,
+            'name': agent_elem.attrib.get('name', ''),
             'status': 'connected' if is_agent_ok else 'disconnected',
             'type': agent_elem.attrib.get('typeId', ''),
+            'pool': {
+                'id': pool_elem.attrib.get('id', ''),
+                'name': pool_elem.attrib.get('name', '')
+            } if pool_elem is not None else None,
+            'busy': build is not None,
+            'build': build,
+            'currentBuild': f"{build['name']} #{build['number']}" if build else None,
             'details': agent_details  # Pour le debug
-        }
-        agents.append(agent_data)
+        })
     
+    logger.info(f"Agents récupérés: {len(agents)}, {sum(1 for a in agents if a['busy'])} occupés")
     return agents
 
-def _fetch_agent_details(href: str) -> Dict[str, Any]:
-    """Récupère les détails complets d'un agent via son href"""
-    if not href:
-        return {}
+QUEUE_FIELDS = "build(id,buildTypeId,queuedDate,waitReason,buildType(id,name,projectName))"
+
+def fetch_teamcity_build_queue() -> Optional[List[Dict[str, Any]]]:
+    """Builds en file d'attente TeamCity; None si la réponse n'est pas exploitable (erreur, non configuré),
+    pour ne pas confondre une panne avec une file vide"""
+    url = f"{teamcity_url()}/app/rest/buildQueue?fields={QUEUE_FIELDS}"
     
-    # Construire l'URL complète (href commence par /app/rest/...)
-    url = f"{TEAMCITY_URL}{href}"
+    root = _make_teamcity_request(url)
+    if root.tag != 'builds':
+        return None
     
-    try:
-        root = _make_teamcity_request(url)
-        
-        # Parser les attributs comme dans le PHP
-        details = {
-            'connected': root.attrib.get('connected', 'false') == 'true',
-            'enabled': root.attrib.get('enabled', 'false') == 'true',
-            'authorized': root.attrib.get('authorized', 'false') == 'true',
-            'uptodate': root.attrib.get('uptodate', 'false') == 'true',
-        }
-        
-        return details
-    except Exception as e:
-        logger.error(f"Erreur lors de la récupération des détails de l'agent {href}: {e}")
-        return {
-            'connected': False,
-            'enabled': False,
-            'authorized': False,
-            'uptodate': False,
-        }
\ No newline at end of file
+    queued = []
+    for build_elem in root.findall('build'):
+        build_type_elem = build_elem.find('buildType')
+        build_type_id = build_elem.attrib.get('buildTypeId', '')
+        if build_type_elem is not None:
+            build_type_id = build_type_id or build_type_elem.attrib.get('id', '')
+        queued.append({
+            'id': build_elem.attrib.get('id', ''),
+            'buildTypeId': build_type_id,
+            'name': build_type_elem.attrib.get('name', build_type_id) if build_type_elem is not None else build_type_id,
+            'projectName': build_type_elem.attrib.get('projectName', '') if build_type_elem is not None else '',
+            'queuedDate': build_elem.attrib.get('queuedDate', ''),
+            'waitReason': build_elem.attrib.get('waitReason', '')
+        })
+    return queued
+
+# Détails d'échec: au plus FAILED_TESTS_LIMIT tests, textes tronqués (les traces complètes restent dans TeamCity)
+FAILED_TESTS_LIMIT = 100
+FAILURE_DETAILS_MAX_CHARS = 2000
+
+def _truncate(text: str, limit: int = FAILURE_DETAILS_MAX_CHARS) -> str:
+    return text if len(text) <= limit else text[:limit] + "…"
+
+def fetch_latest_failed_build(build_type_id: str) -> Optional[Dict[str, Any]]:
+    """Dernier build terminé en échec d'un buildType; {} s'il n'y en a pas, None si TeamCity ne répond pas"""
+    url = (
+        f"{teamcity_url()}/app/rest/builds?locator=buildType:{build_type_id},status:FAILURE,state:finished,count:1"
+        "&fields=build(id,number,status,statusText,state,finishDate,webUrl)"
+    )
+    root = _make_teamcity_request(url)
+    if root.tag != 'builds':
+        return None
+    build_elem = root.find('build')
+    if build_elem is None:
+        return {}
+    return {
+        'id': build_elem.attrib.get('id', ''),
+        'buildTypeId': build_type_id,
+        'number': build_elem.attrib.get('number', ''),
+        'status': build_elem.attrib.get('status', 'FAILURE'),
+        'statusText': build_elem.attrib.get('statusText', ''),
+        'finishDate': build_elem.attrib.get('finishDate', ''),
+        'webUrl': build_elem.attrib.get('webUrl', '')
+    }
+
+def fetch_build_problems(build_id: str) -> Optional[List[Dict[str, str]]]:
+    """Problèmes d'un build (erreur de compilation, code de sortie, tests...); None si TeamCity ne répond pas"""
+    url = (
+        f"{teamcity_url()}/app/rest/problemOccurrences?locator=build:(id:{build_id})"
+        "&fields=problemOccurrence(id,type,identity,details)"
+    )
+    root = _make_teamcity_request(url)
+    if root.tag != 'problemOccurrences':
+        return None
+    return [{
+        'type': problem.attrib.get('type', ''),
+        'identity': problem.attrib.get('identity', ''),
+        'details': _truncate(problem.attrib.get('details', '') or (problem.findtext('details') or ''))
+    } for problem in root.findall('problemOccurrence')]
+
+def fetch_failed_tests(build_id: str) -> Optional[Dict[str, Any]]:
+    """Tests en échec d'un build (les FAILED_TESTS_LIMIT premiers); None si TeamCity ne répond pas"""
+    url = (
+        f"{teamcity_url()}/app/rest/testOccurrences?locator=build:(id:{build_id}),status:FAILURE,"
+        f"count:{FAILED_TESTS_LIMIT + 1}&fields=testOccurrence(id,name,status,duration,details)"
+    )
+    root = _make_teamcity_request(url)
+    if root.tag != 'testOccurrences':
+        return None
+    tests = [{
+        'name': test.attrib.get('name', ''),
+        'duration': int(test.attrib['duration']) if test.attrib.get('duration', '').isdigit() else None,
+        'details': _truncate(test.findtext('details') or test.attrib.get('details', ''))
+    } for test in root.findall('testOccurrence')]
+    # Un test de plus que la limite est demandé: sa présence seule indique une liste tronquée
+    return {'tests': tests[:FAILED_TESTS_LIMIT], 'truncated': len(tests) > FAILED_TESTS_LIMIT}
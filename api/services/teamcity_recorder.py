@@ -0,0 +1,292 @@
+"""
+Enregistrement et rejeu du trafic REST TeamCity
+- TEAMCITY_RECORD=chemin.jsonl.gz: chaque requête/réponse est ajoutée à l'archive (JSON lignes gzip)
+- TEAMCITY_REPLAY=chemin.jsonl.gz: les réponses sont servies depuis l'archive, sans réseau
+- TEAMCITY_REPLAY_LATENCY=original|0|<facteur>: latence rejouée (originale, nulle ou multipliée)
+- TEAMCITY_RECORD_ANONYMIZE=true|false (défaut true): pseudonymise ids, noms et URLs avant écriture;
+  la même transformation est appliquée aux locators des URLs, les liens entre objets sont donc conservés
+- TEAMCITY_RECORD_SALT: clé HMAC de la pseudonymisation, obligatoire pour enregistrer avec anonymisation;
+  l'archive n'en garde qu'une empreinte, une session qui la complète avec une autre clé est refusée
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode, urlunsplit
+import xml.etree.ElementTree as ET
+import atexit
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+from .environment import load_environment
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMAT = "teamcity-recording"
+ARCHIVE_VERSION = 1
+
+# Attributs portant des identifiants TeamCity (référencés d'un objet à l'autre)
+ID_ATTRIBUTES = {"id", "buildTypeId", "projectId", "parentProjectId"}
+# Paramètres d'URL portant un identifiant (en plus du locator)
+ID_QUERY_PARAMS = {"buildTypeId", "projectId", "buildId"}
+# Attributs de texte libre potentiellement sensibles
+TEXT_ATTRIBUTES = {"name", "projectName", "description", "branchName", "statusText", "username",
+                   "hostname", "ip", "comment", "text", "value"}
+URL_ATTRIBUTES = {"webUrl", "href"}
+# Dimensions de locator contenant des identifiants
+LOCATOR_ID_DIMENSIONS = {"buildType", "project", "affectedProject", "id", "agent", "build"}
+# Valeurs structurelles conservées telles quelles
+PRESERVED_VALUES = {"", "_Root", "<Root project>", "true", "false"}
+ANONYMIZED_HOST = "teamcity.invalid"
+
+
+class Pseudonymizer:
+    """Transformation déterministe (HMAC) des identifiants et textes: même entrée -> même pseudonyme"""
+
+    def __init__(self, salt: str):
+        self._key = salt.encode("utf-8")
+        self._cache: Dict[Tuple[str, str], str] = {}
+
+    @property
+    def fingerprint(self) -> str:
+        """Empreinte de la clé (en-tête d'archive): vérifie qu'une archive complétée garde les mêmes pseudonymes"""
+        return self._digest("salt", ARCHIVE_FORMAT)
+
+    def _digest(self, kind: str, value: str) -> str:
+        cached = self._cache.get((kind, value))
+        if cached is None:
+            cached = hmac.new(self._key, f"{kind}:{value}".encode("utf-8"), hashlib.sha256).hexdigest()[:10]
+            self._cache[(kind, value)] = cached
+        return cached
+
+    def identifier(self, value: str) -> str:
+        if value in PRESERVED_VALUES or value.isdigit():
+            return value
+        return f"id{self._digest('id', value)}"
+
+    def text(self, value: str) -> str:
+        if value in PRESERVED_VALUES or value.isdigit():
+            return value
+        return f"N{self._digest('text', value)}"
+
+    def locator(self, locator: str) -> str:
+        """'buildType:X,state:running,count:1' -> 'buildType:idXXXX,state:running,count:1'"""
+        parts = []
+        for part in locator.split(","):
+            dimension, sep, value = part.partition(":")
+            if sep and dimension in LOCATOR_ID_DIMENSIONS:
+                value = self.identifier(value)
+            parts.append(f"{dimension}{sep}{value}")
+        return ",".join(parts)
+
+    def path(self, path: str) -> str:
+        """/app/rest/buildTypes/id:X/... -> segments 'dimension:valeur' pseudonymisés"""
+        return "/".join(self.locator(segment) if ":" in segment else segment for segment in path.split("/"))
+
+    def url(self, url: str) -> str:
+        parts = urlsplit(url)
+        query = []
+        for key, value in parse_qsl(parts.query, keep_blank_values=True):
+            if key == "locator":
+                value = self.locator(value)
+            elif key in ID_QUERY_PARAMS:
+                value = self.identifier(value)
+            query.append((key, value))
+        netloc = ANONYMIZED_HOST if parts.netloc else ""
+        return urlunsplit((parts.scheme, netloc, self.path(parts.path), urlencode(query, safe=":,()"), ""))
+
+    def xml(self, body: str) -> Optional[str]:
+        try:
+            root = ET.fromstring(body)
+        except ET.ParseError:
+            return None
+        for elem in root.iter():
+            for attr, value in list(elem.attrib.items()):
+                if attr in ID_ATTRIBUTES:
+                    elem.set(attr, self.identifier(value))
+                elif attr in TEXT_ATTRIBUTES:
+                    elem.set(attr, self.text(value))
+                elif attr in URL_ATTRIBUTES:
+                    elem.set(attr, self.url(value))
+            if elem.text and elem.text.strip():
+                elem.text = self.text(elem.text.strip())
+        return ET.tostring(root, encoding="unicode")
+
+    def body(self, body: str) -> str:
+        """XML pseudonymisé; texte brut (logs) masqué en conservant sa taille et ses lignes"""
+        anonymized = self.xml(body)
+        if anonymized is not None:
+            return anonymized
+        return "".join(c if c == "\n" else "x" for c in body)
+
+
+def request_key(url: str) -> str:
+    """Clé de rejeu: chemin + paramètres triés, sans hôte (TEAMCITY_URL peut différer au rejeu)"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)), safe=":,()")
+    return f"{parts.path}?{query}" if query else parts.path
+
+
+class RecordedResponse:
+    """Sous-ensemble de requests.Response utilisé par teamcity_fetcher"""
+
+    def __init__(self, status_code: int, text: str, url: str):
+        self.status_code = status_code
+        self.text = text
+        self.url = url
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} (rejeu) pour {self.url}", response=None)
+
+
+class TeamCityRecorder:
+    """Point d'entrée HTTP du client TeamCity: réseau direct, enregistrement ou rejeu"""
+
+    def __init__(self, mode: str = "off", path: Optional[str] = None, latency: str = "original",
+                 anonymize: bool = True, salt: Optional[str] = None):
+        self.mode = mode
+        self.path = path
+        self.latency_scale = self._parse_latency(latency)
+        self.anonymize = anonymize
+        self.pseudonymizer = None
+        if mode == "record" and anonymize:
+            if not salt:
+                raise ValueError("TEAMCITY_RECORD_SALT requis pour enregistrer avec anonymisation")
+            self.pseudonymizer = Pseudonymizer(salt)
+        self._lock = threading.Lock()
+        self._archive = None
+        self._responses: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._missing: set = set()
+        if mode == "replay":
+            self._load(path)
+        elif mode == "record":
+            self._open_archive(path)
+
+    @staticmethod
+    def _parse_latency(latency: str) -> float:
+        latency = (latency or "original").strip().lower()
+        if latency == "original":
+            return 1.0
+        try:
+            return max(0.0, float(latency))
+        except ValueError:
+            logger.warning(f"TEAMCITY_REPLAY_LATENCY invalide '{latency}', latence originale utilisée")
+            return 1.0
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _open_archive(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        fingerprint = self.pseudonymizer.fingerprint if self.pseudonymizer is not None else None
+        self._check_archive_salt(path, fingerprint)
+        self._archive = gzip.open(path, "at", encoding="utf-8")
+        self._write({"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION, "anonymized": self.anonymize,
+                     "salt_fingerprint": fingerprint, "started_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        atexit.register(self.close)
+        logger.info(f"Enregistrement du trafic TeamCity dans {path} (anonymisation: {self.anonymize})")
+
+    @staticmethod
+    def _check_archive_salt(path: str, fingerprint: Optional[str]):
+        """Archive existante (mode ajout): ses sessions doivent avoir été pseudonymisées avec la même clé"""
+        if not os.path.exists(path):
+            return
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            for line in archive:
+                entry = json.loads(line)
+                if entry.get("format") == ARCHIVE_FORMAT and entry.get("salt_fingerprint") != fingerprint:
+                    raise ValueError(f"{path} a été enregistrée avec une autre TEAMCITY_RECORD_SALT "
+                                     f"(ou un autre mode d'anonymisation): choisir un autre fichier")
+
+    def _write(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._archive.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._archive.flush()
+
+    def _load(self, path: str):
+        count = 0
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            for line in archive:
+                entry = json.loads(line)
+                if entry.get("format") == ARCHIVE_FORMAT:
+                    continue
+                self._responses.setdefault(entry["key"], []).append(entry)
+                count += 1
+        logger.info(f"Rejeu TeamCity depuis {path}: {count} réponses, {len(self._responses)} requêtes distinctes")
+
+    def close(self):
+        with self._lock:
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
+
+    def get(self, url: str, headers: Dict[str, str], timeout: float):
+        if self.mode == "replay":
+            return self._replay(url)
+        start = time.perf_counter()
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if self.mode == "record":
+            self._record(url, response, time.perf_counter() - start)
+        return response
+
+    def _record(self, url: str, response, elapsed: float):
+        body = response.text
+        if self.pseudonymizer is not None:
+            url = self.pseudonymizer.url(url)
+            body = self.pseudonymizer.body(body)
+        try:
+            self._write({
+                "key": request_key(url),
+                "status": response.status_code,
+                "elapsed_ms": round(elapsed * 1000, 1),
+                "body": body,
+            })
+        except Exception as e:
+            logger.error(f"Erreur d'écriture de l'enregistrement TeamCity: {e}")
+
+    def _replay(self, url: str) -> RecordedResponse:
+        key = request_key(url)
+        with self._lock:
+            entries = self._responses.get(key)
+            if not entries:
+                if key not in self._missing:
+                    self._missing.add(key)
+                    logger.warning(f"Requête absente de l'enregistrement: {key}")
+                return RecordedResponse(404, "", url)
+            # Réponses rejouées dans l'ordre d'enregistrement, la dernière est ensuite répétée
+            cursor = self._cursors.get(key, 0)
+            entry = entries[min(cursor, len(entries) - 1)]
+            self._cursors[key] = cursor + 1
+        if self.latency_scale:
+            time.sleep(entry.get("elapsed_ms", 0) / 1000 * self.latency_scale)
+        return RecordedResponse(entry.get("status", 200), entry.get("body", ""), url)
+
+
+def create_recorder() -> TeamCityRecorder:
+    """Mode selon l'environnement; le rejeu est prioritaire si les deux variables sont définies"""
+    load_environment()
+    replay_path = os.getenv("TEAMCITY_REPLAY", "").strip()
+    record_path = os.getenv("TEAMCITY_RECORD", "").strip()
+    anonymize = os.getenv("TEAMCITY_RECORD_ANONYMIZE", "true").strip().lower() not in {"0", "false", "no"}
+    latency = os.getenv("TEAMCITY_REPLAY_LATENCY", "original")
+    try:
+        if replay_path:
+            return TeamCityRecorder("replay", replay_path, latency=latency)
+        if record_path:
+            return TeamCityRecorder("record", record_path, anonymize=anonymize,
+                                    salt=os.getenv("TEAMCITY_RECORD_SALT") or None)
+    except Exception as e:
+        logger.error(f"Enregistrement/rejeu TeamCity indisponible, accès réseau direct: {e}")
+    return TeamCityRecorder("off")
+
+
+# Instance partagée par le client TeamCity
+recorder = create_recorder()
@@ -0,0 +1,161 @@
+"""
+Chronométrage par phase des requêtes HTTP
+- span("phase"): mesure une phase de la requête courante (sans effet hors requête)
+- en-tête Server-Timing ajouté par le middleware
+- les N requêtes les plus lentes au-dessus du seuil pour /api/debug/slow-requests
+- échéance par endpoint (DEADLINE_MS_<ENDPOINT>, 0 pour désactiver): temps restant pour la requête courante
+"""
+from typing import Dict, List, Any, Optional, Callable
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from datetime import datetime
+import heapq
+import itertools
+import os
+import threading
+import time
+
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "250"))
+SLOW_REQUEST_BUFFER_SIZE = int(os.getenv("SLOW_REQUEST_BUFFER_SIZE", "50"))
+DEFAULT_DEADLINES_MS = {"dashboard": 2500, "failures": 8000}
+
+
+class RequestTiming:
+    """Durées cumulées par phase pour une requête (les phases peuvent venir de plusieurs threads)"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases: Dict[str, List[float]] = {}
+
+    def add(self, name: str, duration: float):
+        with self._lock:
+            phase = self.phases.get(name)
+            if phase is None:
+                self.phases[name] = [duration, 1]
+            else:
+                phase[0] += duration
+                phase[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def server_timing_header(self, total: float) -> str:
+        with self._lock:
+            items = list(self.phases.items())
+        parts = [f"{name};dur={duration * 1000:.1f}" for name, (duration, _count) in items]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    def to_dict(self, total: float, status: int) -> Dict[str, Any]:
+        with self._lock:
+            items = list(self.phases.items())
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "duration_ms": round(total * 1000, 1),
+            "phases": {
+                name: {"duration_ms": round(duration * 1000, 1), "count": int(count)}
+                for name, (duration, count) in sorted(items, key=lambda item: -item[1][0])
+            },
+        }
+
+
+_current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def start_request(method: str, path: str):
+    """Démarre le chronométrage de la requête courante; retourne un jeton pour end_request"""
+    return _current_timing.set(RequestTiming(method, path))
+
+
+def current_request() -> Optional[RequestTiming]:
+    return _current_timing.get()
+
+
+def end_request(token):
+    _current_timing.reset(token)
+
+
+@contextmanager
+def span(name: str):
+    """Mesure une phase de la requête en cours (no-op hors requête HTTP)"""
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+
+def record(name: str, duration: float):
+    """Ajoute une durée déjà mesurée à la requête en cours"""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.add(name, duration)
+
+
+def endpoint_deadline(endpoint: str) -> Optional[float]:
+    """Échéance configurée d'un endpoint, en secondes; None si désactivée"""
+    value = os.getenv(f"DEADLINE_MS_{endpoint.upper()}")
+    deadline_ms = float(value) if value else DEFAULT_DEADLINES_MS.get(endpoint, 0)
+    return deadline_ms / 1000 if deadline_ms > 0 else None
+
+
+def remaining(endpoint: str) -> Optional[float]:
+    """Temps restant avant l'échéance de l'endpoint, compté depuis le début de la requête courante"""
+    deadline = endpoint_deadline(endpoint)
+    if deadline is None:
+        return None
+    timing = _current_timing.get()
+    return max(0.0, deadline - timing.elapsed()) if timing is not None else deadline
+
+
+def with_request_context(func: Callable) -> Callable:
+    """Propage le contexte de la requête vers un thread d'un ThreadPoolExecutor"""
+    context = copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+
+class SlowRequestLog:
+    """Les `size` requêtes les plus lentes au-dessus du seuil (tas min: la plus rapide est évincée en premier)"""
+
+    def __init__(self, threshold_ms: float = SLOW_REQUEST_THRESHOLD_MS, size: int = SLOW_REQUEST_BUFFER_SIZE):
+        self.threshold_ms = threshold_ms
+        self.size = size
+        # (durée, n° d'ordre, entrée): le n° départage les durées égales sans comparer les dicts
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def record(self, timing: RequestTiming, total: float, status: int):
+        if total * 1000 < self.threshold_ms or self.size <= 0:
+            return
+        entry = timing.to_dict(total, status)
+        item = (entry["duration_ms"], next(self._sequence), entry)
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+            elif item[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def snapshot(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """De la plus lente à la plus rapide"""
+        with self._lock:
+            items = heapq.nlargest(limit or len(self._heap), self._heap)
+        return [entry for _, _, entry in items]
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+
+
+slow_requests = SlowRequestLog()
@@ -0,0 +1 @@
+"""Benchmarks et outils de charge pour TeamCity Monitor (catalogues synthétiques, faux client TeamCity)"""
@@ -0,0 +1,189 @@
+"""
+Générateur de charge: K clients dashboard interrogent le monitor comme le fait Dashboard.js
+
+    python -m benchmarks.load_driver --base-url http://localhost:8000 --clients 50 --duration 60 \\
+        --interval 2 --simulator-url http://localhost:8111 --output load_report.json
+
+Chaque client boucle sur /api/config, /api/builds/dashboard et /api/agents, attend --interval secondes
+(avec gigue) puis recommence. Le rapport donne le débit, les erreurs et les percentiles p50/p90/p99 par
+endpoint, ainsi que le nombre d'appels TeamCity déclenchés (si --simulator-url est fourni).
+"""
+from typing import Dict, List, Any, Optional
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+
+import httpx
+
+DEFAULT_ENDPOINTS = ("/api/config", "/api/builds/dashboard", "/api/agents")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentile par rang le plus proche sur une liste déjà triée"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, endpoint: str, duration: float, ok: bool):
+        self.latencies.setdefault(endpoint, []).append(duration)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        endpoints: Dict[str, Any] = {}
+        all_latencies: List[float] = []
+        for endpoint, values in self.latencies.items():
+            ordered = sorted(values)
+            all_latencies.extend(values)
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+                "p90_ms": round(percentile(ordered, 90) * 1000, 1),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1),
+            }
+        ordered = sorted(all_latencies)
+        return {
+            "elapsed_seconds": round(elapsed, 1),
+            "requests": len(ordered),
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+            "p90_ms": round(percentile(ordered, 90) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+            "endpoints": endpoints,
+        }
+
+
+async def dashboard_client(client: httpx.AsyncClient, endpoints: List[str], stats: LoadStats,
+                           deadline: float, interval: float, rng: random.Random):
+    # Départs étalés comme des écrans ouverts à des moments différents
+    await asyncio.sleep(rng.uniform(0, interval) if interval else 0)
+    while time.monotonic() < deadline:
+        for endpoint in endpoints:
+            start = time.perf_counter()
+            try:
+                response = await client.get(endpoint)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            stats.record(endpoint, time.perf_counter() - start, ok)
+        if interval:
+            await asyncio.sleep(interval * rng.uniform(0.8, 1.2))
+
+
+async def fetch_simulator_stats(simulator_url: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not simulator_url:
+        return None
+    try:
+        async with httpx.AsyncClient(base_url=simulator_url, timeout=5.0) as client:
+            response = await client.get("/__simulator/stats")
+            return response.json()
+    except httpx.HTTPError as e:
+        print(f"Statistiques du simulateur indisponibles: {e}", file=sys.stderr)
+        return None
+
+
+async def prepare_selection(base_url: str, count: int, timeout: float) -> int:
+    """Remplace la sélection du monitor par les `count` premiers builds du catalogue (instance de test uniquement)"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        builds = (await client.get("/api/builds")).json().get("builds", [])
+        build_ids = [b["buildTypeId"] for b in builds[:count] if b.get("buildTypeId")]
+        response = await client.post("/api/builds/tree/selection", json={"selectedBuilds": build_ids})
+        response.raise_for_status()
+        return len(build_ids)
+
+
+async def run_load(base_url: str, clients: int, duration: float, interval: float, endpoints: List[str],
+                   timeout: float, simulator_url: Optional[str] = None, seed: int = 7) -> Dict[str, Any]:
+    stats = LoadStats()
+    before = await fetch_simulator_stats(simulator_url)
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    start = time.monotonic()
+    deadline = start + duration
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        await asyncio.gather(*[
+            dashboard_client(client, endpoints, stats, deadline, interval, random.Random(seed + index))
+            for index in range(clients)
+        ])
+    report = stats.summary(time.monotonic() - start)
+    report["settings"] = {
+        "base_url": base_url, "clients": clients, "duration": duration, "interval": interval, "endpoints": endpoints,
+    }
+
+    after = await fetch_simulator_stats(simulator_url)
+    if before is not None and after is not None:
+        upstream = after["total_requests"] - before["total_requests"]
+        report["teamcity"] = {
+            "requests": upstream,
+            "requests_per_second": round(upstream / report["elapsed_seconds"], 2) if report["elapsed_seconds"] else 0.0,
+            "requests_per_dashboard_call": round(
+                upstream / max(1, report["endpoints"].get("/api/builds/dashboard", {}).get("requests", 0)), 2
+            ),
+            "by_endpoint": {
+                endpoint: count - before["requests"].get(endpoint, 0)
+                for endpoint, count in after["requests"].items()
+            },
+        }
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"{report['requests']} requêtes en {report['elapsed_seconds']} s - {report['throughput_rps']} req/s, "
+          f"{report['errors']} erreurs")
+    print(f"Global: p50 {report['p50_ms']} ms  p90 {report['p90_ms']} ms  p99 {report['p99_ms']} ms")
+    for endpoint, values in report["endpoints"].items():
+        print(f"  {endpoint:<26} {values['requests']:>7} req  {values['throughput_rps']:>8} req/s  "
+              f"p50 {values['p50_ms']:>8} ms  p90 {values['p90_ms']:>8} ms  p99 {values['p99_ms']:>8} ms  "
+              f"erreurs {values['errors']}")
+    if "teamcity" in report:
+        tc = report["teamcity"]
+        print(f"TeamCity: {tc['requests']} appels ({tc['requests_per_second']} req/s, "
+              f"{tc['requests_per_dashboard_call']} par appel dashboard)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge du monitor TeamCity (clients dashboard simulés)")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=20, help="Nombre de clients dashboard simultanés (K)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Durée du test en secondes")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="Pause entre deux cycles de polling par client (0 = boucle fermée)")
+    parser.add_argument("--endpoints", default=",".join(DEFAULT_ENDPOINTS))
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--simulator-url", default=None, help="URL du simulateur pour compter les appels TeamCity")
+    parser.add_argument("--select", type=int, default=0,
+                        help="Sélectionne d'abord N builds du catalogue (ÉCRASE la sélection du monitor ciblé)")
+    parser.add_argument("--output", default=None, help="Fichier JSON du rapport")
+    args = parser.parse_args(argv)
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    if args.select:
+        selected = asyncio.run(prepare_selection(args.base_url, args.select, args.timeout))
+        print(f"Sélection du monitor: {selected} builds")
+    report = asyncio.run(run_load(
+        args.base_url, args.clients, args.duration, args.interval, endpoints, args.timeout, args.simulator_url
+    ))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Microbenchmarks du pipeline catalogue -> arborescence, sur catalogues synthétiques et faux client TeamCity
+
+    python -m benchmarks.run_benchmarks                       # mesure + comparaison à benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --update-baseline     # remplace la référence
+    python -m benchmarks.run_benchmarks --sizes small --output bench.json
+
+Code de sortie 1 si une mesure dépasse la référence de plus de --tolerance (régression).
+"""
+from typing import Callable, Dict, Any, List, Optional
+from pathlib import Path
+from unittest import mock
+import argparse
+import gc
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+
+from api.services import teamcity_fetcher
+from api.routes import builds as builds_routes
+from benchmarks.synthetic import generate_catalog, FakeTeamCityClient, projects_map
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+DEFAULT_OUTPUT = Path("bench_output.json")
+DEFAULT_TOLERANCE = 0.50
+
+# (projets, profondeur, buildTypes)
+SIZES = {
+    "small": (50, 3, 300),
+    "medium": (300, 4, 2000),
+    "large": (1500, 5, 10000),
+}
+CALIBRATION_KEY = "calibration"
+# Dominés par la latence simulée: pas de correction par l'étalon CPU
+IO_BOUND = {"enrich_builds_with_status"}
+
+# Nombre de builds sélectionnés enrichis (fan-out des statuts) par taille
+ENRICH_SELECTION = {"small": 20, "medium": 60, "large": 150}
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Médiane et minimum sur `repeat` exécutions (en millisecondes), après un tour de chauffe.
+    Le ramasse-miettes est suspendu pendant chaque exécution, comme dans timeit."""
+    func()
+    durations: List[float] = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            durations.append((time.perf_counter() - start) * 1000)
+        finally:
+            gc.enable()
+    return {"median_ms": round(statistics.median(durations), 3), "min_ms": round(min(durations), 3)}
+
+
+def _calibration_workload():
+    """Charge Python pure et fixe (dictionnaires, chaînes, tris) servant d'étalon de vitesse de la machine"""
+    index: Dict[str, List[int]] = {}
+    for i in range(60000):
+        index.setdefault(f"project {i % 997} / module {i % 31}".upper(), []).append(i)
+    return sorted(index, key=lambda key: (len(index[key]), key))
+
+
+def run_size(size: str, repeat: int, status_latency_ms: float) -> Dict[str, Dict[str, float]]:
+    n_projects, depth, n_build_types = SIZES[size]
+    catalog = generate_catalog(n_projects, depth, n_build_types)
+    fake = FakeTeamCityClient(catalog)
+    pmap = projects_map(catalog)
+    project_ids = [bt["projectId"] for bt in catalog.build_types]
+    results: Dict[str, Dict[str, float]] = {}
+
+    with mock.patch.object(teamcity_fetcher, "_make_teamcity_request", fake), \
+            mock.patch.object(teamcity_fetcher, "_make_status_request", fake):
+        results["fetch_all_teamcity_builds"] = measure(teamcity_fetcher.fetch_all_teamcity_builds, repeat)
+        builds = teamcity_fetcher.fetch_all_teamcity_builds()
+
+        results["compute_full_project_path"] = measure(
+            lambda: [teamcity_fetcher._compute_full_project_path(pid, pmap) for pid in project_ids], repeat
+        )
+        results["create_complete_tree_structure"] = measure(
+            lambda: builds_routes.create_complete_tree_structure(builds), repeat
+        )
+        results["analyze_build_projects"] = measure(lambda: builds_routes.analyze_build_projects(builds), repeat)
+
+        selection = builds[:ENRICH_SELECTION[size]]
+        fake.latency_s = status_latency_ms / 1000
+        results["enrich_builds_with_status"] = measure(
+            lambda: teamcity_fetcher.enrich_builds_with_status(selection), max(1, repeat // 2)
+        )
+
+    return {f"{size}.{name}": values for name, values in results.items()}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[Dict[str, Any]]:
+    """Mesures dont la médiane dépasse la référence de plus de `tolerance` (ratio).
+    Si les deux jeux contiennent l'étalon, le ratio est corrigé de l'écart de vitesse entre machines."""
+    speed_factor = 1.0
+    current_cal = results.get(CALIBRATION_KEY, {}).get("median_ms")
+    baseline_cal = baseline.get(CALIBRATION_KEY, {}).get("median_ms")
+    if current_cal and baseline_cal:
+        speed_factor = baseline_cal / current_cal
+
+    regressions: List[Dict[str, Any]] = []
+    for name, values in results.items():
+        reference = baseline.get(name)
+        if name == CALIBRATION_KEY or not reference or not reference.get("median_ms"):
+            continue
+        factor = 1.0 if name.split(".", 1)[-1] in IO_BOUND else speed_factor
+        ratio = values["median_ms"] * factor / reference["median_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append({
+                "benchmark": name,
+                "baseline_ms": reference["median_ms"],
+                "current_ms": values["median_ms"],
+                "ratio": round(ratio, 2),
+            })
+    return regressions
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Dict[str, float]]]:
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def write_results(path: Path, results: Dict[str, Dict[str, float]], settings: Dict[str, Any]):
+    payload = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": settings,
+        "results": results,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks TeamCity Monitor")
+    parser.add_argument("--sizes", default="small,medium,large", help="Tailles à mesurer (small,medium,large)")
+    parser.add_argument("--repeat", type=int, default=9, help="Exécutions mesurées par benchmark")
+    parser.add_argument("--status-latency-ms", type=float, default=2.0,
+                        help="Latence simulée par appel de statut TeamCity")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Dégradation tolérée avant échec (0.50 = +50%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Écrit les résultats comme nouvelle référence")
+    args = parser.parse_args(argv)
+
+    # Les fonctions mesurées journalisent en INFO: on coupe pour ne pas fausser les mesures
+    logging.disable(logging.INFO)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"Tailles inconnues: {', '.join(unknown)}")
+
+    results: Dict[str, Dict[str, float]] = {CALIBRATION_KEY: measure(_calibration_workload, args.repeat)}
+    for size in sizes:
+        results.update(run_size(size, args.repeat, args.status_latency_ms))
+    settings = {"sizes": sizes, "repeat": args.repeat, "status_latency_ms": args.status_latency_ms}
+
+    width = max(len(name) for name in results)
+    for name, values in results.items():
+        print(f"{name:<{width}}  median {values['median_ms']:>10.3f} ms   min {values['min_ms']:>10.3f} ms")
+
+    write_results(args.output, results, settings)
+    print(f"\nRésultats écrits dans {args.output}")
+
+    if args.update_baseline:
+        write_results(args.baseline, results, settings)
+        print(f"Référence mise à jour: {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"Aucune référence ({args.baseline}) - relancez avec --update-baseline pour en créer une")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} régression(s) au-delà de +{args.tolerance:.0%}:")
+        for r in regressions:
+            print(f"  {r['benchmark']}: {r['baseline_ms']} ms -> {r['current_ms']} ms (x{r['ratio']})")
+        return 1
+    print(f"\nAucune régression (tolérance +{args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""
+Générateurs de catalogues TeamCity synthétiques et réponses XML associées
+- generate_catalog(n_projects, depth, n_build_types): hiérarchie de projets + buildTypes, déterministe (seed)
+- render_*_xml: mêmes formats que l'API REST TeamCity (attributs lus par teamcity_fetcher)
+- FakeTeamCityClient: remplaçant de _make_teamcity_request (et _make_status_request) qui répond sans réseau
+"""
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlsplit, parse_qs
+from xml.sax.saxutils import quoteattr
+import xml.etree.ElementTree as ET
+import random
+import time
+
+ROOT_PROJECT_ID = "_Root"
+STATUSES = ("SUCCESS", "SUCCESS", "SUCCESS", "FAILURE", "UNKNOWN")
+BUILD_NAMES = ("Build Debug", "Build Release", "Tests", "Package", "Deploy", "Installer", "Nightly")
+AGENT_POOLS = ("Default", "Windows", "Linux")
+
+
+class SyntheticCatalog:
+    """Projets, buildTypes et agents générés; les index servent aux faux clients et au simulateur"""
+
+    def __init__(self, projects: List[Dict[str, Any]], build_types: List[Dict[str, Any]],
+                 agents: Optional[List[Dict[str, Any]]] = None):
+        self.projects = projects
+        self.build_types = build_types
+        self.agents = agents or []
+        self.projects_by_id = {p["id"]: p for p in projects}
+        self.build_types_by_id = {b["id"]: b for b in build_types}
+        self.agents_by_id = {str(a["id"]): a for a in self.agents}
+
+    def __repr__(self) -> str:
+        return (f"SyntheticCatalog(projects={len(self.projects)}, build_types={len(self.build_types)}, "
+                f"agents={len(self.agents)})")
+
+
+def generate_agents(n_agents: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Agents avec une minorité déconnectés, désactivés ou non à jour"""
+    return [{
+        "id": index + 1,
+        "name": f"agent-{index + 1:03d}",
+        "typeId": index + 1,
+        "connected": rng.random() > 0.1,
+        "enabled": rng.random() > 0.05,
+        "authorized": rng.random() > 0.02,
+        "uptodate": rng.random() > 0.05,
+        "poolId": index % len(AGENT_POOLS),
+    } for index in range(n_agents)]
+
+
+def generate_catalog(n_projects: int, depth: int, n_build_types: int,
+                     archived_ratio: float = 0.05, seed: int = 42, n_agents: int = 0) -> SyntheticCatalog:
+    """Hiérarchie de n_projects projets sur depth niveaux, n_build_types buildTypes répartis aléatoirement"""
+    rng = random.Random(seed)
+    depth = max(1, depth)
+    projects: List[Dict[str, Any]] = [{
+        "id": ROOT_PROJECT_ID, "name": "<Root project>", "parentProjectId": "", "archived": False, "level": -1
+    }]
+    by_level: Dict[int, List[Dict[str, Any]]] = {}
+
+    for index in range(max(1, n_projects)):
+        level = index % depth
+        if level == 0:
+            parent = projects[0]
+            name = f"Product{index // depth + 1}"
+        else:
+            parent = rng.choice(by_level[level - 1])
+            name = f"{rng.choice(('Module', 'Component', 'Service', 'Plugin'))} {index}"
+        project = {
+            "id": f"{parent['id'].lstrip('_')}_P{index}" if level else f"Product{index // depth + 1}",
+            "name": name,
+            "parentProjectId": parent["id"],
+            "archived": level > 0 and rng.random() < archived_ratio,
+            "level": level,
+        }
+        projects.append(project)
+        by_level.setdefault(level, []).append(project)
+
+    candidates = projects[1:]
+    build_types: List[Dict[str, Any]] = []
+    for index in range(n_build_types):
+        project = rng.choice(candidates)
+        build_types.append({
+            "id": f"{project['id']}_Bt{index}",
+            "name": rng.choice(BUILD_NAMES),
+            "projectId": project["id"],
+            "status": rng.choice(STATUSES),
+            "running": rng.random() < 0.1,
+            "number": str(rng.randint(1, 5000)),
+            "buildId": 100000 + index,
+        })
+    return SyntheticCatalog(projects, build_types, generate_agents(n_agents, rng))
+
+
+def render_projects_xml(catalog: SyntheticCatalog) -> str:
+    items = [
+        f"<project id={quoteattr(p['id'])} name={quoteattr(p['name'])} parentProjectId={quoteattr(p['parentProjectId'])}/>"
+        for p in catalog.projects
+    ]
+    return f'<projects count="{len(items)}">' + "".join(items) + "</projects>"
+
+
+def render_build_types_xml(catalog: SyntheticCatalog) -> str:
+    items = []
+    for bt in catalog.build_types:
+        project = catalog.projects_by_id[bt["projectId"]]
+        parent = catalog.projects_by_id.get(project["parentProjectId"])
+        parent_xml = ""
+        if parent is not None:
+            parent_xml = (
+                f"<parentProject name={quoteattr(parent['name'])} "
+                f"archived=\"{'true' if parent['archived'] else 'false'}\"/>"
+            )
+        items.append(
+            f"<buildType id={quoteattr(bt['id'])} name={quoteattr(bt['name'])} projectName={quoteattr(project['name'])}>"
+            f"<project id={quoteattr(project['id'])} name={quoteattr(project['name'])} "
+            f"parentProjectId={quoteattr(project['parentProjectId'])} "
+            f"archived=\"{'true' if project['archived'] else 'false'}\">{parent_xml}</project>"
+            "</buildType>"
+        )
+    return f'<buildTypes count="{len(items)}">' + "".join(items) + "</buildTypes>"
+
+
+def render_builds_xml(builds: List[Dict[str, Any]], base_url: str = "http://teamcity.local") -> str:
+    items = []
+    for b in builds:
+        web_url = f"{base_url}/viewLog.html?buildId={b['id']}"
+        items.append(
+            f"<build id=\"{b['id']}\" buildTypeId={quoteattr(b['buildTypeId'])} number={quoteattr(b['number'])} "
+            f"status=\"{b['status']}\" state=\"{b['state']}\" webUrl={quoteattr(web_url)}/>"
+        )
+    return f'<builds count="{len(items)}">' + "".join(items) + "</builds>"
+
+
+def _bool_attr(value: bool) -> str:
+    return "true" if value else "false"
+
+
+def render_agent_xml(agent: Dict[str, Any], build: Optional[Dict[str, Any]] = None,
+                     base_url: str = "http://teamcity.local") -> str:
+    """Agent avec son pool et, s'il en exécute un, le build en cours imbriqué"""
+    pool_id = agent.get("poolId", 0)
+    children = f"<pool id=\"{pool_id}\" name={quoteattr(AGENT_POOLS[pool_id])}/>"
+    if build is not None:
+        web_url = f"{base_url}/viewLog.html?buildId={build['buildId']}"
+        children += (
+            f"<build id=\"{build['buildId']}\" number={quoteattr(build['number'])} "
+            f"buildTypeId={quoteattr(build['id'])} state=\"running\" status=\"{build['status']}\" "
+            f"percentageComplete=\"{build['buildId'] % 100}\" "
+            f"webUrl={quoteattr(web_url)}>"
+            f"<buildType id={quoteattr(build['id'])} name={quoteattr(build['name'])}/>"
+            "</build>"
+        )
+    return (
+        f"<agent id=\"{agent['id']}\" name={quoteattr(agent['name'])} typeId=\"{agent['typeId']}\" "
+        f"connected=\"{_bool_attr(agent['connected'])}\" enabled=\"{_bool_attr(agent['enabled'])}\" "
+        f"authorized=\"{_bool_attr(agent['authorized'])}\" uptodate=\"{_bool_attr(agent['uptodate'])}\" "
+        f"href=\"/app/rest/agents/id:{agent['id']}\">{children}</agent>"
+    )
+
+
+def agent_running_builds(catalog: SyntheticCatalog) -> Dict[str, Dict[str, Any]]:
+    """Répartit les buildTypes en cours sur les agents utilisables (un build par agent, dans l'ordre)"""
+    usable = [a for a in catalog.agents if a["connected"] and a["enabled"] and a["authorized"]]
+    running = (bt for bt in catalog.build_types if bt["running"])
+    return {str(agent["id"]): bt for agent, bt in zip(usable, running)}
+
+
+def render_agents_xml(catalog: SyntheticCatalog) -> str:
+    builds = agent_running_builds(catalog)
+    items = [render_agent_xml(a, builds.get(str(a["id"]))) for a in catalog.agents]
+    return f'<agents count="{len(items)}">' + "".join(items) + "</agents>"
+
+
+def queued_builds(catalog: SyntheticCatalog) -> List[Dict[str, Any]]:
+    """File d'attente: builds en cours sans agent libre (demande excédentaire), attente déterministe"""
+    assigned = {bt["id"] for bt in agent_running_builds(catalog).values()}
+    return [bt for bt in catalog.build_types if bt["running"] and bt["id"] not in assigned]
+
+
+def render_build_queue_xml(catalog: SyntheticCatalog, now: Optional[float] = None) -> str:
+    now = time.time() if now is None else now
+    items = []
+    for bt in queued_builds(catalog):
+        queued_date = time.strftime("%Y%m%dT%H%M%S+0000", time.gmtime(now - bt["buildId"] % 600))
+        items.append(
+            f"<build id=\"{bt['buildId']}\" buildTypeId={quoteattr(bt['id'])} state=\"queued\" "
+            f"queuedDate=\"{queued_date}\" waitReason=\"Waiting for compatible agent\">"
+            f"<buildType id={quoteattr(bt['id'])} name={quoteattr(bt['name'])}/>"
+            "</build>"
+        )
+    return f'<builds count="{len(items)}">' + "".join(items) + "</builds>"
+
+
+def parse_locator(locator: str) -> Dict[str, str]:
+    """'buildType:X,state:running,count:1' -> {'buildType': 'X', 'state': 'running', 'count': '1'}"""
+    result: Dict[str, str] = {}
+    for part in (locator or "").split(","):
+        key, _, value = part.partition(":")
+        if key:
+            result[key] = value
+    return result
+
+
+def latest_builds_for_locator(catalog: SyntheticCatalog, locator: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Dernier build d'un buildType selon le locator (state:running filtre les builds en cours)"""
+    bt = catalog.build_types_by_id.get(locator.get("buildType", ""))
+    if bt is None:
+        return []
+    if locator.get("state") == "running" and not bt["running"]:
+        return []
+    if locator.get("state") == "finished" and bt["running"]:
+        return []
+    if locator.get("status") and locator["status"] != bt["status"]:
+        return []
+    state = "running" if bt["running"] else "finished"
+    return [{
+        "id": bt["buildId"],
+        "buildTypeId": bt["id"],
+        "number": bt["number"],
+        "status": bt["status"],
+        "state": state,
+    }]
+
+
+def build_id_from_locator(locator: str) -> str:
+    """'build:(id:123),status:FAILURE' -> '123'"""
+    _, _, rest = (locator or "").partition("build:(id:")
+    return rest.partition(")")[0]
+
+
+def render_problem_occurrences_xml(build_id: str) -> str:
+    items = [
+        f"<problemOccurrence id=\"problem:(id:{index}),build:(id:{build_id})\" type=\"TC_FAILED_TESTS\" "
+        f"identity=\"TC_FAILED_TESTS{index}\" details=\"Build failed: tests failed in step {index + 1}\"/>"
+        for index in range(1 + int(build_id or 0) % 2)
+    ]
+    return f'<problemOccurrences count="{len(items)}">' + "".join(items) + "</problemOccurrences>"
+
+
+def render_test_occurrences_xml(build_id: str) -> str:
+    items = [
+        f"<testOccurrence id=\"build:(id:{build_id}),id:{index}\" name=\"tests.module{index}.test_case_{build_id}\" "
+        f"status=\"FAILURE\" duration=\"{10 * (index + 1)}\"><details>AssertionError: expected {index}</details>"
+        "</testOccurrence>"
+        for index in range(int(build_id or 0) % 5 + 1)
+    ]
+    return f'<testOccurrences count="{len(items)}">' + "".join(items) + "</testOccurrences>"
+
+
+def render_build_log(build_id: int, lines: int) -> bytes:
+    """Log texte déterministe de `lines` lignes (environ 60 octets par ligne)"""
+    return "".join(
+        f"[{index:07d}] build {build_id}: step {index % 7 + 1} - compiling module_{index % 97}.cpp\n"
+        for index in range(lines)
+    ).encode("utf-8")
+
+
+class FakeTeamCityClient:
+    """Remplace _make_teamcity_request: sert les XML pré-rendus, latence simulée optionnelle"""
+
+    def __init__(self, catalog: SyntheticCatalog, latency_s: float = 0.0):
+        self.catalog = catalog
+        self.latency_s = latency_s
+        self.calls = 0
+        self._projects_xml = render_projects_xml(catalog)
+        self._build_types_xml = render_build_types_xml(catalog)
+
+    def __call__(self, url: str) -> ET.Element:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        parts = urlsplit(url)
+        if parts.path.endswith("/app/rest/projects"):
+            return ET.fromstring(self._projects_xml)
+        if parts.path.endswith("/app/rest/buildTypes"):
+            return ET.fromstring(self._build_types_xml)
+        if parts.path.endswith("/app/rest/builds"):
+            locator = parse_locator((parse_qs(parts.query).get("locator") or [""])[0])
+            return ET.fromstring(render_builds_xml(latest_builds_for_locator(self.catalog, locator)))
+        if parts.path.endswith("/app/rest/problemOccurrences"):
+            locator = (parse_qs(parts.query).get("locator") or [""])[0]
+            return ET.fromstring(render_problem_occurrences_xml(build_id_from_locator(locator)))
+        if parts.path.endswith("/app/rest/testOccurrences"):
+            locator = (parse_qs(parts.query).get("locator") or [""])[0]
+            return ET.fromstring(render_test_occurrences_xml(build_id_from_locator(locator)))
+        if parts.path.endswith("/app/rest/buildQueue"):
+            return ET.fromstring(render_build_queue_xml(self.catalog))
+        if parts.path.endswith("/app/rest/agents"):
+            return ET.fromstring(render_agents_xml(self.catalog))
+        if "/app/rest/agents/id:" in parts.path:
+            agent = self.catalog.agents_by_id.get(parts.path.rsplit(":", 1)[-1])
+            return ET.fromstring(render_agent_xml(agent)) if agent else ET.Element("root")
+        return ET.Element("root")
+
+
+def projects_map(catalog: SyntheticCatalog) -> Dict[str, Dict[str, Any]]:
+    """Même forme que teamcity_fetcher._build_projects_map"""
+    return {p["id"]: {"name": p["name"], "parentProjectId": p["parentProjectId"]} for p in catalog.projects}
+
+
+def active_build_type_count(catalog: SyntheticCatalog) -> int:
+    """Nombre de buildTypes attendus après filtrage des projets archivés (projet ou parent direct)"""
+    count = 0
+    for bt in catalog.build_types:
+        project = catalog.projects_by_id[bt["projectId"]]
+        parent = catalog.projects_by_id.get(project["parentProjectId"])
+        if not project["archived"] and not (parent and parent["archived"]):
+            count += 1
+    return count
@@ -0,0 +1,315 @@
+"""
+Simulateur local de l'API REST TeamCity pour les tests de charge de bout en bout
+
+    python -m benchmarks.teamcity_simulator --port 8111 --projects 300 --depth 4 --build-types 2000 \\
+        --agents 40 --latency lognormal:30:0.6 --error-rate 0.01 --churn 2
+
+Puis lancer le monitor avec TEAMCITY_URL=http://localhost:8111 TEAMCITY_TOKEN=simulateur.
+Endpoints servis: /app/rest/projects, /app/rest/buildTypes, /app/rest/builds?locator=...,
+/app/rest/agents, /app/rest/agents/id:N, /app/rest/buildQueue,
+/app/rest/problemOccurrences, /app/rest/testOccurrences, /app/rest/builds/id:N et
+/downloadBuildLog.html?buildId=N (en-tête Range pris en charge, log croissant pour les builds en cours) ; compteurs par endpoint sur /__simulator/stats.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import dataclass
+import argparse
+import asyncio
+import math
+import random
+import threading
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+from benchmarks.synthetic import (
+    SyntheticCatalog, generate_catalog, parse_locator, latest_builds_for_locator,
+    render_projects_xml, render_build_types_xml, render_builds_xml, render_agents_xml, render_agent_xml,
+    render_build_queue_xml, render_problem_occurrences_xml, render_test_occurrences_xml, build_id_from_locator,
+    render_build_log,
+)
+
+XML_MEDIA_TYPE = "application/xml"
+DEFAULT_RUNNING_BUILDS_LIMIT = 100
+
+
+class LatencyModel:
+    """Latence par requête: 'fixed:MS', 'uniform:MIN:MAX' ou 'lognormal:MEDIANE:SIGMA' (millisecondes)"""
+
+    def __init__(self, spec: str = "fixed:0", seed: Optional[int] = None):
+        self.spec = spec
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self._rng = random.Random(seed)
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Latence invalide '{spec}' (fixed:MS, uniform:MIN:MAX, lognormal:MEDIANE:SIGMA)")
+
+    def sample(self) -> float:
+        """Latence en secondes"""
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = self._rng.uniform(self.params[0], self.params[1])
+        else:
+            ms = self._rng.lognormvariate(math.log(max(self.params[0], 0.001)), self.params[1])
+        return max(0.0, ms) / 1000
+
+
+@dataclass
+class SimulatorConfig:
+    projects: int = 300
+    depth: int = 4
+    build_types: int = 2000
+    agents: int = 40
+    archived_ratio: float = 0.05
+    latency: str = "fixed:0"
+    error_rate: float = 0.0
+    stall_rate: float = 0.0
+    stall_seconds: float = 5.0
+    churn: float = 0.0
+    failure_ratio: float = 0.2
+    seed: int = 42
+
+
+class SimulatorState:
+    """Catalogue vivant: les transitions de builds (démarrage/fin) sont appliquées au fil du temps"""
+
+    def __init__(self, config: SimulatorConfig):
+        self.config = config
+        self.catalog: SyntheticCatalog = generate_catalog(
+            config.projects, config.depth, config.build_types,
+            archived_ratio=config.archived_ratio, seed=config.seed, n_agents=config.agents,
+        )
+        self._rng = random.Random(config.seed + 1)
+        self._lock = threading.Lock()
+        self._last_advance = time.monotonic()
+        self._pending_transitions = 0.0
+        self.transitions = 0
+        self.requests: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.started_at = time.time()
+        # XML statiques, rendus une seule fois
+        self.projects_xml = render_projects_xml(self.catalog)
+        self.build_types_xml = render_build_types_xml(self.catalog)
+
+    def advance(self, now: Optional[float] = None):
+        """Applique `churn` transitions par seconde écoulée depuis le dernier appel"""
+        if self.config.churn <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._pending_transitions += (now - self._last_advance) * self.config.churn
+            self._last_advance = now
+            count = int(self._pending_transitions)
+            self._pending_transitions -= count
+            for _ in range(count):
+                self._transition(self._rng.choice(self.catalog.build_types))
+            self.transitions += count
+
+    def _transition(self, bt: Dict[str, Any]):
+        if bt["running"]:
+            bt["running"] = False
+            bt["status"] = "FAILURE" if self._rng.random() < self.config.failure_ratio else "SUCCESS"
+        else:
+            bt["running"] = True
+            bt["status"] = "SUCCESS"
+            bt["buildId"] += len(self.catalog.build_types)
+            bt["number"] = str(int(bt["number"]) + 1)
+
+    def count(self, endpoint: str, error: bool = False):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if error:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def builds_for_locator(self, locator: Dict[str, str]) -> List[Dict[str, Any]]:
+        if locator.get("buildType"):
+            return latest_builds_for_locator(self.catalog, locator)
+        # Sans buildType: builds en cours (ou derniers builds) de tout le serveur
+        limit = int(locator.get("count") or DEFAULT_RUNNING_BUILDS_LIMIT)
+        result = []
+        for bt in self.catalog.build_types:
+            if locator.get("state") == "running" and not bt["running"]:
+                continue
+            result.extend(latest_builds_for_locator(self.catalog, {"buildType": bt["id"]}))
+            if len(result) >= limit:
+                break
+        return result
+
+    def build_by_id(self, build_id: str) -> Optional[Dict[str, Any]]:
+        return next((bt for bt in self.catalog.build_types if str(bt["buildId"]) == build_id), None)
+
+    def build_log(self, bt: Dict[str, Any]) -> bytes:
+        """Log du dernier build d'un buildType; celui d'un build en cours s'allonge de 20 lignes par seconde"""
+        lines = 1000 + bt["buildId"] % 2000
+        if bt["running"]:
+            lines += int((time.time() - self.started_at) * 20)
+        return render_build_log(bt["buildId"], lines)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "requests": dict(self.requests),
+                "errors": dict(self.errors),
+                "total_requests": sum(self.requests.values()),
+                "transitions": self.transitions,
+                "running_builds": sum(1 for bt in self.catalog.build_types if bt["running"]),
+                "catalog": repr(self.catalog),
+            }
+
+
+def _endpoint_name(path: str) -> str:
+    if path.startswith("/app/rest/agents/"):
+        return "/app/rest/agents/{id}"
+    if path.startswith("/app/rest/builds/"):
+        return "/app/rest/builds/{id}"
+    return path
+
+
+def _byte_range(header: Optional[str], total: int) -> Optional[Tuple[int, int]]:
+    """'bytes=-N', 'bytes=A-' ou 'bytes=A-B' -> (début, fin incluse); None sans en-tête ou plage illisible"""
+    if not header or not header.startswith("bytes="):
+        return None
+    start, _, end = header[len("bytes="):].partition("-")
+    if not start:
+        return (max(0, total - int(end or 0)), total - 1) if end.isdigit() else None
+    if not start.isdigit():
+        return None
+    return int(start), min(total - 1, int(end)) if end.isdigit() else total - 1
+
+
+def create_app(config: Optional[SimulatorConfig] = None) -> FastAPI:
+    config = config or SimulatorConfig()
+    state = SimulatorState(config)
+    latency = LatencyModel(config.latency, seed=config.seed)
+    fault_rng = random.Random(config.seed + 2)
+    app = FastAPI(title="TeamCity Simulator", docs_url=None, redoc_url=None)
+    app.state.simulator = state
+
+    @app.middleware("http")
+    async def simulate_network(request: Request, call_next):
+        """Latence, erreurs 500 et blocages injectés sur les seuls endpoints REST TeamCity"""
+        path = request.url.path
+        if not path.startswith("/app/rest/") and path != "/downloadBuildLog.html":
+            return await call_next(request)
+        endpoint = _endpoint_name(path)
+        state.advance()
+        delay = latency.sample()
+        if delay:
+            await asyncio.sleep(delay)
+        if config.stall_rate and fault_rng.random() < config.stall_rate:
+            await asyncio.sleep(config.stall_seconds)
+        if config.error_rate and fault_rng.random() < config.error_rate:
+            state.count(endpoint, error=True)
+            return Response(content="Simulated failure", status_code=500, media_type="text/plain")
+        state.count(endpoint)
+        return await call_next(request)
+
+    @app.get("/app/rest/projects")
+    async def projects():
+        return Response(content=state.projects_xml, media_type=XML_MEDIA_TYPE)
+
+    @app.get("/app/rest/buildTypes")
+    async def build_types():
+        return Response(content=state.build_types_xml, media_type=XML_MEDIA_TYPE)
+
+    @app.get("/app/rest/builds")
+    async def builds(locator: str = ""):
+        parsed = parse_locator(locator)
+        return Response(content=render_builds_xml(state.builds_for_locator(parsed)), media_type=XML_MEDIA_TYPE)
+
+    @app.get("/app/rest/agents")
+    async def agents():
+        return Response(content=render_agents_xml(state.catalog), media_type=XML_MEDIA_TYPE)
+
+    @app.get("/app/rest/agents/{locator}")
+    async def agent_details(locator: str):
+        agent = state.catalog.agents_by_id.get(locator.split(":", 1)[-1])
+        if agent is None:
+            return Response(content="Agent introuvable", status_code=404, media_type="text/plain")
+        return Response(content=render_agent_xml(agent), media_type=XML_MEDIA_TYPE)
+
+    @app.get("/app/rest/buildQueue")
+    async def build_queue():
+        return Response(content=render_build_queue_xml(state.catalog), media_type=XML_MEDIA_TYPE)
+
+    @app.get("/app/rest/problemOccurrences")
+    async def problem_occurrences(locator: str = ""):
+        return Response(content=render_problem_occurrences_xml(build_id_from_locator(locator)),
+                        media_type=XML_MEDIA_TYPE)
+
+    @app.get("/app/rest/testOccurrences")
+    async def test_occurrences(locator: str = ""):
+        return Response(content=render_test_occurrences_xml(build_id_from_locator(locator)),
+                        media_type=XML_MEDIA_TYPE)
+
+    @app.get("/app/rest/builds/{locator}")
+    async def build_details(locator: str):
+        bt = state.build_by_id(locator.split(":", 1)[-1])
+        if bt is None:
+            return Response(content="Build introuvable", status_code=404, media_type="text/plain")
+        build_state = "running" if bt["running"] else "finished"
+        return Response(content=f'<build id="{bt["buildId"]}" state="{build_state}"/>', media_type=XML_MEDIA_TYPE)
+
+    @app.get("/downloadBuildLog.html")
+    async def download_build_log(request: Request, buildId: str = ""):
+        bt = state.build_by_id(buildId)
+        if bt is None:
+            return Response(content="Build introuvable", status_code=404, media_type="text/plain")
+        log = state.build_log(bt)
+        byte_range = _byte_range(request.headers.get("range"), len(log))
+        if byte_range is None:
+            return Response(content=log, media_type="text/plain")
+        start, end = byte_range
+        if start >= len(log):
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{len(log)}"})
+        return Response(content=log[start:end + 1], status_code=206, media_type="text/plain",
+                        headers={"Content-Range": f"bytes {start}-{end}/{len(log)}"})
+
+    @app.get("/__simulator/stats")
+    async def simulator_stats():
+        return state.stats()
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None):
+    import uvicorn
+
+    defaults = SimulatorConfig()
+    parser = argparse.ArgumentParser(description="Simulateur local de l'API REST TeamCity")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8111)
+    parser.add_argument("--projects", type=int, default=defaults.projects)
+    parser.add_argument("--depth", type=int, default=defaults.depth)
+    parser.add_argument("--build-types", type=int, default=defaults.build_types)
+    parser.add_argument("--agents", type=int, default=defaults.agents)
+    parser.add_argument("--archived-ratio", type=float, default=defaults.archived_ratio)
+    parser.add_argument("--latency", default=defaults.latency,
+                        help="fixed:MS | uniform:MIN:MAX | lognormal:MEDIANE:SIGMA (ms)")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Part de réponses 500")
+    parser.add_argument("--stall-rate", type=float, default=defaults.stall_rate,
+                        help="Part de requêtes bloquées --stall-seconds (au-delà du timeout client)")
+    parser.add_argument("--stall-seconds", type=float, default=defaults.stall_seconds)
+    parser.add_argument("--churn", type=float, default=defaults.churn,
+                        help="Transitions de builds (démarrage/fin) par seconde")
+    parser.add_argument("--failure-ratio", type=float, default=defaults.failure_ratio)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args(argv)
+
+    config = SimulatorConfig(
+        projects=args.projects, depth=args.depth, build_types=args.build_types, agents=args.agents,
+        archived_ratio=args.archived_ratio, latency=args.latency, error_rate=args.error_rate,
+        stall_rate=args.stall_rate, stall_seconds=args.stall_seconds, churn=args.churn,
+        failure_ratio=args.failure_ratio, seed=args.seed,
+    )
+    app = create_app(config)
+    print(f"Simulateur TeamCity: {app.state.simulator.catalog} sur http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
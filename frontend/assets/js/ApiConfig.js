@@ -19,8 +19,13 @@ const API_CONFIG = {
     ENDPOINTS: {
         CONFIG: '/api/config',
         BUILDS_DASHBOARD: '/api/builds/dashboard',
+        DASHBOARD_SESSION_CLOSE: '/api/dashboard/session/close',
         BUILDS_TREE: '/api/builds/tree',
+        BUILDS_TREE_NODES: '/api/builds/tree/nodes',
+        BUILDS_TREE_BUILD_IDS: '/api/builds/tree/build-ids',
+        BUILDS_SEARCH: '/api/builds/search',
         BUILDS_SELECTION: '/api/builds/tree/selection',
+        BUILDS_SELECTION_PATCH: '/api/builds/selection',
         AGENTS: '/api/agents'
     },
     
@@ -42,6 +47,38 @@ function buildApiUrl(endpoint) {
     return API_CONFIG.BASE_URL + API_CONFIG.ENDPOINTS[endpoint];
 }
 
+/**
+ * Identifiant de session du dashboard, propre à l'onglet (sessionStorage)
+ * Le backend ne rafraîchit que les builds affichés par des sessions ouvertes
+ * @returns {string} - L'identifiant de session
+ */
+function dashboardSessionId() {
+    let sessionId = sessionStorage.getItem('dashboardSession');
+    if (!sessionId) {
+        sessionId = window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        sessionStorage.setItem('dashboardSession', sessionId);
+    }
+    return sessionId;
+}
+
+/**
+ * URL du dashboard pour cette session (chaque appel vaut battement de cœur)
+ * @returns {string} - L'URL complète
+ */
+function dashboardUrl() {
+    return `${buildApiUrl('BUILDS_DASHBOARD')}?session=${encodeURIComponent(dashboardSessionId())}`;
+}
+
+/**
+ * Ferme la session du dashboard (onglet masqué ou fermé); sendBeacon survit au déchargement de la page
+ */
+function closeDashboardSession() {
+    const url = `${buildApiUrl('DASHBOARD_SESSION_CLOSE')}?session=${encodeURIComponent(dashboardSessionId())}`;
+    if (!navigator.sendBeacon?.(url)) {
+        fetch(url, { method: 'POST', keepalive: true }).catch(() => {});
+    }
+}
+
 /**
  * Fonction utilitaire pour les requêtes fetch avec timeout
  * @param {string} url - L'URL à appeler
@@ -69,3 +106,5 @@ async function apiRequest(url, options = {}) {
 window.API_CONFIG = API_CONFIG;
 window.buildApiUrl = buildApiUrl;
 window.apiRequest = apiRequest;
+window.dashboardUrl = dashboardUrl;
+window.closeDashboardSession = closeDashboardSession;
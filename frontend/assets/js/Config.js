@@ -4,39 +4,95 @@ const defaultConfig = {
     }
 };
 
-let buildsTree = null;
-let selectedBuilds = [];
+// Arborescence chargée à la demande: chemin du nœud -> page(s) d'enfants déjà reçues
+let treeRoot = null;
+let nodeChildren = new Map();
+let loadingNodes = new Set();
 let expandedNodes = new Set();
+
+// Sélection courante (client) et dernière sélection sauvegardée côté serveur
+let selectedBuilds = new Set();
+let savedSelection = new Set();
+// Version serveur de savedSelection (concurrence optimiste du PATCH)
+let selectionVersion = null;
+// buildTypeId -> chemin du nœud parent, pour ajuster les compteurs sans recharger l'arbre
+let buildPaths = new Map();
+let subtreeBuildIds = new Map();
+
 let searchTerm = '';
+let searchResults = null;
+let searchDebounceTimeout = null;
+let searchRequestCounter = 0;
 let autoSaveTimeout = null;
+let saveInFlight = null;
+
+const SEARCH_PAGE_SIZE = 100;
+const TREE_PAGE_SIZE = 200;
 
 function goBackToDashboard() {
     window.location.href = 'index.html';
 }
 
-async function loadBuildsTree() {
+function encodeArg(value) {
+    return encodeURIComponent(value).replace(/'/g, '%27');
+}
+
+function isUnderPath(path, nodePath) {
+    return nodePath === '' || path === nodePath || path.startsWith(`${nodePath}/`);
+}
+
+async function fetchTreeNode(path, cursor = null) {
+    const params = new URLSearchParams({ path, limit: String(TREE_PAGE_SIZE) });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    const response = await apiRequest(`${buildApiUrl('BUILDS_TREE_NODES')}?${params}`);
+    if (!response.ok) {
+        throw new Error(`Erreur HTTP: ${response.status}`);
+    }
+    return response.json();
+}
+
+async function loadNodeChildren(path, loadMore = false) {
+    const existing = nodeChildren.get(path);
+    if (loadingNodes.has(path) || (existing && !loadMore)) return;
+    
+    loadingNodes.add(path);
     try {
-        const response = await apiRequest(buildApiUrl('BUILDS_TREE'));
-        if (response.ok) {
-            const result = await response.json();
-            buildsTree = result;
-            // Ne pas écraser une sélection déjà chargée (depuis /api/config ou localStorage)
-            if ((!selectedBuilds || selectedBuilds.length === 0) && Array.isArray(result.selected_builds) && result.selected_builds.length > 0) {
-                selectedBuilds = result.selected_builds;
+        const result = await fetchTreeNode(path, loadMore && existing ? existing.next_cursor : null);
+        result.children.forEach(child => {
+            if (child.type === 'build') {
+                buildPaths.set(child.buildTypeId, child.path);
             }
-            
-            // Ne pas filtrer <Root project> car maintenant on a la hiérarchie complète
-            console.log('Arborescence chargée:', buildsTree);
-            
-            expandedNodes.clear();
-            
-            renderBuildsTree();
-            updateBuildsSummary();
-            
-            return true;
-        } else {
-            console.error('Erreur lors du chargement de l\'arborescence:', response.status);
+        });
+        if (loadMore && existing) {
+            result.children = existing.children.concat(result.children);
+        }
+        nodeChildren.set(path, result);
+        if (path === '') {
+            treeRoot = result;
         }
+    } finally {
+        loadingNodes.delete(path);
+    }
+}
+
+async function loadMoreNodeChildren(encodedPath) {
+    await loadNodeChildren(decodeURIComponent(encodedPath), true);
+    renderBuildsTree();
+}
+
+async function loadBuildsTree() {
+    try {
+        await loadNodeChildren('');
+        console.log('Racine de l\'arborescence chargée:', treeRoot);
+        
+        expandedNodes.clear();
+        
+        renderBuildsTree();
+        updateBuildsSummary();
+        
+        return true;
     } catch (error) {
         console.error('Erreur lors du chargement de l\'arborescence:', error);
     }
@@ -44,29 +100,22 @@ async function loadBuildsTree() {
     return false;
 }
 
-
-function expandAllNodes(tree) {
-    if (tree.projects) {
-        Object.keys(tree.projects).forEach(projectName => {
-            expandedNodes.add(`project_${projectName}`);
-            expandAllSubprojects(tree.projects[projectName], projectName);
-        });
+async function fetchSubtreeBuildIds(path) {
+    if (subtreeBuildIds.has(path)) {
+        return subtreeBuildIds.get(path);
     }
-}
-
-function expandAllSubprojects(project, projectPath) {
-    if (project.subprojects) {
-        Object.keys(project.subprojects).forEach(subprojectName => {
-            const subprojectPath = `${projectPath}_${subprojectName}`;
-            expandedNodes.add(`subproject_${subprojectPath}`);
-            expandAllSubprojects(project.subprojects[subprojectName], subprojectPath);
-        });
+    const params = new URLSearchParams({ path });
+    const response = await apiRequest(`${buildApiUrl('BUILDS_TREE_BUILD_IDS')}?${params}`);
+    if (!response.ok) {
+        throw new Error(`Erreur HTTP: ${response.status}`);
     }
-}
-
-function collapseAllNodes() {
-    expandedNodes.clear();
-    renderBuildsTree();
+    const result = await response.json();
+    const ids = result.builds.map(build => {
+        buildPaths.set(build.buildTypeId, build.path);
+        return build.buildTypeId;
+    });
+    subtreeBuildIds.set(path, ids);
+    return ids;
 }
 
 function getBuildStatus(build) {
@@ -77,17 +126,38 @@ function getBuildStatus(build) {
     return 'success';
 }
 
+// Modifications locales pas encore sauvegardées (ajouts / retraits)
+function getPendingChanges() {
+    const added = [...selectedBuilds].filter(id => !savedSelection.has(id));
+    const removed = [...savedSelection].filter(id => !selectedBuilds.has(id));
+    return { added, removed };
+}
+
+function countChangesUnder(ids, nodePath) {
+    return ids.filter(id => buildPaths.has(id) && isUnderPath(buildPaths.get(id), nodePath)).length;
+}
+
+function getNodeCheckboxState(node, pending) {
+    const selectedCount = node.selected_count
+        + countChangesUnder(pending.added, node.path)
+        - countChangesUnder(pending.removed, node.path);
+    
+    if (selectedCount <= 0) return '';
+    if (selectedCount >= node.build_count) return 'checked';
+    return 'indeterminate';
+}
 
 function renderBuildsTree() {
     const container = document.getElementById('builds-tree');
     
-    if (!buildsTree || !buildsTree.projects) {
+    if (!treeRoot) {
         container.innerHTML = '<div class="loading-builds"><i data-lucide="loader-2"></i>Chargement de l\'arborescence...</div>';
         return;
     }
     
-    const filteredTree = applySearchFilter(buildsTree);
-    const html = renderProjectsHTML(filteredTree.projects);
+    const html = searchTerm
+        ? renderSearchResultsHTML(searchResults)
+        : renderNodeChildrenHTML('', 0, getPendingChanges());
     
     container.innerHTML = html;
     
@@ -97,142 +167,130 @@ function renderBuildsTree() {
     }
 }
 
-function applySearchFilter(tree) {
-    if (!searchTerm) return tree;
+// === RECHERCHE CÔTÉ SERVEUR ===
+async function runServerSearch(offset = 0) {
+    const requestId = ++searchRequestCounter;
+    const term = searchTerm;
     
-    const filteredTree = { projects: {} };
-    
-    Object.keys(tree.projects).forEach(projectName => {
-        const filteredProject = filterProject(tree.projects[projectName], searchTerm);
-        if (filteredProject) {
-            filteredTree.projects[projectName] = filteredProject;
+    try {
+        const params = new URLSearchParams({ q: term, offset: String(offset), limit: String(SEARCH_PAGE_SIZE) });
+        const response = await apiRequest(`${buildApiUrl('BUILDS_SEARCH')}?${params}`);
+        if (!response.ok) {
+            throw new Error(`Erreur HTTP: ${response.status}`);
         }
-    });
-    
-    return filteredTree;
-}
-
-function filterProject(project, searchTerm) {
-    const term = searchTerm.toLowerCase();
-    let hasMatch = false;
-    
-    const filteredProject = {
-        name: project.name,
-        subprojects: {},
-        builds: []
-    };
-    
-    // Filtrer les builds directs
-    if (project.builds) {
-        project.builds.forEach(build => {
-            if (build.name.toLowerCase().includes(term)) {
-                filteredProject.builds.push(build);
-                hasMatch = true;
-            }
-        });
-    }
-    
-    // Filtrer les sous-projets
-    if (project.subprojects) {
-        Object.keys(project.subprojects).forEach(subprojectName => {
-            const filteredSubproject = filterProject(project.subprojects[subprojectName], searchTerm);
-            if (filteredSubproject) {
-                filteredProject.subprojects[subprojectName] = filteredSubproject;
-                hasMatch = true;
+        const result = await response.json();
+        
+        // Ignorer les réponses d'une frappe précédente
+        if (requestId !== searchRequestCounter || term !== searchTerm) return;
+        
+        result.hits.forEach(hit => {
+            if (hit.path && hit.path.length) {
+                buildPaths.set(hit.buildTypeId, hit.path.join('/'));
             }
         });
+        if (offset > 0 && searchResults) {
+            result.hits = searchResults.hits.concat(result.hits);
+        }
+        searchResults = result;
+    } catch (error) {
+        console.error('Erreur lors de la recherche:', error);
+        if (requestId === searchRequestCounter) {
+            searchResults = { total: 0, hits: [] };
+        }
     }
     
-    return hasMatch ? filteredProject : null;
-}
-
-function renderProjectsHTML(projects) {
-    return Object.keys(projects).map(projectName => {
-        const project = projects[projectName];
-        const isExpanded = expandedNodes.has(`project_${projectName}`);
-        const checkboxState = getProjectCheckboxState(project);
-        
-        return `
-            <div class="tree-project">
-                <div class="tree-project-header ${isExpanded ? 'expanded' : 'collapsed'}" 
-                     onclick="toggleProject('${projectName}')">
-                    <i data-lucide="chevron-right" class="tree-expand-icon ${isExpanded ? 'expanded' : ''}"></i>
-                    <i data-lucide="folder" class="tree-folder-icon" style="color: #3fb950;"></i>
-                    <div class="tree-project-checkbox ${checkboxState}" 
-                         onclick="event.stopPropagation(); toggleProjectSelection('${projectName}')"></div>
-                    <span class="tree-project-name">${projectName}</span>
-                </div>
-                <div class="tree-project-content ${isExpanded ? 'expanded' : ''}">
-                    ${renderSubprojectsHTML(project.subprojects || {}, projectName)}
-                    ${renderBuildsHTML(project.builds || [])}
-                </div>
-            </div>
-        `;
-    }).join('');
+    renderBuildsTree();
 }
 
-function renderSubprojectsHTML(subprojects, projectPath) {
-    return Object.keys(subprojects).map(subprojectName => {
-        const subproject = subprojects[subprojectName];
-        const subprojectPath = `${projectPath}_${subprojectName}`;
-        const isExpanded = expandedNodes.has(`subproject_${subprojectPath}`);
-        const checkboxState = getProjectCheckboxState(subproject);
-        
-        return `
-            <div class="tree-subproject">
-                <div class="tree-subproject-header ${isExpanded ? 'expanded' : 'collapsed'}" 
-                     onclick="toggleSubproject('${subprojectPath}')">
-                    <i data-lucide="chevron-right" class="tree-expand-icon ${isExpanded ? 'expanded' : ''}"></i>
-                    <i data-lucide="folder" class="tree-folder-icon" style="color: #3fb950;"></i>
-                    <div class="tree-subproject-checkbox ${checkboxState}" 
-                         onclick="event.stopPropagation(); toggleSubprojectSelection('${subprojectPath}')"></div>
-                    <span class="tree-subproject-name">${subproject.name}</span>
-                </div>
-                <div class="tree-subproject-content ${isExpanded ? 'expanded' : ''}">
-                    ${renderSubprojectsHTML(subproject.subprojects || {}, subprojectPath)}
-                    ${renderBuildsHTML(subproject.builds || [])}
-                </div>
-            </div>
-        `;
-    }).join('');
+function loadMoreSearchResults() {
+    if (searchResults && searchResults.hits.length < searchResults.total) {
+        runServerSearch(searchResults.hits.length);
+    }
 }
 
-function renderBuildsHTML(builds) {
-    return builds.map(build => {
-        const isSelected = selectedBuilds.includes(build.buildTypeId);
-        const statusClass = getBuildStatus(build);
-        const buildName = build.name || build.buildTypeId || 'Build sans nom';
+function renderSearchResultsHTML(results) {
+    if (!results) {
+        return '<div class="loading-builds"><i data-lucide="loader-2"></i>Recherche...</div>';
+    }
+    if (results.hits.length === 0) {
+        return '<div class="loading-builds">Aucun build trouvé</div>';
+    }
+    
+    const hitsHTML = results.hits.map(hit => {
+        const isSelected = selectedBuilds.has(hit.buildTypeId);
+        const path = (hit.path && hit.path.length ? hit.path : [hit.projectName]).join(' / ');
         
         return `
-            <div class="tree-build" onclick="toggleBuildSelection('${build.buildTypeId}')">
+            <div class="tree-build" onclick="toggleBuildSelection('${hit.buildTypeId}')">
                 <i data-lucide="diamond" class="tree-build-icon" style="color: #3fb950;"></i>
                 <div class="tree-build-checkbox ${isSelected ? 'checked' : ''}"></div>
-                <span class="tree-build-name">${buildName}</span>
-                <div class="tree-build-status ${statusClass}"></div>
+                <span class="tree-build-name">${hit.name || hit.buildTypeId}</span>
+                <span class="tree-build-path">${path}</span>
             </div>
         `;
     }).join('');
-}
-
-function getProjectCheckboxState(project) {
-    const projectBuilds = getAllBuildsFromProject(project);
-    const selectedCount = projectBuilds.filter(build => selectedBuilds.includes(build.buildTypeId)).length;
     
-    if (selectedCount === 0) return '';
-    if (selectedCount === projectBuilds.length) return 'checked';
-    return 'indeterminate';
+    const moreHTML = results.hits.length < results.total
+        ? `<button class="control-btn" onclick="loadMoreSearchResults()">Afficher plus (${results.hits.length} / ${results.total})</button>`
+        : '';
+    
+    return hitsHTML + moreHTML;
 }
 
-function getAllBuildsFromProject(project) {
-    let builds = [...(project.builds || [])];
-    
-    if (project.subprojects) {
-        Object.values(project.subprojects).forEach(subproject => {
-            builds = builds.concat(getAllBuildsFromProject(subproject));
-        });
+function renderNodeChildrenHTML(path, depth, pending) {
+    const data = nodeChildren.get(path);
+    if (!data) {
+        return '<div class="loading-builds"><i data-lucide="loader-2"></i>Chargement...</div>';
     }
     
-    return builds;
+    const childrenHTML = data.children.map(child => child.type === 'build'
+        ? renderBuildHTML(child)
+        : renderProjectNodeHTML(child, depth, pending)
+    ).join('');
+    
+    const moreHTML = data.next_cursor
+        ? `<button class="control-btn" onclick="loadMoreNodeChildren('${encodeArg(path)}')">Afficher plus (${data.children.length} / ${data.total_children})</button>`
+        : '';
+    
+    return childrenHTML + moreHTML;
+}
+
+function renderProjectNodeHTML(node, depth, pending) {
+    const isExpanded = expandedNodes.has(node.path);
+    const checkboxState = getNodeCheckboxState(node, pending);
+    const kind = depth === 0 ? 'project' : 'subproject';
+    const arg = encodeArg(node.path);
+    
+    return `
+        <div class="tree-${kind}">
+            <div class="tree-${kind}-header ${isExpanded ? 'expanded' : 'collapsed'}" 
+                 onclick="toggleNode('${arg}')">
+                <i data-lucide="chevron-right" class="tree-expand-icon ${isExpanded ? 'expanded' : ''}"></i>
+                <i data-lucide="folder" class="tree-folder-icon" style="color: #3fb950;"></i>
+                <div class="tree-${kind}-checkbox ${checkboxState}" 
+                     onclick="event.stopPropagation(); toggleNodeSelection('${arg}')"></div>
+                <span class="tree-${kind}-name">${node.name}</span>
+            </div>
+            <div class="tree-${kind}-content ${isExpanded ? 'expanded' : ''}">
+                ${isExpanded ? renderNodeChildrenHTML(node.path, depth + 1, pending) : ''}
+            </div>
+        </div>
+    `;
+}
+
+function renderBuildHTML(build) {
+    const isSelected = selectedBuilds.has(build.buildTypeId);
+    const statusClass = getBuildStatus(build);
+    const buildName = build.name || build.buildTypeId || 'Build sans nom';
+    
+    return `
+        <div class="tree-build" onclick="toggleBuildSelection('${build.buildTypeId}')">
+            <i data-lucide="diamond" class="tree-build-icon" style="color: #3fb950;"></i>
+            <div class="tree-build-checkbox ${isSelected ? 'checked' : ''}"></div>
+            <span class="tree-build-name">${buildName}</span>
+            <div class="tree-build-status ${statusClass}"></div>
+        </div>
+    `;
 }
 
 // === INTERACTIONS AVEC L'ARBORESCENCE ===
@@ -241,7 +299,20 @@ function setupBuildsSearch() {
     
     searchInput.addEventListener('input', function() {
         searchTerm = this.value.trim();
-        renderBuildsTree();
+        searchResults = null;
+        
+        if (searchDebounceTimeout) {
+            clearTimeout(searchDebounceTimeout);
+        }
+        
+        if (!searchTerm) {
+            searchRequestCounter++;
+            renderBuildsTree();
+            return;
+        }
+        
+        // Attendre la fin de la frappe avant d'interroger l'index serveur
+        searchDebounceTimeout = setTimeout(() => runServerSearch(), 150);
     });
     
     // Gérer les touches clavier
@@ -249,6 +320,8 @@ function setupBuildsSearch() {
         if (e.key === 'Escape') {
             this.value = '';
             searchTerm = '';
+            searchResults = null;
+            searchRequestCounter++;
             renderBuildsTree();
             this.blur();
         }
@@ -256,84 +329,104 @@ function setupBuildsSearch() {
 }
 
 // === FONCTIONS DE CONTRÔLE DE L'ARBORESCENCE ===
-function expandAllBuilds() {
-    expandedNodes.clear();
-    expandAllNodes(buildsTree);
+async function expandAllBuilds() {
+    // Déplier niveau par niveau en chargeant chaque branche (action explicite de l'utilisateur)
+    let frontier = [''];
+    try {
+        while (frontier.length > 0) {
+            await Promise.all(frontier.map(path => loadNodeChildren(path)));
+            for (const path of frontier) {
+                let data = nodeChildren.get(path);
+                while (data && data.next_cursor) {
+                    await loadNodeChildren(path, true);
+                    data = nodeChildren.get(path);
+                }
+            }
+            const next = [];
+            frontier.forEach(path => {
+                (nodeChildren.get(path)?.children || []).forEach(child => {
+                    if (child.type === 'project') {
+                        expandedNodes.add(child.path);
+                        next.push(child.path);
+                    }
+                });
+            });
+            frontier = next;
+        }
+    } catch (error) {
+        console.error('Erreur lors du dépliage de l\'arborescence:', error);
+    }
     renderBuildsTree();
 }
 
 function collapseAllBuilds() {
-    collapseAllNodes();
+    expandedNodes.clear();
+    renderBuildsTree();
 }
 
-function selectAllBuilds() {
-    if (buildsTree && buildsTree.projects) {
-        selectedBuilds = [];
-        Object.values(buildsTree.projects).forEach(project => {
-            const projectBuilds = getAllBuildsFromProject(project);
-            projectBuilds.forEach(build => {
-                if (!selectedBuilds.includes(build.buildTypeId)) {
-                    selectedBuilds.push(build.buildTypeId);
-                }
-            });
-        });
+async function selectAllBuilds() {
+    try {
+        const ids = await fetchSubtreeBuildIds('');
+        ids.forEach(id => selectedBuilds.add(id));
         renderBuildsTree();
         updateBuildsSummary();
         // triggerAutoSave(); // Désactivé - utiliser le bouton "Sauvegarder" manuellement
+    } catch (error) {
+        console.error('Erreur lors de la sélection globale:', error);
     }
 }
 
-function deselectAllBuilds() {
-    selectedBuilds = [];
+async function deselectAllBuilds() {
+    try {
+        // Connaître le chemin de chaque build pour ajuster les compteurs affichés
+        await fetchSubtreeBuildIds('');
+    } catch (error) {
+        console.error('Erreur lors du chargement des builds:', error);
+    }
+    selectedBuilds.clear();
     renderBuildsTree();
     updateBuildsSummary();
     triggerAutoSave();
 }
 
 // === TOGGLE EXPAND/COLLAPSE ===
-function toggleProject(projectName) {
-    const nodeId = `project_${projectName}`;
-    if (expandedNodes.has(nodeId)) {
-        expandedNodes.delete(nodeId);
-    } else {
-        expandedNodes.add(nodeId);
+async function toggleNode(encodedPath) {
+    const path = decodeURIComponent(encodedPath);
+    if (expandedNodes.has(path)) {
+        expandedNodes.delete(path);
+        renderBuildsTree();
+        return;
     }
+    
+    expandedNodes.add(path);
     renderBuildsTree();
-}
-
-function toggleSubproject(subprojectPath) {
-    const nodeId = `subproject_${subprojectPath}`;
-    if (expandedNodes.has(nodeId)) {
-        expandedNodes.delete(nodeId);
-    } else {
-        expandedNodes.add(nodeId);
+    try {
+        await loadNodeChildren(path);
+    } catch (error) {
+        console.error('Erreur lors du chargement du nœud:', error);
+        expandedNodes.delete(path);
     }
     renderBuildsTree();
 }
 
 // === TOGGLE SÉLECTION ===
-function toggleProjectSelection(projectName) {
-    const project = buildsTree.projects[projectName];
-    if (!project) return;
-    
-    const projectBuilds = getAllBuildsFromProject(project);
-    const selectedCount = projectBuilds.filter(build => selectedBuilds.includes(build.buildTypeId)).length;
+async function toggleNodeSelection(encodedPath) {
+    const path = decodeURIComponent(encodedPath);
+    let ids;
+    try {
+        ids = await fetchSubtreeBuildIds(path);
+    } catch (error) {
+        console.error('Erreur lors du chargement des builds du nœud:', error);
+        return;
+    }
     
-    if (selectedCount === projectBuilds.length) {
+    const allSelected = ids.every(id => selectedBuilds.has(id));
+    if (allSelected) {
         // Tout désélectionner
-        projectBuilds.forEach(build => {
-            const index = selectedBuilds.indexOf(build.buildTypeId);
-            if (index > -1) {
-                selectedBuilds.splice(index, 1);
-            }
-        });
+        ids.forEach(id => selectedBuilds.delete(id));
     } else {
         // Tout sélectionner
-        projectBuilds.forEach(build => {
-            if (!selectedBuilds.includes(build.buildTypeId)) {
-                selectedBuilds.push(build.buildTypeId);
-            }
-        });
+        ids.forEach(id => selectedBuilds.add(id));
     }
     
     renderBuildsTree();
@@ -341,33 +434,11 @@ function toggleProjectSelection(projectName) {
     triggerAutoSave();
 }
 
-function toggleSubprojectSelection(subprojectPath) {
-    const pathParts = subprojectPath.split('_');
-    let current = buildsTree.projects[pathParts[0]];
-    
-    for (let i = 1; i < pathParts.length; i++) {
-        current = current.subprojects[pathParts[i]];
-        if (!current) return;
-    }
-    
-    const subprojectBuilds = getAllBuildsFromProject(current);
-    const selectedCount = subprojectBuilds.filter(build => selectedBuilds.includes(build.buildTypeId)).length;
-    
-    if (selectedCount === subprojectBuilds.length) {
-        // Tout désélectionner
-        subprojectBuilds.forEach(build => {
-            const index = selectedBuilds.indexOf(build.buildTypeId);
-            if (index > -1) {
-                selectedBuilds.splice(index, 1);
-            }
-        });
-            } else {
-        // Tout sélectionner
-        subprojectBuilds.forEach(build => {
-            if (!selectedBuilds.includes(build.buildTypeId)) {
-                selectedBuilds.push(build.buildTypeId);
-            }
-        });
+function toggleBuildSelection(buildTypeId) {
+    if (selectedBuilds.has(buildTypeId)) {
+        selectedBuilds.delete(buildTypeId);
+    } else {
+        selectedBuilds.add(buildTypeId);
     }
     
     renderBuildsTree();
@@ -375,23 +446,23 @@ function toggleSubprojectSelection(subprojectPath) {
     triggerAutoSave();
 }
 
-function toggleBuildSelection(buildTypeId) {
-    const index = selectedBuilds.indexOf(buildTypeId);
-    if (index > -1) {
-        selectedBuilds.splice(index, 1);
-    } else {
-        selectedBuilds.push(buildTypeId);
-    }
+// Après une sauvegarde réussie, les compteurs serveur reflètent la nouvelle sélection
+function applySavedSelection(sentSelection) {
+    const added = [...sentSelection].filter(id => !savedSelection.has(id));
+    const removed = [...savedSelection].filter(id => !sentSelection.has(id));
     
-    renderBuildsTree();
-    updateBuildsSummary();
-    triggerAutoSave();
+    nodeChildren.forEach(data => {
+        [data, ...data.children.filter(child => child.type === 'project')].forEach(node => {
+            node.selected_count += countChangesUnder(added, node.path) - countChangesUnder(removed, node.path);
+        });
+    });
+    savedSelection = new Set(sentSelection);
 }
 
 // === MISE À JOUR DU RÉSUMÉ ===
 function updateBuildsSummary() {
-    const totalBuilds = buildsTree ? buildsTree.total_builds : 0;
-    const selectedCount = selectedBuilds.length;
+    const totalBuilds = treeRoot ? treeRoot.build_count : 0;
+    const selectedCount = selectedBuilds.size;
     
     const selectedElement = document.getElementById('selected-builds-count');
     const totalElement = document.getElementById('total-builds-count');
@@ -485,41 +556,68 @@ function triggerAutoSave() {
     }, 1000); // Délai de 1 seconde pour éviter trop de requêtes
 }
 
+// Envoie uniquement les ajouts/retraits depuis la dernière sauvegarde (les bascules successives
+// d'un même build s'annulent). Une seule requête à la fois: les changements faits pendant l'envoi
+// partent dans la requête suivante.
 async function autoSaveConfiguration() {
+    while (saveInFlight) {
+        await saveInFlight;
+    }
+    saveInFlight = sendSelectionPatch();
     try {
-        console.log('Sauvegarde automatique en cours...');
-        console.log('Builds à sauvegarder:', selectedBuilds);
-        
-        // Log spécifique pour DentalLongTest
-        selectedBuilds.forEach(buildId => {
-            if (buildId.includes('DentalLongTest')) {
-                console.log('🔍 DENTALLONGTEST DANS LA SAUVEGARDE:', buildId);
+        await saveInFlight;
+    } finally {
+        saveInFlight = null;
+    }
+}
+
+async function sendSelectionPatch(retryOnConflict = true) {
+    const { added, removed } = getPendingChanges();
+    try {
+        if (added.length > 0 || removed.length > 0) {
+            console.log(`Sauvegarde automatique: +${added.length} / -${removed.length} builds`);
+            
+            const response = await apiRequest(buildApiUrl('BUILDS_SELECTION_PATCH'), {
+                method: 'PATCH',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ add: added, remove: removed, base_version: selectionVersion })
+            });
+            
+            if (response.status === 409) {
+                // Sélection modifiée ailleurs: repartir de l'état serveur et y rejouer nos changements
+                const current = await response.json();
+                const pending = getPendingChanges();
+                applySavedSelection(new Set(current.selectedBuilds || []));
+                selectionVersion = current.version;
+                selectedBuilds = new Set([...savedSelection, ...pending.added].filter(id => !pending.removed.includes(id)));
+                renderBuildsTree();
+                updateBuildsSummary();
+                if (retryOnConflict) {
+                    return sendSelectionPatch(false);
+                }
+                throw new Error('Conflit de version persistant');
             }
-        });
-        
-        const response = await apiRequest(buildApiUrl('BUILDS_SELECTION'), {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ selectedBuilds })
-        });
-        
-        if (response.ok) {
+            if (!response.ok) {
+                throw new Error(`Erreur HTTP: ${response.status}`);
+            }
+            
+            const result = await response.json();
+            selectionVersion = result.version;
+            applySavedSelection(new Set([...savedSelection, ...added].filter(id => !removed.includes(id))));
             console.log('✅ Sauvegarde automatique réussie');
-        } else {
-            throw new Error(`Erreur HTTP: ${response.status}`);
         }
         
         // Aussi sauvegarder en localStorage comme backup
-        localStorage.setItem('teamcity-monitor-builds', JSON.stringify(selectedBuilds));
+        localStorage.setItem('teamcity-monitor-builds', JSON.stringify([...selectedBuilds]));
         
     } catch (error) {
         console.error('❌ Erreur lors de la sauvegarde automatique:', error);
         
         // Fallback: sauvegarder au moins en localStorage
         try {
-            localStorage.setItem('teamcity-monitor-builds', JSON.stringify(selectedBuilds));
+            localStorage.setItem('teamcity-monitor-builds', JSON.stringify([...selectedBuilds]));
             console.log('Sauvegarde de secours en localStorage');
         } catch (fallbackError) {
             console.error('Erreur de sauvegarde de secours:', fallbackError);
@@ -569,6 +667,9 @@ async function loadConfiguration() {
                 || (result.builds && Array.isArray(result.builds.selectedBuilds) && result.builds.selectedBuilds)
                 || (Array.isArray(result.selected_builds) && result.selected_builds)
             )) || [];
+            // Les compteurs de l'arborescence serveur sont calculés sur cette sélection
+            savedSelection = new Set(fromApi);
+            selectionVersion = result.selectionVersion || null;
 
             // Si backend renvoie vide, tenter fallback localStorage pour ne pas perdre l'état UI
             if ((!fromApi || fromApi.length === 0)) {
@@ -586,8 +687,8 @@ async function loadConfiguration() {
                 }
             }
 
-            selectedBuilds = fromApi;
-            console.log('Builds sélectionnés chargés depuis backend:', selectedBuilds);
+            selectedBuilds = new Set(fromApi);
+            console.log('Builds sélectionnés chargés depuis backend:', fromApi);
             return;
         }
     } catch (error) {
@@ -598,16 +699,16 @@ async function loadConfiguration() {
     try {
         const saved = localStorage.getItem('teamcity-monitor-builds');
         if (saved) {
-            selectedBuilds = JSON.parse(saved);
-            console.log('Builds sélectionnés chargés depuis localStorage:', selectedBuilds);
+            selectedBuilds = new Set(JSON.parse(saved));
+            console.log('Builds sélectionnés chargés depuis localStorage:', [...selectedBuilds]);
         } else {
             // AUCUN BUILD SÉLECTIONNÉ PAR DÉFAUT - L'UTILISATEUR DOIT FAIRE SES CHOIX
-            selectedBuilds = [];
+            selectedBuilds = new Set();
             console.log('Aucune configuration trouvée - aucun build sélectionné par défaut');
         }
     } catch (error) {
         console.error('Erreur lors du chargement de la configuration:', error);
-        selectedBuilds = [];
+        selectedBuilds = new Set();
     }
 }
 
@@ -642,7 +743,7 @@ document.addEventListener('DOMContentLoaded', async function() {
     // Charger la configuration actuelle AVANT l'arborescence
     await loadConfiguration();
     
-    // Charger l'arborescence des builds depuis l'API
+    // Charger uniquement la racine de l'arborescence; les branches sont chargées à la demande
     const buildsLoaded = await loadBuildsTree();
     
     if (buildsLoaded) {
@@ -652,8 +753,8 @@ document.addEventListener('DOMContentLoaded', async function() {
         // Mettre à jour le résumé après que tout soit chargé
         updateBuildsSummary();
         
-        console.log('Arborescence chargée avec succès:', buildsTree);
-        console.log('Builds sélectionnés:', selectedBuilds);
+        console.log('Arborescence chargée avec succès:', treeRoot);
+        console.log('Builds sélectionnés:', [...selectedBuilds]);
     } else {
         buildsContainer.innerHTML = '<div class="loading-builds">Erreur lors du chargement de l\'arborescence des builds</div>';
     }
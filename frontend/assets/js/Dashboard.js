@@ -195,13 +195,26 @@ class SimpleDashboard {
         this.dynamicColumns = [];
         this.init();
         this.startStatsMonitoring();
+        this.watchVisibility();
+    }
+
+    watchVisibility() {
+        // Onglet masqué ou fermé: la session est libérée, le backend cesse de rafraîchir ses builds
+        document.addEventListener('visibilitychange', () => {
+            if (document.hidden) {
+                closeDashboardSession();
+            } else {
+                this.loadAndDisplayBuilds();
+            }
+        });
+        window.addEventListener('pagehide', () => closeDashboardSession());
     }
 
     async init() {
         try {
             const [configResponse, buildsResponse, agentsResponse] = await Promise.all([
                 apiRequest(buildApiUrl('CONFIG')),
-                apiRequest(buildApiUrl('BUILDS_DASHBOARD')),
+                apiRequest(dashboardUrl()),
                 apiRequest(buildApiUrl('AGENTS'))
             ]);
             
@@ -241,6 +254,8 @@ class SimpleDashboard {
 
     processBuilds(data) {
         try {
+            // Délai avant le prochain rafraîchissement, adapté par le serveur à l'activité des builds affichés
+            this.refreshAfterMs = data.refresh_after_ms || 120000;
             this.allBuilds = data.builds || [];
             this.organizedProjects = data.projects || {};
             // Stocker les statistiques de l'API
@@ -261,7 +276,7 @@ class SimpleDashboard {
 
     async loadAndDisplayBuilds() {
         try {
-            const response = await apiRequest(buildApiUrl('BUILDS_DASHBOARD'));
+            const response = await apiRequest(dashboardUrl());
             const data = await response.json();
             this.processBuilds(data);
         } catch (error) {
@@ -415,9 +430,11 @@ class SimpleDashboard {
     generateBuildHTML(build) {
         const statusClass = this.getStatusClass(build.status, build.state);
         const buildName = this.extractReadableBuildName(build);
+        // Statut non reçu avant l'échéance du serveur: dernière valeur connue (stale) ou en attente (pending)
+        const lateClass = build.pending ? 'pending' : (build.stale ? 'stale' : '');
         
         return `
-            <div class="build-item ${statusClass}" onclick="window.open('${build.webUrl}', '_blank')">
+            <div class="build-item ${statusClass} ${lateClass}" onclick="window.open('${build.webUrl}', '_blank')">
                 <div class="build-name">${buildName}</div>
             </div>
         `;
@@ -462,14 +479,19 @@ class SimpleDashboard {
     }
 
     startAutoRefresh() {
-        setInterval(async () => {
+        const refresh = async () => {
+            if (document.hidden) {
+                // Pas de battement de cœur pendant que l'onglet est masqué
+                setTimeout(refresh, this.refreshAfterMs || 120000);
+                return;
+            }
             try {
                 const controller = new AbortController();
                 const timeoutId = setTimeout(() => controller.abort(), 10000);
                 
                 const [configResponse, buildsResponse, agentsResponse] = await Promise.all([
                     apiRequest(buildApiUrl('CONFIG'), { signal: controller.signal }),
-                    apiRequest(buildApiUrl('BUILDS_DASHBOARD'), { signal: controller.signal }),
+                    apiRequest(dashboardUrl(), { signal: controller.signal }),
                     apiRequest(buildApiUrl('AGENTS'), { signal: controller.signal })
                 ]);
                 
@@ -494,7 +516,10 @@ class SimpleDashboard {
                     // Ignorer les erreurs de fallback
                 }
             }
-        }, 120000);
+            // setTimeout enchaîné: l'intervalle suit refresh_after_ms (builds en cours: plus fréquent)
+            setTimeout(refresh, this.refreshAfterMs || 120000);
+        };
+        setTimeout(refresh, this.refreshAfterMs || 120000);
     }
 
     startStatsMonitoring() {
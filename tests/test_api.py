@@ -31,7 +31,10 @@ def test_builds_tree_demo_mode():
     assert data.get("total_builds", 0) > 0
 
 
-def test_save_selection_and_dashboard_demo():
+def test_save_selection_and_dashboard_demo(monkeypatch, tmp_path):
+    from api.models.user_selection import UserBuildSelection
+    monkeypatch.setattr(UserBuildSelection, "FILE_FALLBACK_PATH", tmp_path / "selected_builds.json")
+
     # Utiliser les IDs connues du mode demo (définies dans routes/builds.py)
     selected = [
         "Go2Version612_Plugins_BuildDebug",
@@ -49,3 +52,177 @@ def test_save_selection_and_dashboard_demo():
     assert data.get("total_builds", 0) >= len(selected)
     assert isinstance(data.get("projects", {}), dict)
 
+
+def test_patch_selection_applies_changes_and_detects_conflicts(monkeypatch, tmp_path):
+    from api.models.user_selection import UserBuildSelection
+    monkeypatch.setattr(UserBuildSelection, "FILE_FALLBACK_PATH", tmp_path / "selected_builds.json")
+
+    version = client.get("/api/config").json()["selectionVersion"]
+    resp = client.patch("/api/builds/selection", json={"add": ["A", "B"], "remove": [], "base_version": version})
+    assert resp.status_code == 200
+    first = resp.json()
+    assert (first["added"], first["selected_count"]) == (2, 2)
+
+    # Version périmée: 409 avec la sélection courante pour rejouer les changements
+    stale = client.patch("/api/builds/selection", json={"add": ["C"], "remove": ["A"], "base_version": version})
+    assert stale.status_code == 409
+    assert sorted(stale.json()["selectedBuilds"]) == ["A", "B"]
+
+    resp = client.patch("/api/builds/selection",
+                        json={"add": ["C"], "remove": ["A"], "base_version": stale.json()["version"]})
+    assert resp.status_code == 200
+    assert sorted(client.get("/api/config").json()["selectedBuilds"]) == ["B", "C"]
+
+    assert client.patch("/api/builds/selection", json={"add": ["X"], "remove": ["X"]}).status_code == 400
+
+
+
+def test_batch_status_reports_missing_ids():
+    resp = client.get("/api/status", params={"ids": "Unknown_A,Unknown_B"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["requested"] == 2
+    assert sorted(data["missing"]) == ["Unknown_A", "Unknown_B"]
+
+    resp = client.post("/api/status", json={"ids": ["Unknown_A"]})
+    assert resp.status_code == 200
+    assert resp.json()["missing"] == ["Unknown_A"]
+
+
+def test_agents_utilization_from_single_bulk_request(monkeypatch):
+    from api.routes import builds as builds_routes
+    from api.services import teamcity_fetcher
+    from api.services.cache_backend import get_cache_backend
+    from benchmarks.synthetic import generate_catalog, agent_running_builds, FakeTeamCityClient
+
+    catalog = generate_catalog(n_projects=10, depth=2, n_build_types=60, n_agents=12)
+    fake = FakeTeamCityClient(catalog)
+    monkeypatch.setattr(teamcity_fetcher, "_make_teamcity_request", fake)
+    monkeypatch.setitem(builds_routes.cache, "teamcity_agents", None)
+    monkeypatch.setitem(builds_routes.cache, "agents_stamp", None)
+    get_cache_backend().delete("teamcity_agents")
+    try:
+        resp = client.get("/api/agents/utilization")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert fake.calls == 1
+        assert data["totals"]["total"] == 12
+        assert data["totals"]["busy"] == len(agent_running_builds(catalog))
+        assert sum(group["total"] for group in data["groups"]) == 12
+        assert all(agent["build"]["buildTypeId"] for agent in data["agents"] if agent["busy"])
+
+        by_type = client.get("/api/agents/utilization", params={"group_by": "type"}).json()
+        assert len(by_type["groups"]) == 12 and fake.calls == 1
+        assert client.get("/api/agents/utilization", params={"group_by": "x"}).status_code == 400
+    finally:
+        get_cache_backend().delete("teamcity_agents")
+
+
+def test_builds_search_demo_mode():
+    resp = client.get("/api/builds/search", params={"q": "portal", "demo": True})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total"] == 1
+    assert data["hits"][0]["buildTypeId"] == "WebServices_Portal_Deploy"
+    assert data["hits"][0]["path"][0] == "Web Services"
+
+
+def test_builds_tree_nodes_demo_mode():
+    resp = client.get("/api/builds/tree/nodes", params={"demo": True})
+    assert resp.status_code == 200
+    root = resp.json()
+    assert root["build_count"] > 0
+    assert all(child["type"] == "project" for child in root["children"])
+
+    first = root["children"][0]
+    resp = client.get("/api/builds/tree/nodes", params={"demo": True, "path": first["path"]})
+    assert resp.status_code == 200
+    assert resp.json()["build_count"] == first["build_count"]
+
+    resp = client.get("/api/builds/tree/nodes", params={"demo": True, "path": "Inexistant"})
+    assert resp.status_code == 404
+
+
+def test_metrics_endpoint_exposes_http_histogram():
+    client.get("/api/builds/tree", params={"demo": True})
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/builds/tree",status="200"}' in resp.text
+    assert "# TYPE cache_requests_total counter" in resp.text
+
+
+def test_server_timing_header_and_slow_request_log(monkeypatch):
+    from api.services import timing
+    monkeypatch.setattr(timing.slow_requests, "threshold_ms", 0.0)
+    timing.slow_requests.clear()
+
+    resp = client.get("/api/builds/tree", params={"demo": True})
+    assert resp.status_code == 200
+    header = resp.headers["server-timing"]
+    assert "tree;dur=" in header
+    assert "serialize;dur=" in header
+    assert "total;dur=" in header
+
+    resp = client.get("/api/debug/slow-requests", params={"limit": 5})
+    assert resp.status_code == 200
+    entries = resp.json()["requests"]
+    assert entries[0]["path"] == "/api/builds/tree"
+    assert "tree" in entries[0]["phases"]
+
+
+
+def test_slow_request_log_keeps_the_slowest():
+    from api.services.timing import RequestTiming, SlowRequestLog
+    log = SlowRequestLog(threshold_ms=10.0, size=3)
+    for seconds in (0.5, 0.02, 0.3, 0.005, 0.9, 0.1):
+        log.record(RequestTiming("GET", f"/{seconds}"), seconds, 200)
+    assert [entry["duration_ms"] for entry in log.snapshot()] == [900.0, 500.0, 300.0]
+    assert [entry["path"] for entry in log.snapshot(1)] == ["/0.9"]
+
+def test_readiness_flips_after_background_warm_up():
+    import time
+    with TestClient(app) as started:
+        deadline = time.monotonic() + 10
+        resp = started.get("/api/ready")
+        while resp.status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            resp = started.get("/api/ready")
+        assert resp.status_code == 200
+        assert resp.json()["ready"] is True
+
+
+def test_config_is_served_from_memory_with_etag(monkeypatch, tmp_path):
+    from api.database import storage as storage_module
+    from api.database.sqlite_storage import SQLiteStorage
+    from api.models.user_selection import UserBuildSelection, UserPreferences
+
+    storage = SQLiteStorage(str(tmp_path / "monitor.sqlite3"))
+    storage.create_selection_table()
+    storage.create_preference_table()
+    monkeypatch.setattr(storage_module, "_storage", storage)
+    monkeypatch.setattr(UserBuildSelection, "FILE_FALLBACK_PATH", tmp_path / "selected_builds.json")
+    UserBuildSelection._cache.invalidate()
+    UserPreferences._cache.invalidate()
+
+    reads = []
+    for name in ("get_selected_builds", "get_all_preferences"):
+        original = getattr(storage, name)
+        monkeypatch.setattr(storage, name, lambda original=original, name=name: reads.append(name) or original())
+
+    first = client.get("/api/config")
+    etag = first.headers["ETag"]
+    assert client.get("/api/config", headers={"If-None-Match": etag}).status_code == 304
+    assert sorted(reads) == ["get_all_preferences", "get_selected_builds"]
+
+    import asyncio
+    assert asyncio.run(UserPreferences.set_preference("dashboard_layout", {"theme": "light"}))
+    changed = client.get("/api/config", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["preferences"]["dashboard_layout"] == {"theme": "light"}
+    assert reads.count("get_all_preferences") == 2 and reads.count("get_selected_builds") == 1
+
+    # Les valeurs renvoyées sont des copies: les modifier n'altère pas le cache
+    asyncio.run(UserPreferences.get_preference("dashboard_layout"))["theme"] = "dark"
+    assert asyncio.run(UserPreferences.get_preference("dashboard_layout")) == {"theme": "light"}
+    storage.stop()
@@ -0,0 +1,42 @@
+from unittest import mock
+
+from api.services import teamcity_fetcher
+from benchmarks.run_benchmarks import compare
+from benchmarks.synthetic import generate_catalog, FakeTeamCityClient, active_build_type_count
+
+
+def test_synthetic_catalog_is_parsed_by_fetcher():
+    catalog = generate_catalog(n_projects=20, depth=3, n_build_types=80, archived_ratio=0.2)
+    fake = FakeTeamCityClient(catalog)
+    with mock.patch.object(teamcity_fetcher, "_make_teamcity_request", fake), \
+            mock.patch.object(teamcity_fetcher, "_make_status_request", fake):
+        builds = teamcity_fetcher.fetch_all_teamcity_builds()
+        enriched = teamcity_fetcher.enrich_builds_with_status(builds[:5])
+
+    assert len(builds) == active_build_type_count(catalog)
+    assert all(" / " in b["projectName"] or b["projectName"].startswith("Product") for b in builds)
+    assert all(b["status"] != "" and b["number"] for b in enriched)
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"small.tree": {"median_ms": 10.0}, "small.parse": {"median_ms": 10.0}}
+    results = {"small.tree": {"median_ms": 12.0}, "small.parse": {"median_ms": 14.0}, "small.new": {"median_ms": 1.0}}
+    regressions = compare(results, baseline, tolerance=0.30)
+    assert [r["benchmark"] for r in regressions] == ["small.parse"]
+
+
+def test_simulator_serves_locators_and_counts_requests():
+    from fastapi.testclient import TestClient
+    from benchmarks.teamcity_simulator import SimulatorConfig, create_app
+
+    app = create_app(SimulatorConfig(projects=10, depth=2, build_types=30, agents=3, churn=0))
+    sim = TestClient(app)
+    bt = app.state.simulator.catalog.build_types[0]
+
+    resp = sim.get("/app/rest/builds", params={"locator": f"buildType:{bt['id']},count:1"})
+    assert resp.status_code == 200
+    assert f'buildTypeId="{bt["id"]}"' in resp.text
+    assert sim.get("/app/rest/agents/id:1").text.startswith("<agent ")
+
+    stats = sim.get("/__simulator/stats").json()
+    assert stats["requests"] == {"/app/rest/builds": 1, "/app/rest/agents/{id}": 1}
@@ -0,0 +1,26 @@
+from api.services.build_catalog import BuildCatalog
+
+
+BUILDS = [
+    {"buildTypeId": "A_Build", "name": "Build", "projectName": "Alpha / Compil"},
+    {"buildTypeId": "A_Test", "name": "Test", "projectName": "Alpha / Tests"},
+    {"buildTypeId": "B_Deploy", "name": "Deploy", "projectName": "Beta"},
+]
+
+
+def test_catalog_indexes():
+    catalog = BuildCatalog(BUILDS)
+    assert len(catalog) == 3
+    assert catalog.get("A_Test")["name"] == "Test"
+    assert [b["buildTypeId"] for b in catalog.builds_in_top_project("Alpha")] == ["A_Build", "A_Test"]
+    assert catalog.builds_in_project("Beta")[0]["buildTypeId"] == "B_Deploy"
+
+
+def test_catalog_select_keeps_catalog_order_and_reports_missing():
+    catalog = BuildCatalog(BUILDS)
+    selected = catalog.select(["B_Deploy", "Unknown", "A_Build"])
+    assert [b["buildTypeId"] for b in selected] == ["A_Build", "B_Deploy"]
+
+    found, missing = catalog.get_many(["A_Test", "Nope"])
+    assert list(found) == ["A_Test"]
+    assert missing == ["Nope"]
@@ -0,0 +1,82 @@
+import re
+
+import httpx
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.services import build_logs
+from benchmarks.teamcity_simulator import SimulatorConfig, create_app
+
+
+def _setup_simulator(monkeypatch, tmp_path):
+    simulator = create_app(SimulatorConfig(projects=10, depth=2, build_types=40, agents=2, churn=0))
+    monkeypatch.setattr(build_logs, "_transport", httpx.ASGITransport(app=simulator))
+    monkeypatch.setenv("TEAMCITY_URL", "http://simulator")
+    monkeypatch.setattr(build_logs, "_is_teamcity_configured", lambda: True)
+    monkeypatch.setattr(build_logs, "log_cache", build_logs.LogTailCache(tmp_path, 10 * 1024 * 1024))
+    return simulator.state.simulator
+
+
+def _line_numbers(body: bytes):
+    return [int(n) for n in re.findall(rb"^\[(\d+)\]", body, re.MULTILINE)]
+
+
+def test_finished_log_tail_is_ranged_and_cached_on_disk(monkeypatch, tmp_path):
+    sim = _setup_simulator(monkeypatch, tmp_path)
+    bt = next(bt for bt in sim.catalog.build_types if not bt["running"])
+    full_log = sim.build_log(bt)
+    client = TestClient(app)
+
+    resp = client.get(f"/api/builds/{bt['buildId']}/log/tail", params={"kb": 4})
+    assert resp.status_code == 200
+    assert resp.headers["x-build-state"] == "finished"
+    assert len(resp.content) <= 4096 and full_log.endswith(resp.content)
+    assert resp.content.startswith(b"[")
+    assert (tmp_path / f"{bt['buildId']}.tail").exists()
+
+    # Même taille puis plus petite: servies depuis le disque, coupées au début de ligne comme en réseau
+    downloads = sim.stats()["requests"]["/downloadBuildLog.html"]
+    assert client.get(f"/api/builds/{bt['buildId']}/log/tail", params={"kb": 4}).content == resp.content
+    smaller = client.get(f"/api/builds/{bt['buildId']}/log/tail", params={"kb": 2}).content
+    assert smaller == full_log[-2048:].split(b"\n", 1)[1]
+    assert sim.stats()["requests"]["/downloadBuildLog.html"] == downloads
+
+    assert client.get("/api/builds/999999999/log/tail").status_code == 404
+    assert client.get(f"/api/builds/{bt['buildId']}/log/tail", params={"kb": 0}).status_code == 400
+
+
+def test_follow_mode_streams_new_bytes_of_running_build(monkeypatch, tmp_path):
+    sim = _setup_simulator(monkeypatch, tmp_path)
+    monkeypatch.setenv("LOG_FOLLOW_INTERVAL", "0.1")
+    monkeypatch.setenv("LOG_FOLLOW_MAX_SECONDS", "0.5")
+    bt = next(bt for bt in sim.catalog.build_types if bt["running"])
+    client = TestClient(app)
+
+    resp = client.get(f"/api/builds/{bt['buildId']}/log/tail", params={"kb": 1, "follow": True})
+    assert resp.status_code == 200
+    lines = _line_numbers(resp.content)
+    # Suite continue de lignes: la fin du log puis les lignes écrites pendant le suivi
+    assert lines == list(range(lines[0], lines[0] + len(lines)))
+    assert len(resp.content) > 1024
+    assert not list(tmp_path.iterdir())
+
+
+def test_unknown_range_total_is_not_cached_and_outage_is_503(monkeypatch, tmp_path):
+    def teamcity(request):
+        if "downloadBuildLog" in str(request.url):
+            return httpx.Response(206, content=b"...\n[1] fin\n", headers={"Content-Range": "bytes 0-11/*"})
+        return httpx.Response(200, text='<build id="7" state="finished"/>')
+
+    monkeypatch.setattr(build_logs, "_transport", httpx.MockTransport(teamcity))
+    monkeypatch.setenv("TEAMCITY_URL", "http://teamcity")
+    monkeypatch.setattr(build_logs, "_is_teamcity_configured", lambda: True)
+    monkeypatch.setattr(build_logs, "log_cache", build_logs.LogTailCache(tmp_path, 10 * 1024 * 1024))
+    client = TestClient(app)
+
+    resp = client.get("/api/builds/7/log/tail", params={"kb": 1})
+    assert resp.status_code == 200 and resp.content == b"[1] fin\n"
+    # Taille totale inconnue: le segment n'est pas pris pour le log entier
+    assert not (tmp_path / "7.full").exists() and (tmp_path / "7.tail").exists()
+
+    monkeypatch.setattr(build_logs, "_transport", httpx.MockTransport(lambda request: httpx.Response(502)))
+    assert client.get("/api/builds/7/log/tail").status_code == 503
@@ -0,0 +1,50 @@
+from api.services.build_tree import BuildTreeIndex
+
+
+TREE = {
+    "Alpha": {
+        "name": "Alpha",
+        "subprojects": {
+            "Compil": {
+                "name": "Compil",
+                "subprojects": {
+                    "Builds": {
+                        "name": "Builds",
+                        "builds": [{"buildTypeId": f"A_{i}", "name": f"Build {i}"} for i in range(5)],
+                    }
+                },
+            }
+        },
+    },
+    "Beta": {
+        "name": "Beta",
+        "subprojects": {
+            "General": {
+                "name": "General",
+                "subprojects": {"Builds": {"name": "Builds", "builds": [{"buildTypeId": "B_1", "name": "Deploy"}]}},
+            }
+        },
+    },
+}
+
+
+def test_tree_nodes_counts_and_selection_state():
+    index = BuildTreeIndex(TREE)
+    root = index.list_children("", {"A_0", "B_1"})
+    assert root["build_count"] == 6
+    assert [(c["name"], c["selection"]) for c in root["children"]] == [("Alpha", "indeterminate"), ("Beta", "checked")]
+
+    leaf = index.list_children("Alpha/Compil/Builds", {"A_1"})
+    assert [c["selected"] for c in leaf["children"]] == [False, True, False, False, False]
+
+
+def test_tree_nodes_pagination_and_build_ids():
+    index = BuildTreeIndex(TREE)
+    first = index.list_children("Alpha/Compil/Builds", set(), limit=2)
+    assert len(first["children"]) == 2 and first["next_cursor"] == "2"
+    last = index.list_children("Alpha/Compil/Builds", set(), cursor="4", limit=2)
+    assert len(last["children"]) == 1 and last["next_cursor"] is None
+
+    ids = index.list_build_ids("Alpha")
+    assert [b["buildTypeId"] for b in ids] == [f"A_{i}" for i in range(5)]
+    assert ids[0]["path"] == "Alpha/Compil/Builds"
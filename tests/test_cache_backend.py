@@ -0,0 +1,51 @@
+from api.services.cache_backend import SQLiteCacheBackend, LocalCacheBackend
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    worker_a = SQLiteCacheBackend(db_path)
+    worker_b = SQLiteCacheBackend(db_path)
+
+    stored_at = worker_a.set("teamcity_builds", [{"buildTypeId": "A"}])
+    assert worker_b.stamp("teamcity_builds") == stored_at
+    assert worker_b.get("teamcity_builds")[0] == [{"buildTypeId": "A"}]
+
+    assert worker_a.incr("version") == 1
+    assert worker_b.incr("version") == 2
+
+    worker_b.delete("teamcity_builds")
+    assert worker_a.get("teamcity_builds") is None
+
+
+def test_refresh_lock_is_exclusive(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    worker_a = SQLiteCacheBackend(db_path)
+    worker_b = SQLiteCacheBackend(db_path)
+
+    with worker_a.lock("teamcity_builds") as acquired:
+        assert acquired
+        with worker_b.lock("teamcity_builds", timeout=0.1) as acquired_b:
+            assert not acquired_b
+    with worker_b.lock("teamcity_builds", timeout=0.1) as acquired_b:
+        assert acquired_b
+
+    local = LocalCacheBackend()
+    with local.lock("x") as acquired:
+        assert acquired
+
+
+def test_lock_timeout_serves_expired_entry_without_refetching(monkeypatch, tmp_path):
+    from api.routes import builds
+
+    db_path = str(tmp_path / "cache.sqlite3")
+    worker_a = SQLiteCacheBackend(db_path)
+    worker_b = SQLiteCacheBackend(db_path)
+    worker_a.set("teamcity_builds", [{"buildTypeId": "OLD"}])
+    monkeypatch.setattr(builds, "get_cache_backend", lambda: worker_b)
+    monkeypatch.setattr(builds, "REFRESH_LOCK_TIMEOUT", 0.1)
+    monkeypatch.setattr(builds, "_is_shared_entry_fresh", lambda stored_at: False)
+
+    fetches = []
+    with worker_a.lock("teamcity_builds"):
+        value, _ = builds._load_shared_entry("teamcity_builds", lambda: fetches.append(1) or [])
+    assert value == [{"buildTypeId": "OLD"}] and fetches == []
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from api.database import config as db
+
+
+def test_async_queries_run_off_the_event_loop_and_time_out(monkeypatch):
+    def slow_query(query, params=None, fetch_one=False):
+        time.sleep(0.3)
+        return [{"build_type_id": "A"}]
+
+    monkeypatch.setattr(db, "execute_query", slow_query)
+
+    async def scenario():
+        query = asyncio.create_task(db.execute_query_async("SELECT 1"))
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        loop_latency = time.perf_counter() - start
+        rows = await query
+
+        monkeypatch.setenv("DB_QUERY_TIMEOUT", "0.05")
+        degraded = await db.execute_query_async("SELECT 1", fetch_one=True)
+        return loop_latency, rows, degraded
+
+    loop_latency, rows, degraded = asyncio.run(scenario())
+    assert loop_latency < 0.2
+    assert rows == [{"build_type_id": "A"}]
+    assert degraded == {}
+
+
+def test_health_monitor_publishes_state_and_backs_off(monkeypatch):
+    from api.database.health import DatabaseHealthMonitor
+
+    calls = []
+
+    def probe():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise ConnectionError("refused")
+        return True
+
+    monitor = DatabaseHealthMonitor(probe=probe, interval=30.0, backoff_max=4.0)
+    assert monitor.available is False
+    assert monitor.check() is False
+    assert [monitor._next_delay() for _ in range(4)] == [1.0, 2.0, 4.0, 4.0]
+    monitor.check()
+    assert monitor.check() is True
+    assert monitor._next_delay() == 30.0
+    assert monitor.snapshot()["consecutive_failures"] == 0
+
+    # Base signalée indisponible: aucune connexion tentée, réponse immédiate
+    monitor.mark_down("lost connection")
+    monkeypatch.setattr(db, "db_health", monitor)
+    monkeypatch.setattr(db, "get_connection_pool", lambda: (_ for _ in ()).throw(AssertionError("pool sollicité")))
+    assert db.get_db_connection() is None
@@ -0,0 +1,82 @@
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.services import failure_details, teamcity_fetcher
+from api.services.failure_details import LRUCache
+from benchmarks.synthetic import generate_catalog, FakeTeamCityClient
+
+
+def test_failure_details_are_cached_by_build_id(monkeypatch):
+    catalog = generate_catalog(n_projects=10, depth=2, n_build_types=80)
+    failed = [bt["id"] for bt in catalog.build_types if bt["status"] == "FAILURE" and not bt["running"]]
+    passed = [bt["id"] for bt in catalog.build_types if bt["status"] == "SUCCESS" and not bt["running"]]
+    fake = FakeTeamCityClient(catalog)
+    monkeypatch.setattr(teamcity_fetcher, "_make_teamcity_request", fake)
+    monkeypatch.setattr(failure_details, "failure_cache", LRUCache(16))
+    client = TestClient(app)
+
+    resp = client.get(f"/api/builds/{failed[0]}/failure")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["build"]["buildTypeId"] == failed[0]
+    assert data["problems"] and data["failed_tests"][0]["details"].startswith("AssertionError")
+    assert fake.calls == 3
+
+    # Build terminé déjà en cache: seule la recherche du dernier échec interroge TeamCity
+    assert client.get(f"/api/builds/{failed[0]}/failure").json() == data
+    assert fake.calls == 4
+    assert client.get(f"/api/builds/{passed[0]}/failure").status_code == 404
+
+    ids = ",".join(failed[:3] + passed[:1])
+    batch = client.get("/api/builds/failures", params={"ids": ids}).json()
+    assert [f["buildTypeId"] for f in batch["failures"]] == failed[:3]
+    assert batch["not_found"] == passed[:1] and batch["unavailable"] == []
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c"), len(cache)) == (1, 3, 2)
+
+
+def test_late_summaries_are_pending_and_shared_across_requests(monkeypatch):
+    import threading
+
+    release = threading.Event()
+    calls = []
+
+    def slow_summary(build_type_id):
+        calls.append(build_type_id)
+        release.wait(5)
+        return {"buildTypeId": build_type_id, "result": "not_found"}
+
+    monkeypatch.setattr(failure_details, "get_failure_summary", slow_summary)
+    for _ in range(2):
+        assert failure_details.get_failure_summaries(["Slow"], deadline=0.05) == [
+            {"buildTypeId": "Slow", "result": "pending"}
+        ]
+    assert calls == ["Slow"]
+    release.set()
+    assert failure_details.get_failure_summaries(["Slow"])[0]["result"] == "not_found"
+
+
+def test_failed_tests_truncated_only_beyond_the_limit(monkeypatch):
+    import xml.etree.ElementTree as ET
+
+    def occurrences(count):
+        return ET.fromstring("<testOccurrences>" + "<testOccurrence name='t'/>" * count + "</testOccurrences>")
+
+    monkeypatch.setattr(teamcity_fetcher, "FAILED_TESTS_LIMIT", 3)
+    monkeypatch.setattr(teamcity_fetcher, "_make_teamcity_request", lambda url: occurrences(3))
+    exact = teamcity_fetcher.fetch_failed_tests("1")
+    assert len(exact["tests"]) == 3 and not exact["truncated"]
+
+    monkeypatch.setattr(teamcity_fetcher, "_make_teamcity_request", lambda url: occurrences(4))
+    more = teamcity_fetcher.fetch_failed_tests("1")
+    assert len(more["tests"]) == 3 and more["truncated"]
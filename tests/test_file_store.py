@@ -0,0 +1,43 @@
+import json
+import os
+
+import pytest
+
+from api.database import file_store
+from api.database.file_store import SelectionFileStore
+
+
+def test_reads_are_cached_until_the_file_changes(tmp_path, monkeypatch):
+    store = SelectionFileStore(tmp_path / "selected_builds.json")
+    assert store.read() == []
+    assert store.write(["A", "B"])
+
+    loads = []
+    real_load = json.load
+    monkeypatch.setattr(file_store.json, "load", lambda f: loads.append(1) or real_load(f))
+    assert store.read() == ["A", "B"]
+    assert store.read() == ["A", "B"]
+    assert loads == []
+
+    # Écriture par un autre processus (remplacement atomique): relu une seule fois
+    other = SelectionFileStore(store.path)
+    assert other.write(["C"])
+    assert store.read() == ["C"]
+    assert store.read() == ["C"]
+    assert loads == [1]
+
+
+def test_failed_write_keeps_previous_file_and_no_temp_files(tmp_path, monkeypatch):
+    store = SelectionFileStore(tmp_path / "selected_builds.json")
+    store.write(["A"])
+
+    def crash(*args, **kwargs):
+        raise OSError("disque plein")
+
+    monkeypatch.setattr(file_store.os, "fsync", crash)
+    assert store.write(["A", "B"]) is False
+    with pytest.raises(OSError):
+        store.update(lambda current: current + ["C"])
+
+    assert json.loads(store.path.read_text(encoding="utf-8")) == {"selectedBuilds": ["A"]}
+    assert sorted(os.listdir(tmp_path)) == ["selected_builds.json", "selected_builds.json.lock"]
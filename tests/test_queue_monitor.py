@@ -0,0 +1,70 @@
+from unittest import mock
+import time
+
+from api.services import teamcity_fetcher
+from api.services.queue_monitor import BuildQueueMonitor, RollingPercentiles
+from benchmarks.synthetic import generate_catalog, queued_builds, FakeTeamCityClient
+
+
+def _queued(build_id, build_type_id, reason="Waiting for compatible agent"):
+    return {"id": build_id, "buildTypeId": build_type_id, "name": build_type_id, "queuedDate": "",
+            "waitReason": reason}
+
+
+def test_builds_leaving_the_queue_feed_wait_percentiles():
+    monitor = BuildQueueMonitor(fetch=lambda: None, interval=60, window=3600)
+    start = time.time() - 300
+    monitor.observe([_queued("1", "A"), _queued("2", "B", "Waiting for dependency")], now=start)
+    monitor.observe([_queued("2", "B", "Waiting for dependency")], now=start + 60)
+    monitor.observe([], now=start + 120)
+
+    # Sortie estimée au milieu de l'intervalle entre deux relevés
+    snapshot = monitor.snapshot()
+    assert snapshot["queued_count"] == 0
+    assert snapshot["wait"]["samples"] == 2
+    waits = {item["buildTypeId"]: item["wait"]["p50"] for item in snapshot["build_types"]}
+    assert waits == {"A": 30.0, "B": 90.0}
+    assert {item["reason"] for item in snapshot["wait_reasons"]} == {"Waiting for compatible agent",
+                                                                      "Waiting for dependency"}
+
+    # Relevé en échec: l'état est conservé, aucune fausse sortie comptée
+    monitor.observe([_queued("3", "A")], now=start + 130)
+    assert monitor.poll() is False
+    assert monitor.snapshot()["queued_count"] == 1
+    assert monitor.snapshot()["wait"]["samples"] == 2
+
+
+def test_exits_during_a_polling_pause_are_not_sampled():
+    monitor = BuildQueueMonitor(fetch=lambda: None, interval=15, window=3600)
+    start = time.time() - 3000
+    monitor.observe([_queued("1", "A"), _queued("2", "B")], now=start)
+    # Aucun dashboard ouvert pendant 40 minutes: relevés en pause
+    monitor.observe([_queued("2", "B"), _queued("3", "C")], now=start + 2400)
+    assert monitor.snapshot()["wait"]["samples"] == 0
+    assert monitor.snapshot()["queued_count"] == 2
+
+    # Reprise des relevés réguliers: les sorties sont de nouveau mesurées
+    monitor.observe([], now=start + 2415)
+    assert monitor.snapshot()["wait"]["samples"] == 2
+
+
+def test_rolling_percentiles_are_bounded_by_count_and_age():
+    series = RollingPercentiles(max_age=100, max_samples=10)
+    for index in range(50):
+        series.add(float(index), now=float(index))
+    assert len(series) == 10
+    assert series.summary(now=49.0) == {"samples": 10, "p50": 44.0, "p90": 48.0, "p99": 49.0, "max": 49.0}
+    assert series.summary(now=500.0) == {"samples": 0}
+
+
+def test_build_queue_is_parsed_from_teamcity_xml():
+    catalog = generate_catalog(n_projects=10, depth=2, n_build_types=80, n_agents=2)
+    with mock.patch.object(teamcity_fetcher, "_make_teamcity_request", FakeTeamCityClient(catalog)):
+        queued = teamcity_fetcher.fetch_teamcity_build_queue()
+    assert [q["buildTypeId"] for q in queued] == [bt["id"] for bt in queued_builds(catalog)]
+    assert queued and all(q["queuedDate"] and q["waitReason"] for q in queued)
+
+    monitor = BuildQueueMonitor(fetch=lambda: queued, interval=10)
+    assert monitor.poll() is True
+    assert monitor.summary()["queued_count"] == len(queued)
+    assert all(0 <= q["wait_seconds"] <= 610 for q in monitor.snapshot()["queued"])
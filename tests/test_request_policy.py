@@ -0,0 +1,85 @@
+import random
+import threading
+import time
+
+import requests
+
+from api.services import request_policy, teamcity_fetcher
+from api.services.request_policy import Hedger, RequestBudget, RetryPolicy
+
+
+class _Response:
+    def __init__(self, status_code, text="<builds count=\"0\"/>"):
+        self.status_code = status_code
+        self.text = text
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}", response=self)
+
+
+def test_transient_errors_are_retried_within_budget(monkeypatch):
+    responses = [_Response(503), _Response(200)]
+    monkeypatch.setattr(teamcity_fetcher, "_is_teamcity_configured", lambda: True)
+    monkeypatch.setattr(teamcity_fetcher.recorder, "get", lambda url, headers, timeout: responses.pop(0))
+    monkeypatch.setattr(teamcity_fetcher.time, "sleep", lambda delay: None)
+    policy = RetryPolicy(max_retries=2, budget=RequestBudget(ratio=0.1, reserve=1), rng=random.Random(1))
+    monkeypatch.setattr(teamcity_fetcher, "retry_policy", policy)
+
+    assert teamcity_fetcher._make_teamcity_request("http://tc/app/rest/builds").tag == "builds"
+    assert all(0 <= policy.backoff(n) <= min(request_policy.RETRY_MAX_DELAY, 0.2 * 2 ** n) for n in range(6))
+
+    # Budget épuisé (un seul jeton, déjà consommé): pas de relance, pas de relance non plus sur une 404
+    responses[:] = [_Response(503), _Response(200)]
+    assert teamcity_fetcher._make_teamcity_request("http://tc/app/rest/builds").tag == "root"
+    responses[:] = [_Response(404), _Response(200)]
+    assert teamcity_fetcher._make_teamcity_request("http://tc/app/rest/builds").tag == "root"
+
+
+def test_slow_call_is_hedged_and_first_success_wins():
+    hedger = Hedger(percentile=90, budget=RequestBudget(ratio=0.05, reserve=1), workers=4)
+    for _ in range(request_policy.MIN_HEDGE_SAMPLES):
+        hedger.observe(0.01)
+    assert hedger.hedge_delay() == request_policy.MIN_HEDGE_DELAY
+
+    release = threading.Event()
+    calls = []
+
+    def call(name):
+        calls.append(name)
+        if len(calls) == 1:
+            release.wait(5)
+            return "slow"
+        return "fast"
+
+    assert hedger.call(call, "status") == "fast"
+    # Budget consommé: l'appel suivant attend la réponse initiale sans doublon
+    release.set()
+    calls.clear()
+
+    def slow(name):
+        calls.append(name)
+        time.sleep(0.15)
+        return "ok"
+
+    assert hedger.call(slow, "status") == "ok"
+    assert calls == ["status"]
+    assert hedger.snapshot()["budget_tokens"] < 1
+
+
+def test_status_request_hedges_single_attempts_and_retries_around_them(monkeypatch):
+    attempts = [(None, True), (teamcity_fetcher.ET.Element("builds"), False)]
+    hedger = Hedger(percentile=95, budget=RequestBudget(ratio=0.05, reserve=1), workers=2)
+    policy = RetryPolicy(max_retries=2, budget=RequestBudget(ratio=0.1, reserve=1), rng=random.Random(1))
+    monkeypatch.setattr(teamcity_fetcher, "_is_teamcity_configured", lambda: True)
+    monkeypatch.setattr(teamcity_fetcher, "_teamcity_attempt", lambda url: attempts.pop(0))
+    monkeypatch.setattr(teamcity_fetcher, "status_hedger", hedger)
+    monkeypatch.setattr(teamcity_fetcher, "retry_policy", policy)
+    monkeypatch.setattr(teamcity_fetcher.time, "sleep", lambda delay: None)
+
+    assert teamcity_fetcher._make_status_request("http://tc/app/rest/builds").tag == "builds"
+    # Une latence observée par tentative, hors attentes de relance
+    assert len(hedger._latencies) == 2
+
+    attempts[:] = [(None, False)]
+    assert teamcity_fetcher._make_status_request("http://tc/app/rest/builds") is None
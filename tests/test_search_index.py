@@ -0,0 +1,52 @@
+from api.services.search_index import BuildSearchIndex
+
+
+BUILDS = [
+    {"buildTypeId": "Go2Version612_Plugins_BuildDebug", "name": "Build Debug", "projectName": "Go2 / Plugins"},
+    {"buildTypeId": "Go2Version612_Plugins_BuildRelease", "name": "Build Release", "projectName": "Go2 / Plugins"},
+    {"buildTypeId": "WebServices_Portal_Deploy", "name": "Deploy Portal", "projectName": "Web Services / GO2Portal"},
+]
+
+
+def test_search_prefix_substring_and_pagination():
+    index = BuildSearchIndex()
+    index.sync(BUILDS)
+
+    result = index.search("deb")
+    assert [h["buildTypeId"] for h in result["hits"]] == ["Go2Version612_Plugins_BuildDebug"]
+
+    # Sous-chaîne au milieu d'un mot (trigrammes)
+    assert index.search("ortal")["total"] == 1
+
+    page = index.search("build", offset=1, limit=1)
+    assert page["total"] == 2
+    assert len(page["hits"]) == 1
+
+
+def test_search_sync_is_incremental():
+    index = BuildSearchIndex()
+    index.sync(BUILDS)
+    stats = index.sync(BUILDS[:2] + [{**BUILDS[2], "name": "Deploy Gateway"}])
+    assert stats == {"added_or_updated": 1, "removed": 0, "total": 3}
+    assert index.search("portal")["hits"][0]["name"] == "Deploy Gateway"
+    assert index.search("gateway")["total"] == 1
+
+    stats = index.sync(BUILDS[:1])
+    assert stats["removed"] == 2
+    assert index.search("release")["total"] == 0
+
+
+def test_older_catalog_version_is_not_adopted_after_a_newer_one(monkeypatch):
+    from api.routes import builds
+
+    monkeypatch.setattr(builds, "search_index", BuildSearchIndex())
+    monkeypatch.setitem(builds.cache, "builds_stamp", None)
+    for key in ("teamcity_builds", "catalog", "tree_index", "builds_timestamp"):
+        monkeypatch.setitem(builds.cache, key, None)
+
+    builds._adopt_builds(BUILDS, stored_at=200.0)
+    # Reconstruction plus lente d'une version antérieure: ignorée, index et catalogue restent alignés
+    builds._adopt_builds(BUILDS[:1], stored_at=100.0)
+    assert builds.cache["builds_stamp"] == 200.0
+    assert len(builds.cache["catalog"].builds) == 3
+    assert builds.search_index.search("portal")["total"] == 1
@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+
+from api.services.status_scheduler import AdaptiveStatusScheduler, ACTIVE_POLL_INTERVAL, JITTER
+
+
+def _teamcity_date(timestamp):
+    return time.strftime("%Y%m%dT%H%M%S+0000", time.gmtime(timestamp))
+
+
+def _scheduler(statuses, queued=()):
+    calls = []
+
+    def fetch(build_type_id):
+        calls.append(build_type_id)
+        return dict(statuses[build_type_id])
+
+    scheduler = AdaptiveStatusScheduler(fetch=fetch, queued_build_types=lambda: queued,
+                                        min_interval=15, max_interval=900, rng=random.Random(1))
+    return scheduler, calls
+
+
+def test_intervals_follow_build_state_and_idle_time():
+    now = time.time()
+    statuses = {
+        "Running": {"state": "running", "number": "5"},
+        "Queued": {"state": "finished", "number": "3", "finishDate": _teamcity_date(now - 600)},
+        "Recent": {"state": "finished", "number": "9", "finishDate": _teamcity_date(now - 600)},
+        "Dormant": {"state": "finished", "number": "1", "finishDate": _teamcity_date(now - 30 * 86400)},
+    }
+    scheduler, _ = _scheduler(statuses, queued=("Queued",))
+    scheduler.statuses_for(list(statuses))
+
+    intervals = {b["buildTypeId"]: (b["activity"], b["interval"]) for b in scheduler.snapshot()["build_types"]}
+    assert intervals["Running"] == ("running", 15)
+    assert intervals["Queued"] == ("queued", 15)
+    assert intervals["Recent"] == ("active", ACTIVE_POLL_INTERVAL)
+    assert intervals["Dormant"] == ("dormant", 900)
+    for build in scheduler.snapshot()["build_types"]:
+        assert build["next_in"] <= build["interval"] * (1 + JITTER) + 1
+    assert scheduler.suggested_refresh_ms(["Dormant", "Running"]) == 15000
+    assert scheduler.suggested_refresh_ms(["Dormant"]) == 120000
+
+
+def test_dashboard_reads_cache_until_due_and_background_poll_refreshes():
+    statuses = {"A": {"state": "running", "number": "1"}, "B": {"state": "finished", "number": "7"}}
+    scheduler, calls = _scheduler(statuses)
+
+    assert scheduler.enrich([{"buildTypeId": "A", "name": "a"}])[0]["number"] == "1"
+    scheduler.statuses_for(["A", "B"])
+    assert calls == ["A", "B"]
+
+    # Rien n'est échu: aucune requête
+    assert scheduler.poll_due() == 0
+    assert calls == ["A", "B"]
+
+    # Échéance dépassée: seule la tâche de fond relit A, et détecte le changement d'activité
+    statuses["A"] = {"state": "finished", "number": "1"}
+    scheduler._entries["A"].next_due = 0
+    assert scheduler.poll_due() == 1
+    assert calls == ["A", "B", "A"]
+    assert scheduler._entries["A"].last_change is not None
+    assert scheduler.snapshot()["effective_polls_per_minute"] > 0
+
+
+def test_deadline_serves_stale_or_pending_and_stragglers_update_cache():
+    release = threading.Event()
+    statuses = {"Fast": {"state": "finished", "number": "2"}, "Slow": {"state": "finished", "number": "4"},
+                "New": {"state": "finished", "number": "1"}}
+    scheduler, calls = _scheduler(statuses)
+    scheduler.statuses_for(["Slow"])
+
+    fetch = scheduler.fetch
+
+    def slow_fetch(build_type_id):
+        if build_type_id != "Fast":
+            release.wait(5)
+        return fetch(build_type_id)
+
+    scheduler.fetch = slow_fetch
+    scheduler._entries["Slow"].next_due = 0
+    statuses["Slow"] = {"state": "running", "number": "5"}
+
+    result = scheduler.statuses_for(["Fast", "Slow", "New"], deadline=0.2)
+    assert result["Fast"] == {"state": "finished", "number": "2"}
+    assert result["Slow"] == {"state": "finished", "number": "4", "stale": True}
+    assert result["New"]["pending"] is True
+    assert scheduler.snapshot()["in_flight"] == 2
+
+    # La lecture en retard se termine en arrière-plan et met le cache à jour
+    release.set()
+    deadline = time.time() + 5
+    while scheduler.snapshot()["in_flight"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert scheduler.statuses_for(["Slow", "New"]) == {"Slow": statuses["Slow"], "New": statuses["New"]}
+
+
+def test_failed_read_keeps_last_status_as_stale_and_backs_off():
+    statuses = {"A": {"state": "finished", "number": "7", "status": "SUCCESS"}}
+    scheduler, calls = _scheduler(statuses)
+    scheduler.statuses_for(["A"])
+    last_change = scheduler._entries["A"].last_change
+
+    # TeamCity indisponible: fetch renvoie None
+    statuses["A"] = None
+    scheduler.fetch = lambda build_type_id: calls.append(build_type_id) or statuses[build_type_id]
+    scheduler._entries["A"].next_due = 0
+    assert scheduler.statuses_for(["A"]) == {"A": {"state": "finished", "number": "7", "status": "SUCCESS",
+                                                   "stale": True}}
+    entry = scheduler._entries["A"]
+    assert entry.last_change == last_change and entry.failures == 1
+    assert entry.next_due - time.time() <= 5 * (1 + JITTER)
+
+    # Pendant le délai de relance: valeur stale servie sans nouvelle requête
+    calls.clear()
+    assert scheduler.statuses_for(["A"])["A"]["stale"] is True
+    assert calls == []
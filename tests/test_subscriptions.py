@@ -0,0 +1,52 @@
+import random
+
+from api.services.status_scheduler import AdaptiveStatusScheduler
+from api.services.subscriptions import SubscriptionRegistry
+
+
+def test_refcounts_follow_sessions_and_expire():
+    registry = SubscriptionRegistry(session_ttl=300)
+    registry.subscribe("tab-1", ["A", "B"])
+    registry.subscribe("tab-2", ["B", "C"])
+    assert registry.watched() == {"A", "B", "C"}
+
+    # Nouvelle sélection: A n'est plus regardé, B l'est encore par tab-2
+    registry.subscribe("tab-1", ["B"])
+    assert registry.snapshot()["most_watched"][0] == {"buildTypeId": "B", "sessions": 2}
+    assert registry.unsubscribe("tab-2") and not registry.unsubscribe("tab-2")
+    assert registry.watched() == {"B"}
+
+    registry._sessions["tab-1"].last_seen -= 301
+    assert registry.watched() == set()
+    assert not registry.has_sessions()
+
+
+def test_session_cap_evicts_least_recently_seen():
+    registry = SubscriptionRegistry(session_ttl=300, max_sessions=2)
+    registry.subscribe("tab-1", ["A"])
+    registry.subscribe("tab-2", ["B"])
+    registry.subscribe("tab-1", ["A"])
+    registry.subscribe("random", ["C"])
+    assert registry.session_count() == 2
+    assert registry.watched() == {"A", "C"}
+
+
+def test_background_poll_only_refreshes_watched_build_types():
+    registry = SubscriptionRegistry(session_ttl=300)
+    calls = []
+
+    def fetch(build_type_id):
+        calls.append(build_type_id)
+        return {"state": "running", "number": "1"}
+
+    scheduler = AdaptiveStatusScheduler(fetch=fetch, queued_build_types=lambda: (), min_interval=15,
+                                        max_interval=900, rng=random.Random(1), watched=registry.watched)
+    scheduler.statuses_for(["A", "B"])
+    for entry in scheduler._entries.values():
+        entry.next_due = 0
+
+    # Personne ne regarde: aucune requête TeamCity
+    assert scheduler.poll_due() == 0
+    registry.subscribe("tab-1", ["B"])
+    assert scheduler.poll_due() == 1
+    assert calls == ["A", "B", "B"]
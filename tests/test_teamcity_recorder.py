@@ -0,0 +1,50 @@
+import gzip
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from api.services import teamcity_recorder
+from api.services.teamcity_recorder import TeamCityRecorder, Pseudonymizer
+
+
+class FakeResponse:
+    status_code = 200
+    text = ('<builds count="1"><build id="42" buildTypeId="Secret_Product_Build" number="17" status="SUCCESS" '
+            'state="finished" webUrl="https://tc.corp.example/viewLog.html?buildId=42&amp;buildTypeId=Secret_Product_Build"/>'
+            '</builds>')
+
+
+def test_record_then_replay_with_pseudonymized_ids(tmp_path, monkeypatch):
+    archive = tmp_path / "traffic.jsonl.gz"
+    monkeypatch.setattr(teamcity_recorder.requests, "get", lambda url, headers, timeout: FakeResponse())
+
+    recorder = TeamCityRecorder("record", str(archive), salt="test-salt")
+    recorder.get("https://tc.corp.example/app/rest/builds?locator=buildType:Secret_Product_Build,count:1", {}, 3)
+    recorder.close()
+
+    with gzip.open(archive, "rt", encoding="utf-8") as f:
+        content = f.read()
+    assert "Secret" not in content and "corp.example" not in content
+
+    pseudo_id = Pseudonymizer("test-salt").identifier("Secret_Product_Build")
+    replay = TeamCityRecorder("replay", str(archive), latency="0")
+    response = replay.get(f"http://localhost:8111/app/rest/builds?locator=buildType:{pseudo_id},count:1", {}, 3)
+    build = ET.fromstring(response.text).find("build")
+    assert build.attrib["buildTypeId"] == pseudo_id
+    assert build.attrib["number"] == "17"
+
+    missing = replay.get("http://localhost:8111/app/rest/agents", {}, 3)
+    assert missing.status_code == 404
+
+
+def test_recording_requires_a_stable_salt(tmp_path, monkeypatch):
+    archive = tmp_path / "traffic.jsonl.gz"
+    monkeypatch.setattr(teamcity_recorder.requests, "get", lambda url, headers, timeout: FakeResponse())
+    with pytest.raises(ValueError):
+        TeamCityRecorder("record", str(archive))
+
+    TeamCityRecorder("record", str(archive), salt="first").close()
+    # Session suivante dans la même archive: même clé acceptée, autre clé refusée
+    TeamCityRecorder("record", str(archive), salt="first").close()
+    with pytest.raises(ValueError):
+        TeamCityRecorder("record", str(archive), salt="second")
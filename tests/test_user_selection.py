@@ -0,0 +1,105 @@
+from api.database.mysql_storage import MySQLStorage
+from api.database.sqlite_storage import SQLiteStorage
+from api.database.storage import selection_version
+from api.models.user_selection import UserBuildSelection
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def execute(self, query, params=None):
+        self.statements.append((query, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_selection_diff_batches_upserts_and_skips_unchanged_rows():
+    catalog = [{"buildTypeId": f"B{i}", "projectName": "P", "name": f"Build {i}"} for i in range(1200)]
+    existing = [
+        {"build_type_id": "B0", "project_name": "P", "build_name": "Build 0", "is_selected": 1},
+        {"build_type_id": "B1", "project_name": "P", "build_name": "Build 1", "is_selected": 0},
+        {"build_type_id": "GONE", "project_name": "P", "build_name": "Old", "is_selected": 1},
+    ]
+    cursor = FakeCursor(existing)
+
+    desired = UserBuildSelection._desired_rows(["B0", "B1", "MISSING"], catalog)
+    stats = MySQLStorage._apply_selection_diff(desired, cursor)
+
+    assert stats == {"inserted": 1199, "updated": 1, "deleted": 1, "unchanged": 1}
+    kinds = [query.split()[0] for query, _ in cursor.statements]
+    assert kinds == ["SELECT", "INSERT", "INSERT", "INSERT", "DELETE"]
+    assert "ON DUPLICATE KEY UPDATE" in cursor.statements[1][0]
+    assert cursor.statements[-1][1] == ("GONE",)
+
+
+def test_selection_patch_writes_only_changed_builds():
+    cursor = FakeCursor([{"build_type_id": f"B{i}"} for i in range(1000)])
+    version = selection_version([f"B{i}" for i in range(1000)])
+
+    result = MySQLStorage._apply_selection_patch(["NEW"], ["B3"], version, {}, lambda: [], cursor)
+
+    assert (result["conflict"], result["added"], result["removed"]) == (False, 1, 1)
+    assert [query.split()[0] for query, _ in cursor.statements] == ["SELECT", "INSERT", "UPDATE"]
+    assert cursor.statements[2][1] == ("B3",)
+
+
+def test_sqlite_storage_round_trip(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "monitor.sqlite3"))
+    storage.create_selection_table()
+    storage.create_preference_table()
+    assert storage._connect().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    catalog = [{"buildTypeId": f"B{i}", "projectName": "P", "name": f"Build {i}"} for i in range(3)]
+    stats = storage.replace_selections(UserBuildSelection._desired_rows(["B0", "B2"], catalog))
+    assert stats == {"inserted": 3, "updated": 0, "deleted": 0, "unchanged": 0}
+    assert sorted(storage.get_selected_builds()) == ["B0", "B2"]
+
+    stale = storage.patch_selections(["B1"], [], "stale", {}, lambda: [])
+    assert stale["conflict"] is True
+    result = storage.patch_selections(["B1"], ["B0"], stale["version"], {}, lambda: [])
+    assert (result["added"], result["removed"]) == (1, 1)
+    assert storage.get_build_info("B0") == {
+        "build_type_id": "B0", "project_name": "P", "build_name": "Build 0", "is_selected": False
+    }
+
+    assert storage.set_preference("theme", '"light"')
+    assert storage.get_all_preferences() == [("theme", '"light"')]
+    # Écritures (BEGIN IMMEDIATE, attente possible du verrou) hors boucle d'événements, lectures directes
+    assert storage.patch_selections.blocking and not getattr(storage.get_selected_builds, "blocking", False)
+    # Même contrat pour les deux backends: True seulement si des lignes ont été supprimées
+    assert storage.clear_selections() and not storage.clear_selections()
+    storage.stop()
+
+
+def test_mysql_clear_selections_reports_deleted_rows(monkeypatch):
+    from api.database import mysql_storage
+    monkeypatch.setattr(mysql_storage, "execute_update", lambda query: 0)
+    assert MySQLStorage.clear_selections(object.__new__(MySQLStorage)) is False
+    monkeypatch.setattr(mysql_storage, "execute_update", lambda query: 4)
+    assert MySQLStorage.clear_selections(object.__new__(MySQLStorage)) is True
+
+
+def test_initialize_tables_imports_file_selection_once(monkeypatch, tmp_path):
+    import asyncio
+    from api.database import storage as storage_module
+    from api.services.modern_user_service import user_service
+
+    storage = SQLiteStorage(str(tmp_path / "monitor.sqlite3"))
+    monkeypatch.setattr(storage_module, "_storage", storage)
+    monkeypatch.setattr(UserBuildSelection, "FILE_FALLBACK_PATH", tmp_path / "selected_builds.json")
+    UserBuildSelection._cache.invalidate()
+    assert UserBuildSelection._write_file_fallback(["B1", "B2"])
+
+    imports = []
+    original = storage.patch_selections
+    monkeypatch.setattr(storage, "patch_selections", lambda *args: imports.append(args[0]) or original(*args))
+
+    assert asyncio.run(user_service.initialize_tables())
+    assert asyncio.run(user_service.initialize_tables())
+
+    assert imports == [["B1", "B2"]]
+    assert sorted(storage.get_selected_builds()) == ["B1", "B2"]
+    storage.stop()